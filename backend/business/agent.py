@@ -28,9 +28,17 @@ instruction = """
     -   必须使用 `analyzeBusinessProblem(problems)` 工具来获取初步的解决方案和建议，**不要自行猜测解决方案**。
 
 4.  **根据分析结果继续处理**：
+    -   **如果工具返回JSON格式的结论**(检索结果已经可以直接判断，没有经过大模型分析)：
+        -   `{"verdict": "confident", "name": ..., "top_distance": ..., "gap": ..., "message": ...}`：`name` 就是匹配到的解决方案，按明确的解决方案处理，向用户解释该方案，不需要再向用户追问；
+        -   `{"verdict": "no_match", "candidates": [...], "top_distance": ..., "message": ...}`：数据库中没有足够匹配的解决方案，**不要**从 `candidates` 中挑选或猜测，按 `message` 向用户询问更多、更具体的问题描述(JSON后面有“建议追问”时，直接基于它提问)，合并后重新调用 `analyzeBusinessProblem(problems)`；
+        -   `top_distance`、`gap` 是检索的距离，只用于判断，不要告诉用户。
+
     -   **如果分析结果提供了明确的解决方案**：
         -   以通俗易懂的语言向用户解释该方案，并阐述其优势和潜在风险。
 
+    -   **如果分析结果中有“建议追问”**：
+        -   直接基于其中的内容向用户提问，它是最能区分候选方案的信息，用户回答后合并到 `problems` 中再次调用 `analyzeBusinessProblem(problems)`。
+
     -   **如果分析结果表明需要更多行业信息**：
         -   调用 `getIndustryReport(industry_name)` 工具，获取相关行业的详细报告。
         -   整合行业报告中的信息，再次调用 `analyzeBusinessProblem(problems)`，以形成更完善的建议。
@@ -28,11 +28,17 @@ instruction = """
     -   使用 `query_knowledge_base(query)` 工具，根据用户问题在知识库中检索相关的解决方案或信息。
 
 4.  **根据查询结果继续处理**：
+    -   **如果工具返回JSON格式的结论**(检索结果已经可以直接判断，没有经过大模型分析)：
+        -   `{"verdict": "confident", "name": ..., "top_distance": ..., "gap": ..., "message": ...}`：`name` 就是匹配到的解决方案，按唯一解决方案处理，以 `name` 作为 `solution_id` 调用 `get_solution(solution_id)`，不需要再向用户追问；
+        -   `{"verdict": "no_match", "candidates": [...], "top_distance": ..., "message": ...}`：数据库中没有足够匹配的解决方案，**不要**从 `candidates` 中挑选或猜测，按 `message` 向用户询问更多、更具体的问题描述(JSON后面有“建议追问”时，直接基于它提问)，合并后重新调用 `query_knowledge_base(query)`；
+        -   `top_distance`、`gap` 是检索的距离，只用于判断，不要告诉用户。
+
     -   **如果找到解决方案**：
         -   调用 `get_solution(solution_id)` 工具，获取该解决方案的详细步骤，并以清晰、简洁的语言向用户解释。
 
     -   **如果未找到直接解决方案或信息不明确**：
-        -   分析知识库返回的可能相关的信息，找出最具关联性的方面。
+        -   如果工具结果中有“建议追问”，直接基于其中的内容向用户提问，不需要再自行分析；
+        -   没有“建议追问”时，分析知识库返回的可能相关的信息，找出最具关联性的方面。
         -   基于这些信息，向用户提出**简洁、明确**的问题，以澄清用户的意图，例如：
             > “请问您具体是无法登录哪个系统？”
             > “您能否提供订单号以便我为您查询？”
@@ -6,11 +6,15 @@
 # @Contact : github: johnson7788
 # @Desc  : 准备数据，数据进行向量化
 import os
+import sys
 from dotenv import load_dotenv
 from DecisionAgent.embedding_utils import EmbeddingModel,ChromaDB
 from data import customer_service_data
 load_dotenv()
 COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "customer_service_data")
+EMBEDDING_PROVIDER = os.environ.get("EMBEDDING_PROVIDER", "aliyun")
+VECTOR_BACKEND = os.environ.get("VECTOR_BACKEND", "chroma")
+VECTOR_DB_DIR = os.environ.get("VECTOR_DB_DIR") or None
 print(f"使用的向量表是: {COLLECTION_NAME}")
 def get_matches_for_embedding():
     documents = [item["question"] for item in customer_service_data]
@@ -18,25 +22,32 @@ def get_matches_for_embedding():
     return documents, metadatas
 
 if __name__ == '__main__':
-    embedder = EmbeddingModel()
-    chromadb_instance = ChromaDB(embedder=embedder)
+    embedder = EmbeddingModel(provider=EMBEDDING_PROVIDER)
+    chromadb_instance = ChromaDB(embedder=embedder, db_dir=VECTOR_DB_DIR, backend=VECTOR_BACKEND)
 
     # 1. 获取要向量化的 documents 和对应的 metadata
     documents_to_embed, metadatas_for_documents = get_matches_for_embedding()
 
     # 2. 定义 ChromaDB 的 collection 名称
-    # 3. 删除旧的 collection (可选，用于清空数据)
-    print(f"尝试删除 collection: {COLLECTION_NAME}")
-    chromadb_instance.delete_one_collection(COLLECTION_NAME)
-
-    # 4. 将 matches 字段向量化并插入到 ChromaDB，name 字段作为 meta 信息
-    print(f"开始插入数据到 collection: {COLLECTION_NAME}")
-    insert_status = chromadb_instance.insert2collection(
-        collection=COLLECTION_NAME,
-        documents=documents_to_embed,
-        meta=metadatas_for_documents
-    )
-    print(f"数据插入状态: {insert_status}")
+    # 3. 默认增量同步，只对新增或者修改的数据进行向量化，已经不存在的数据会被删除;
+    #    使用 --rebuild 参数时，全量写入新版本的 collection，写完后再切换别名，运行中的Agent不受影响
+    if "--rebuild" in sys.argv:
+        print(f"开始重建 collection: {COLLECTION_NAME}")
+        version = chromadb_instance.rebuild_collection(
+            collection=COLLECTION_NAME,
+            documents=documents_to_embed,
+            meta=metadatas_for_documents
+        )
+        print(f"重建完成，当前版本: {version}")
+    else:
+        # 4. 将 matches 字段向量化并同步到 ChromaDB，name 字段作为 meta 信息
+        print(f"开始同步数据到 collection: {COLLECTION_NAME}")
+        sync_result = chromadb_instance.sync2collection(
+            collection=COLLECTION_NAME,
+            documents=documents_to_embed,
+            meta=metadatas_for_documents
+        )
+        print(f"数据同步结果: {sync_result}")
 
     # 5. 列出所有已有的 collections，确认新的 collection 已创建
     print("\n现有 collections:")
@@ -5,85 +5,20 @@
 # @Author: johnson
 # @Contact : github: johnson7788
 # @Desc  :
-import os
-from litellm import completion
-from google.adk.tools import ToolContext
-from google.adk.tools.agent_tool import AgentTool
-from data import education_data
-import time
-from datetime import datetime
-import random
 from dotenv import load_dotenv
-from DecisionAgent.embedding_utils import EmbeddingModel,ChromaDB
-# import litellm
-# litellm._turn_on_debug()
+from data import education_data
+from DecisionAgent.decision_tools import DecisionToolEngine
 # 加载环境变量
 load_dotenv()
 
-TOOL_MODEL_API_BASE = os.environ["TOOL_MODEL_API_BASE"]
-TOOL_MODEL_API_KEY = os.environ["TOOL_MODEL_API_KEY"]
-TOOL_MODEL_NAME = os.environ["TOOL_MODEL_NAME"]
-TOOL_MODEL_PROVIDER = os.environ["TOOL_MODEL_PROVIDER"]
-COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "education_data")
-print(f"使用的向量表是: {COLLECTION_NAME}")
-embedder = EmbeddingModel()
-chromadb_instance = ChromaDB(embedder=embedder)
-
-def query_deepseek(prompt):
-    try:
-        response = completion(provider=TOOL_MODEL_PROVIDER, model=TOOL_MODEL_NAME,
-                                   messages=[{"content": prompt, "role": "user"}],
-                                   api_base=TOOL_MODEL_API_BASE,
-                                   api_key=TOOL_MODEL_API_KEY
-                              )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-async def matchMajorByInfo(
-    infos: list[str],
-    tool_context: ToolContext,
-) -> str:
-    """
-    根据用户的个人情况（如兴趣、特长、期望薪资等）推荐合适的专业
-    params:
-    infos：用户的个人情况描述列表
-    :return: 返回所有可能的专业建议
-    """
-    agent_name = tool_context.agent_name
-    history_infos = tool_context.state.get("infos", [])
-    print(f"Agent {agent_name} 正在调用工具：matchMajorByInfo，传入的用户信息是：{infos}，历史信息有: {history_infos}")
-    history_infos.extend(infos)
-    history_infos = list(set(history_infos))
-    tool_context.state["infos"] = history_infos #更新症状
-
-    history_infos_text = ",".join(history_infos)
-    print(f"\n查询文本: '{history_infos_text}'")
-    query_results = chromadb_instance.query2collection(
-        collection=COLLECTION_NAME,
-        query_documents=[history_infos_text],
-        topk=2
-    )
-    print("查询结果:")
-    major_infos = []
-    for i in range(len(query_results["documents"][0])):
-        doc = query_results["documents"][0][i]
-        meta = query_results["metadatas"][0][i]
-        distance = query_results["distances"][0][i]
-        print(f"  文档: {doc[:50]}... (截断)")
-        print(f"  名称: {meta.get('name')}")
-        print(f"  距离: {distance:.4f}\n")
-        for one_data in education_data:
-            if one_data["name"] == meta["name"]:
-                major_infos.append(f"{meta.get('name')}: {one_data['matches']}")
-    major_infos_text = "\n".join(major_infos)
-    prompt = f"""
+# 细筛的prompt，{candidates}替换为向量粗筛得到的候选及其描述，{evidence}替换为用户提供的所有信息
+MATCH_PROMPT = """
 你是一位专业的教育规划师，擅长根据学生的个人情况（兴趣、特长、成绩、期望等），从专业数据库中推荐最适合的专业，并判断是否需要更多信息来精确推荐。
 
 以下是已知专业及其特点的描述：
 
 ```
-{major_infos_text}
+{candidates}
 ```
 
 请根据学生提供的个人情况，分析并返回可能适合的专业名称，并按照匹配程度排序。
@@ -97,7 +32,7 @@ async def matchMajorByInfo(
 **学生描述的个人情况如下：**
 
 ```
-{history_infos}
+{evidence}
 ```
 
 **请输出如下格式：**
@@ -109,20 +44,9 @@ async def matchMajorByInfo(
 3. 专业名称C：建议明确你对【未来工作城市、薪资期望】，以提高推荐准确性
 ```
 """
-    result = query_deepseek(prompt)
-    return result
 
-async def getMajorIntroduction(major_name: str, tool_context: ToolContext) -> str:
-    """
-    获取某个专业的详细介绍
-    params:
-    major_name: 专业名称
-    """
-    print(f"Agent {tool_context.agent_name} 正在调用工具：getMajorIntroduction，传入的专业名称是：{major_name}")
-    for one_data in education_data:
-        if one_data["name"] == major_name:
-            return one_data["treatment_plan"]
-    prompt = """
+# 数据集中没有对应的名称时，让工具模型生成内容的prompt，末尾会加上名称
+ADVICE_PROMPT = """
 ### 🎓 Prompt：专业介绍助手
 
 你是一位资深的教育顾问，擅长用**通俗易懂、吸引人**的语言为学生提供**详尽的专业介绍**。你能够整合最新的教育信息和行业趋势，提供全面的专业解读。
@@ -137,14 +61,45 @@ async def getMajorIntroduction(major_name: str, tool_context: ToolContext) -> st
 请确保回答内容结构清晰、信息丰富，能激发学生的兴趣。如果该专业有特殊的报考要求（如美术加试、身体条件限制），请一并注明。
 
 """
-    prompt += f"###  major_name: {major_name}"
-    response = query_deepseek(prompt)
-    return response
+
+engine = DecisionToolEngine(
+    records=education_data,
+    name_field="name",
+    document_field="matches",
+    advice_field="treatment_plan",
+    collection_name="education_data",
+    state_key="infos",
+    match_tool_name="matchMajorByInfo",
+    match_param="infos",
+    match_param_type=list[str],
+    match_description="""
+    根据用户的个人情况（如兴趣、特长、期望薪资等）推荐合适的专业
+    params:
+    infos：用户的个人情况描述列表
+    :return: 返回所有可能的专业建议
+    """,
+    match_prompt=MATCH_PROMPT,
+    evidence_label="用户信息",
+    advice_tool_name="getMajorIntroduction",
+    advice_param="major_name",
+    advice_description="""
+    获取某个专业的详细介绍
+    params:
+    major_name: 专业名称
+    """,
+    advice_prompt=ADVICE_PROMPT,
+    advice_label="专业名称",
+)
+matchMajorByInfo = engine.match_tool
+getMajorIntroduction = engine.advice_tool
 
 
 if __name__ == '__main__':
-    result = matchMajorByInfo(infos=['我喜欢画画，以后想学艺术相关的专业'])
+    import asyncio
+    from types import SimpleNamespace
+    tool_context = SimpleNamespace(agent_name="test", state={})
+    result = asyncio.run(matchMajorByInfo(infos=['我喜欢画画，以后想学艺术相关的专业'], tool_context=tool_context))
     print(result)
 
-    result = getMajorIntroduction(major_name='绘画')
+    result = asyncio.run(getMajorIntroduction(major_name='绘画', tool_context=tool_context))
     print(result)
@@ -28,11 +28,17 @@ instruction = """
    - 当用户提供个人情况时，必须使用工具 `matchFinancialProducts(infos)` 来获取可能的金融产品列表，**不要自行猜测产品名称**。
 
 4. **根据匹配结果继续处理**：
+   - **如果工具返回JSON格式的结论**(检索结果已经可以直接判断，没有经过大模型分析)：
+     - `{"verdict": "confident", "name": ..., "top_distance": ..., "gap": ..., "message": ...}`：`name` 就是匹配到的金融产品，按唯一金融产品处理，以 `name` 作为 `product_name` 调用 `getFinancialProductIntroduction(product_name)`，不需要再向用户追问；
+     - `{"verdict": "no_match", "candidates": [...], "top_distance": ..., "message": ...}`：数据库中没有足够匹配的金融产品，**不要**从 `candidates` 中挑选或猜测，按 `message` 向用户询问更多、更具体的个人情况(JSON后面有“建议追问”时，直接基于它提问)，合并后重新调用 `matchFinancialProducts(infos)`；
+     - `top_distance`、`gap` 是检索的距离，只用于判断，不要告诉用户。
+
    - **如果结果为唯一金融产品**：
      - 调用 `getFinancialProductIntroduction(product_name)` 工具，获取该产品的详细介绍，并以通俗易懂的语言向用户解释。
 
    - **如果有多个可能金融产品**：
-     - 请分析这些产品的特点，找出它们之间最具差异性的方面。
+     - 如果工具结果中有“建议追问”，直接基于其中的内容向用户提问，它是根据数据库本地计算出的最能区分这些候选的信息，不需要再自行分析；
+     - 没有“建议追问”时，请分析这些产品的特点，找出它们之间最具差异性的方面。
      - 仅基于这些差异点向用户提出**简洁、明确**的问题，例如：
        > “请问您更看重资金的流动性还是长期收益？”
 
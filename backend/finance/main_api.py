@@ -4,24 +4,13 @@ import os
 import click
 import uvicorn
 
-from DecisionAgent.adk_agent_executor import ADKAgentExecutor
+from DecisionAgent.agent_host import build_request_handler, build_a2a_app
 from dotenv import load_dotenv
-from google.adk.artifacts import InMemoryArtifactService
-from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from starlette.routing import Route
-from google.adk.agents.run_config import RunConfig, StreamingMode
-from a2a.server.apps import A2AStarletteApplication
-from a2a.server.request_handlers import DefaultRequestHandler
-from a2a.server.tasks import InMemoryTaskStore
-from starlette.middleware.cors import CORSMiddleware
 from a2a.types import (
     AgentCapabilities,
     AgentCard,
     AgentSkill,
 )
-from starlette.applications import Starlette
 from agent import root_agent
 
 # 加载环境变量
@@ -34,22 +23,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@click.command()
-@click.option("--host", "host", default="localhost", help="服务器绑定的主机名（默认为 localhost,可以指定具体本机ip）")
-@click.option("--port", "port", default=10012, help="服务器监听的端口号（默认为 10012）")
-def main(host, port):
-    """
-    启动 Agent 服务，支持流式和非流式两种模式。
-    """
-    logger.info("启动 Agent 服务")
-    streaming = os.environ.get("STREAMING") == "true"
-    logger.info(f"流式模式: {streaming}")
+agent_card_name = "Financial Planner Agent"
+agent_name = "financial_planner"
+# Agent描述必须清晰
+agent_description = "Based on the user's personal situation, recommend suitable financial products and provide detailed introductions."
 
-    agent_card_name = "Financial Planner Agent"
-    agent_name = "financial_planner"
-    # Agent描述必须清晰
-    agent_description = "Based on the user's personal situation, recommend suitable financial products and provide detailed introductions."
 
+def build_agent_card(url):
+    """
+    构建 agent 卡片信息，单独启动和在 main_host.py 中与其它领域一起启动时共用
+    """
     # 定义 agent 的技能
     skill = AgentSkill(
         id=agent_name,
@@ -59,11 +42,10 @@ def main(host, port):
         examples=["我风险偏好较低，想找一个稳健的投资产品"],
     )
 
-    # 构建 agent 卡片信息
-    agent_card = AgentCard(
+    return AgentCard(
         name=agent_card_name,
         description=agent_description,
-        url=f"http://{host}:{port}/",
+        url=url,
         version="1.0.0",
         defaultInputModes=["text"],
         defaultOutputModes=["text"],
@@ -71,49 +53,24 @@ def main(host, port):
         skills=[skill],
     )
 
-    # 初始化 Runner，管理 agent 的执行、会话、记忆和产物
-    runner = Runner(
-        app_name=agent_card.name,
-        agent=root_agent,
-        artifact_service=InMemoryArtifactService(),
-        session_service=InMemorySessionService(),
-        memory_service=InMemoryMemoryService(),
-    )
-
-    # 根据环境变量决定是否启用流式输出
-    if streaming:
-        logger.info("使用 SSE 流式输出模式")
-        run_config = RunConfig(
-            streaming_mode=StreamingMode.SSE,
-            max_llm_calls=500
-        )
-    else:
-        logger.info("使用普通输出模式")
-        run_config = RunConfig(
-            streaming_mode=StreamingMode.NONE,
-            max_llm_calls=500
-        )
+@click.command()
+@click.option("--host", "host", default="localhost", help="服务器绑定的主机名（默认为 localhost,可以指定具体本机ip）")
+@click.option("--port", "port", default=10012, help="服务器监听的端口号（默认为 10012）")
+def main(host, port):
+    """
+    启动 Agent 服务，支持流式和非流式两种模式。
+    """
+    logger.info("启动 Agent 服务")
+    streaming = os.environ.get("STREAMING") == "true"
+    logger.info(f"流式模式: {streaming}")
 
-    # 初始化 agent 执行器
-    agent_executor = ADKAgentExecutor(runner, agent_card, run_config)
+    agent_card = build_agent_card(f"http://{host}:{port}/")
 
-    # 请求处理器，管理任务存储和请求分发
-    request_handler = DefaultRequestHandler(
-        agent_executor=agent_executor, task_store=InMemoryTaskStore()
-    )
+    # 请求处理器，管理 agent 的执行、会话、记忆、产物和任务存储
+    request_handler = build_request_handler(root_agent, agent_card, streaming)
 
-    # 构建 Starlette 应用
-    a2a_app = A2AStarletteApplication(
-        agent_card=agent_card, http_handler=request_handler
-    )
-    app = a2a_app.build()
-    # CORS
-    app.add_middleware(
-        CORSMiddleware,
-        allow_origins=["*"],
-        allow_methods=["*"],
-        allow_headers=["*"],
-    )
+    # 构建 Starlette 应用，允许跨域
+    app = build_a2a_app(agent_card, request_handler)
     logger.info(f"服务启动中，监听地址: http://{host}:{port}")
     # 启动 uvicorn 服务器
     uvicorn.run(app, host=host, port=port)
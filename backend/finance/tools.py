@@ -5,85 +5,20 @@
 # @Author: johnson
 # @Contact : github: johnson7788
 # @Desc  :
-import os
-from litellm import completion
-from google.adk.tools import ToolContext
-from google.adk.tools.agent_tool import AgentTool
-from data import financial_data # 假设你有一个名为 financial_data 的新数据文件
-import time
-from datetime import datetime
-import random
 from dotenv import load_dotenv
-from DecisionAgent.embedding_utils import EmbeddingModel,ChromaDB
-# import litellm
-# litellm._turn_on_debug()
+from data import financial_data
+from DecisionAgent.decision_tools import DecisionToolEngine
 # 加载环境变量
 load_dotenv()
 
-TOOL_MODEL_API_BASE = os.environ["TOOL_MODEL_API_BASE"]
-TOOL_MODEL_API_KEY = os.environ["TOOL_MODEL_API_KEY"]
-TOOL_MODEL_NAME = os.environ["TOOL_MODEL_NAME"]
-TOOL_MODEL_PROVIDER = os.environ["TOOL_MODEL_PROVIDER"]
-COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "financial_data")
-print(f"使用的向量表是: {COLLECTION_NAME}")
-embedder = EmbeddingModel()
-chromadb_instance = ChromaDB(embedder=embedder)
-
-def query_deepseek(prompt):
-    try:
-        response = completion(provider=TOOL_MODEL_PROVIDER, model=TOOL_MODEL_NAME,
-                                   messages=[{"content": prompt, "role": "user"}],
-                                   api_base=TOOL_MODEL_API_BASE,
-                                   api_key=TOOL_MODEL_API_KEY
-                              )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-async def matchFinancialProducts(
-    infos: list[str],
-    tool_context: ToolContext,
-) -> str:
-    """
-    根据用户的个人情况（如风险偏好、投资期限、资金量、投资目标等）推荐合适的金融产品
-    params:
-    infos：用户的个人情况描述列表
-    :return: 返回所有可能的金融产品建议
-    """
-    agent_name = tool_context.agent_name
-    history_infos = tool_context.state.get("infos", [])
-    print(f"Agent {agent_name} 正在调用工具：matchFinancialProducts，传入的用户信息是：{infos}，历史信息有: {history_infos}")
-    history_infos.extend(infos)
-    history_infos = list(set(history_infos))
-    tool_context.state["infos"] = history_infos #更新症状
-
-    history_infos_text = ",".join(history_infos)
-    print(f"\n查询文本: '{history_infos_text}'")
-    query_results = chromadb_instance.query2collection(
-        collection=COLLECTION_NAME,
-        query_documents=[history_infos_text],
-        topk=2
-    )
-    print("查询结果:")
-    product_infos = []
-    for i in range(len(query_results["documents"][0])):
-        doc = query_results["documents"][0][i]
-        meta = query_results["metadatas"][0][i]
-        distance = query_results["distances"][0][i]
-        print(f"  文档: {doc[:50]}... (截断)")
-        print(f"  名称: {meta.get('name')}")
-        print(f"  距离: {distance:.4f}\n")
-        for one_data in financial_data:
-            if one_data["name"] == meta["name"]:
-                product_infos.append(f"{meta.get('name')}: {one_data['matches']}")
-    product_infos_text = "\n".join(product_infos)
-    prompt = f"""
+# 细筛的prompt，{candidates}替换为向量粗筛得到的候选及其描述，{evidence}替换为用户提供的所有信息
+MATCH_PROMPT = """
 你是一位专业的金融投资顾问，擅长根据客户的个人情况（风险偏好、投资期限、资金量、投资目标等），从金融产品数据库中推荐最适合的金融产品，并判断是否需要更多信息来精确推荐。
 
 以下是已知金融产品及其特点的描述：
 
 ```
-{product_infos_text}
+{candidates}
 ```
 
 请根据客户提供的个人情况，分析并返回可能适合的金融产品名称，并按照匹配程度排序。
@@ -97,7 +32,7 @@ async def matchFinancialProducts(
 **客户描述的个人情况如下：**
 
 ```
-{history_infos}
+{evidence}
 ```
 
 **请输出如下格式：**
@@ -109,20 +44,9 @@ async def matchFinancialProducts(
 3. 金融产品C：建议明确你对【流动性、风险承受能力】，以提高推荐准确性
 ```
 """
-    result = query_deepseek(prompt)
-    return result
 
-async def getFinancialProductIntroduction(product_name: str, tool_context: ToolContext) -> str:
-    """
-    获取某个金融产品的详细介绍
-    params:
-    product_name: 金融产品名称
-    """
-    print(f"Agent {tool_context.agent_name} 正在调用工具：getFinancialProductIntroduction，传入的金融产品名称是：{product_name}")
-    for one_data in financial_data:
-        if one_data["name"] == product_name:
-            return one_data["treatment_plan"]
-    prompt = """
+# 数据集中没有对应的名称时，让工具模型生成内容的prompt，末尾会加上名称
+ADVICE_PROMPT = """
 ### 💰 Prompt：金融产品介绍助手
 
 你是一位资深的金融顾问，擅长用**通俗易懂、吸引人**的语言为客户提供**详尽的金融产品介绍**。你能够整合最新的金融信息和市场趋势，提供全面的产品解读。
@@ -137,17 +61,45 @@ async def getFinancialProductIntroduction(product_name: str, tool_context: ToolC
 请确保回答内容结构清晰、信息丰富，能激发客户的兴趣。如果该产品有特殊的购买要求（如起投金额、购买渠道），请一并注明。
 
 """
-    prompt += f"###  product_name: {product_name}"
-    response = query_deepseek(prompt)
-    return response
+
+engine = DecisionToolEngine(
+    records=financial_data,
+    name_field="name",
+    document_field="matches",
+    advice_field="treatment_plan",
+    collection_name="financial_data",
+    state_key="infos",
+    match_tool_name="matchFinancialProducts",
+    match_param="infos",
+    match_param_type=list[str],
+    match_description="""
+    根据用户的个人情况（如风险偏好、投资期限、资金量、投资目标等）推荐合适的金融产品
+    params:
+    infos：用户的个人情况描述列表
+    :return: 返回所有可能的金融产品建议
+    """,
+    match_prompt=MATCH_PROMPT,
+    evidence_label="用户信息",
+    advice_tool_name="getFinancialProductIntroduction",
+    advice_param="product_name",
+    advice_description="""
+    获取某个金融产品的详细介绍
+    params:
+    product_name: 金融产品名称
+    """,
+    advice_prompt=ADVICE_PROMPT,
+    advice_label="金融产品名称",
+)
+matchFinancialProducts = engine.match_tool
+getFinancialProductIntroduction = engine.advice_tool
 
 
 if __name__ == '__main__':
-    # 假设 financial_data 已经定义
-    # from data import financial_data
-    # result = matchFinancialProducts(infos=['我希望投资风险较低，收益稳健的产品'])
+    import asyncio
+    from types import SimpleNamespace
+    tool_context = SimpleNamespace(agent_name="test", state={})
+    # result = asyncio.run(matchFinancialProducts(infos=['我希望投资风险较低，收益稳健的产品'], tool_context=tool_context))
     # print(result)
 
-    # result = getFinancialProductIntroduction(product_name='货币基金')
+    # result = asyncio.run(getFinancialProductIntroduction(product_name='货币基金', tool_context=tool_context))
     # print(result)
-    pass
\ No newline at end of file
@@ -28,11 +28,17 @@ instruction = """
    - 当用户提供案情描述时，必须使用工具 `matchLawByInfo(infos)` 来获取相关的法律法规列表，**不要自行猜测法律名称**。
 
 4. **根据匹配结果继续处理**：
+   - **如果工具返回JSON格式的结论**(检索结果已经可以直接判断，没有经过大模型分析)：
+     - `{"verdict": "confident", "name": ..., "top_distance": ..., "gap": ..., "message": ...}`：`name` 就是匹配到的法律，按唯一法律处理，以 `name` 作为 `law_name` 调用 `getLawIntroduction(law_name)`，不需要再向用户追问；
+     - `{"verdict": "no_match", "candidates": [...], "top_distance": ..., "message": ...}`：数据库中没有足够匹配的法律，**不要**从 `candidates` 中挑选或猜测，按 `message` 向用户询问更多、更具体的案情(JSON后面有“建议追问”时，直接基于它提问)，合并后重新调用 `matchLawByInfo(infos)`；
+     - `top_distance`、`gap` 是检索的距离，只用于判断，不要告诉用户。
+
    - **如果结果为唯一法律**：
      - 调用 `getLawIntroduction(law_name)` 工具，获取该法律的详细介绍，并以通俗易懂的语言向用户解释。
 
    - **如果有多个可能涉及的法律**：
-     - 请分析这些法律的适用范围，找出它们之间最具差异性的方面。
+     - 如果工具结果中有“建议追问”，直接基于其中的内容向用户提问，它是根据数据库本地计算出的最能区分这些候选的信息，不需要再自行分析；
+     - 没有“建议追问”时，请分析这些法律的适用范围，找出它们之间最具差异性的方面。
      - 仅基于这些差异点向用户提出**简洁、明确**的问题，例如：
        > “请问您的纠纷是关于劳动合同还是普通的民事合同？”
 
@@ -5,85 +5,20 @@
 # @Author: johnson
 # @Contact : github: johnson7788
 # @Desc  :
-import os
-from litellm import completion
-from google.adk.tools import ToolContext
-from google.adk.tools.agent_tool import AgentTool
-from data import law_data
-import time
-from datetime import datetime
-import random
 from dotenv import load_dotenv
-from DecisionAgent.embedding_utils import EmbeddingModel,ChromaDB
-# import litellm
-# litellm._turn_on_debug()
+from data import law_data
+from DecisionAgent.decision_tools import DecisionToolEngine
 # 加载环境变量
 load_dotenv()
 
-TOOL_MODEL_API_BASE = os.environ["TOOL_MODEL_API_BASE"]
-TOOL_MODEL_API_KEY = os.environ["TOOL_MODEL_API_KEY"]
-TOOL_MODEL_NAME = os.environ["TOOL_MODEL_NAME"]
-TOOL_MODEL_PROVIDER = os.environ["TOOL_MODEL_PROVIDER"]
-COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "law_data")
-print(f"使用的向量表是: {COLLECTION_NAME}")
-embedder = EmbeddingModel()
-chromadb_instance = ChromaDB(embedder=embedder)
-
-def query_deepseek(prompt):
-    try:
-        response = completion(provider=TOOL_MODEL_PROVIDER, model=TOOL_MODEL_NAME,
-                                   messages=[{"content": prompt, "role": "user"}],
-                                   api_base=TOOL_MODEL_API_BASE,
-                                   api_key=TOOL_MODEL_API_KEY
-                              )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-async def matchLawByInfo(
-    infos: list[str],
-    tool_context: ToolContext,
-) -> str:
-    """
-    根据用户的案情描述（如劳动纠纷、合同问题等）推荐相关的法律法规
-    params:
-    infos：用户的案情描述列表
-    :return: 返回所有可能适用的法律建议
-    """
-    agent_name = tool_context.agent_name
-    history_infos = tool_context.state.get("infos", [])
-    print(f"Agent {agent_name} 正在调用工具：matchLawByInfo，传入的用户信息是：{infos}，历史信息有: {history_infos}")
-    history_infos.extend(infos)
-    history_infos = list(set(history_infos))
-    tool_context.state["infos"] = history_infos #更新案情
-
-    history_infos_text = ",".join(history_infos)
-    print(f"\n查询文本: '{history_infos_text}'")
-    query_results = chromadb_instance.query2collection(
-        collection=COLLECTION_NAME,
-        query_documents=[history_infos_text],
-        topk=2
-    )
-    print("查询结果:")
-    law_infos = []
-    for i in range(len(query_results["documents"][0])):
-        doc = query_results["documents"][0][i]
-        meta = query_results["metadatas"][0][i]
-        distance = query_results["distances"][0][i]
-        print(f"  文档: {doc[:50]}... (截断)")
-        print(f"  名称: {meta.get('name')}")
-        print(f"  距离: {distance:.4f}\n")
-        for one_data in law_data:
-            if one_data["name"] == meta["name"]:
-                law_infos.append(f"{meta.get('name')}: {one_data['matches']}")
-    law_infos_text = "\n".join(law_infos)
-    prompt = f"""
+# 细筛的prompt，{candidates}替换为向量粗筛得到的候选及其描述，{evidence}替换为用户提供的所有信息
+MATCH_PROMPT = """
 你是一位专业的法律顾问，擅长根据用户的案情描述，从法律数据库中推荐最相关的法律法规，并判断是否需要更多信息来精确推荐。
 
 以下是已知法律及其适用范围的描述：
 
 ```
-{law_infos_text}
+{candidates}
 ```
 
 请根据用户提供的案情描述，分析并返回可能适用的法律名称，并按照相关性排序。
@@ -97,7 +32,7 @@ async def matchLawByInfo(
 **用户描述的案情如下：**
 
 ```
-{history_infos}
+{evidence}
 ```
 
 **请输出如下格式：**
@@ -109,20 +44,9 @@ async def matchLawByInfo(
 3. 法律名称C：建议明确您的【婚姻状态、财产分割意愿】，以提高推荐准确性
 ```
 """
-    result = query_deepseek(prompt)
-    return result
 
-async def getLawIntroduction(law_name: str, tool_context: ToolContext) -> str:
-    """
-    获取某个法律的详细介绍
-    params:
-    law_name: 法律名称
-    """
-    print(f"Agent {tool_context.agent_name} 正在调用工具：getLawIntroduction，传入的法律名称是：{law_name}")
-    for one_data in law_data:
-        if one_data["name"] == law_name:
-            return one_data["treatment_plan"]
-    prompt = """
+# 数据集中没有对应的名称时，让工具模型生成内容的prompt，末尾会加上名称
+ADVICE_PROMPT = """
 ### ⚖️ Prompt：法律介绍助手
 
 你是一位资深的法律顾问，擅长用**通俗易懂、清晰明了**的语言为用户提供**详尽的法律介绍**。你能够整合最新的法律法规，提供全面的法律解读。
@@ -137,14 +61,48 @@ async def getLawIntroduction(law_name: str, tool_context: ToolContext) -> str:
 请确保回答内容结构清晰、信息准确，能帮助用户理解法律。
 
 """
-    prompt += f"###  law_name: {law_name}"
-    response = query_deepseek(prompt)
-    return response
+
+engine = DecisionToolEngine(
+    records=law_data,
+    name_field="name",
+    document_field="matches",
+    advice_field="treatment_plan",
+    collection_name="law_data",
+    state_key="infos",
+    match_tool_name="matchLawByInfo",
+    match_param="infos",
+    match_param_type=list[str],
+    match_description="""
+    根据用户的案情描述（如劳动纠纷、合同问题等）推荐相关的法律法规
+    params:
+    infos：用户的案情描述列表
+    :return: 返回所有可能适用的法律建议
+    """,
+    match_prompt=MATCH_PROMPT,
+    evidence_label="用户信息",
+    advice_tool_name="getLawIntroduction",
+    advice_param="law_name",
+    advice_description="""
+    获取某个法律的详细介绍
+    params:
+    law_name: 法律名称
+    """,
+    advice_prompt=ADVICE_PROMPT,
+    advice_label="法律名称",
+    # 法律名称只差这些字时认为是同一个，例如"劳动法"和"中华人民共和国劳动法"
+    name_prefixes=("中华人民共和国", "中国"),
+    name_suffixes=("法",),
+)
+matchLawByInfo = engine.match_tool
+getLawIntroduction = engine.advice_tool
 
 
 if __name__ == '__main__':
-    result = matchLawByInfo(infos=['我遇到了劳动纠纷，公司拖欠我的工资'])
+    import asyncio
+    from types import SimpleNamespace
+    tool_context = SimpleNamespace(agent_name="test", state={})
+    result = asyncio.run(matchLawByInfo(infos=['我遇到了劳动纠纷，公司拖欠我的工资'], tool_context=tool_context))
     print(result)
 
-    result = getLawIntroduction(law_name='中华人民共和国劳动法')
-    print(result)
\ No newline at end of file
+    result = asyncio.run(getLawIntroduction(law_name='中华人民共和国劳动法', tool_context=tool_context))
+    print(result)
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : main_host.py
+# @Desc  : 在1个进程中启动多个领域的Agent，每个领域挂载在/<领域名>/路径下，共享embedding模型、向量库、连接池和线程池
+import logging
+import os
+
+import click
+import uvicorn
+from dotenv import load_dotenv
+from DecisionAgent.agent_host import build_host_app
+
+# 加载backend目录下的环境变量，优先于各领域目录下的.env
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DOMAINS = ["doctor", "law", "finance", "education", "business", "customer_service", "mental_health"]
+
+
+@click.command()
+@click.option("--host", "host", default="localhost", help="服务器绑定的主机名（默认为 localhost,可以指定具体本机ip）")
+@click.option("--port", "port", default=10012, help="服务器监听的端口号（默认为 10012）")
+@click.option("--domains", "domains", default=",".join(DOMAINS), help="启动的领域，逗号分隔（默认为全部领域）")
+def main(host, port, domains):
+    """
+    启动多领域 Agent 服务，例如 http://localhost:10012/doctor/ 是医生 Agent 的 A2A 地址
+    """
+    streaming = os.environ.get("STREAMING") == "true"
+    logger.info(f"流式模式: {streaming}")
+    domains = [domain.strip() for domain in domains.split(",") if domain.strip()]
+    app = build_host_app(BASE_DIR, domains, f"http://{host}:{port}", streaming)
+    logger.info(f"服务启动中，监听地址: http://{host}:{port}，领域: {domains}")
+    uvicorn.run(app, host=host, port=port)
+
+
+if __name__ == "__main__":
+    main()
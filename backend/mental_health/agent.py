@@ -8,7 +8,7 @@ from google.adk.tools.tool_context import ToolContext
 from google.adk.tools import BaseTool
 from typing import Dict, List, Any, AsyncGenerator, Optional, Union
 from DecisionAgent.create_model import create_model
-from tools import matchMajorByInfo,getMajorIntroduction
+from tools import diagnoseMentalHealth,provideCopingStrategies
 from dotenv import load_dotenv
 load_dotenv()
 
@@ -28,11 +28,17 @@ instruction = """
    - 当用户提供症状时，必须使用工具 `diagnoseMentalHealth(symptoms)` 来获取可能的心理健康问题列表，**不要自行猜测诊断结果**。
 
 4. **根据诊断结果继续处理**：
+   - **如果工具返回JSON格式的结论**(检索结果已经可以直接判断，没有经过大模型分析)：
+     - `{"verdict": "confident", "name": ..., "top_distance": ..., "gap": ..., "message": ...}`：`name` 就是匹配到的心理健康问题，按唯一心理健康问题处理，以 `name` 作为 `problem_name` 调用 `provideCopingStrategies(problem_name)`，不需要再向用户追问；
+     - `{"verdict": "no_match", "candidates": [...], "top_distance": ..., "message": ...}`：数据库中没有足够匹配的心理健康问题，**不要**从 `candidates` 中挑选或猜测，按 `message` 向用户询问更多、更具体的症状(JSON后面有“建议追问”时，直接基于它提问)，合并后重新调用 `diagnoseMentalHealth(symptoms)`；
+     - `top_distance`、`gap` 是检索的距离，只用于判断，不要告诉用户。
+
    - **如果结果为唯一问题**：
      - 调用 `provideCopingStrategies(problem_name)` 工具，获取该心理健康问题的详细应对策略和建议，并以通俗易懂的语言向用户解释。
 
    - **如果有多个可能问题**：
-     - 请分析这些问题的特点，找出它们之间最具差异性的方面。
+     - 如果工具结果中有“建议追问”，直接基于其中的内容向用户提问，它是根据数据库本地计算出的最能区分这些候选的信息，不需要再自行分析；
+     - 没有“建议追问”时，请分析这些问题的特点，找出它们之间最具差异性的方面。
      - 仅基于这些差异点向用户提出**简洁、明确**的问题，例如：
        > “请问你的困扰主要集中在情绪波动还是身体不适方面？”
 
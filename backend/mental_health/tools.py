@@ -5,85 +5,20 @@
 # @Author: johnson
 # @Contact : github: johnson7788
 # @Desc  :
-import os
-from litellm import completion
-from google.adk.tools import ToolContext
-from google.adk.tools.agent_tool import AgentTool
-from data import mental_health_data
-import time
-from datetime import datetime
-import random
 from dotenv import load_dotenv
-from DecisionAgent.embedding_utils import EmbeddingModel,ChromaDB
-# import litellm
-# litellm._turn_on_debug()
+from data import mental_health_data
+from DecisionAgent.decision_tools import DecisionToolEngine
 # 加载环境变量
 load_dotenv()
 
-TOOL_MODEL_API_BASE = os.environ["TOOL_MODEL_API_BASE"]
-TOOL_MODEL_API_KEY = os.environ["TOOL_MODEL_API_KEY"]
-TOOL_MODEL_NAME = os.environ["TOOL_MODEL_NAME"]
-TOOL_MODEL_PROVIDER = os.environ["TOOL_MODEL_PROVIDER"]
-COLLECTION_NAME = os.environ.get("COLLECTION_NAME", "mental_health_data")
-print(f"使用的向量表是: {COLLECTION_NAME}")
-embedder = EmbeddingModel()
-chromadb_instance = ChromaDB(embedder=embedder)
-
-def query_deepseek(prompt):
-    try:
-        response = completion(provider=TOOL_MODEL_PROVIDER, model=TOOL_MODEL_NAME,
-                                   messages=[{"content": prompt, "role": "user"}],
-                                   api_base=TOOL_MODEL_API_BASE,
-                                   api_key=TOOL_MODEL_API_KEY
-                              )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-async def diagnoseMentalHealth(
-    symptoms: list[str],
-    tool_context: ToolContext,
-) -> str:
-    """
-    根据用户的心理困扰或情绪问题（如焦虑、失眠、情绪低落等）诊断可能的心理健康问题
-    params:
-    symptoms：用户的心理困扰或情绪问题描述列表
-    :return: 返回所有可能的心理健康问题建议
-    """
-    agent_name = tool_context.agent_name
-    history_symptoms = tool_context.state.get("symptoms", [])
-    print(f"Agent {agent_name} 正在调用工具：diagnoseMentalHealth，传入的用户信息是：{symptoms}，历史信息有: {history_symptoms}")
-    history_symptoms.extend(symptoms)
-    history_symptoms = list(set(history_symptoms))
-    tool_context.state["symptoms"] = history_symptoms #更新症状
-
-    history_symptoms_text = ",".join(history_symptoms)
-    print(f"\n查询文本: '{history_symptoms_text}'")
-    query_results = chromadb_instance.query2collection(
-        collection=COLLECTION_NAME,
-        query_documents=[history_symptoms_text],
-        topk=2
-    )
-    print("查询结果:")
-    problem_infos = []
-    for i in range(len(query_results["documents"][0])):
-        doc = query_results["documents"][0][i]
-        meta = query_results["metadatas"][0][i]
-        distance = query_results["distances"][0][i]
-        print(f"  文档: {doc[:50]}... (截断)")
-        print(f"  名称: {meta.get('name')}")
-        print(f"  距离: {distance:.4f}\n")
-        for one_data in mental_health_data:
-            if one_data["name"] == meta["name"]:
-                problem_infos.append(f"{meta.get('name')}: {one_data['symptoms']}")
-    problem_infos_text = "\n".join(problem_infos)
-    prompt = f"""
+# 细筛的prompt，{candidates}替换为向量粗筛得到的候选及其描述，{evidence}替换为用户提供的所有信息
+MATCH_PROMPT = """
 你是一位专业的心理健康咨询师，擅长根据用户的心理困扰或情绪问题，从心理健康问题数据库中诊断最可能的问题，并判断是否需要更多信息来精确诊断。
 
 以下是已知心理健康问题及其症状的描述：
 
 ```
-{problem_infos_text}
+{candidates}
 ```
 
 请根据用户提供的心理困扰或情绪问题，分析并返回可能适合的心理健康问题名称，并按照匹配程度排序。
@@ -97,7 +32,7 @@ async def diagnoseMentalHealth(
 **用户描述的心理困扰或情绪问题如下：**
 
 ```
-{history_symptoms}
+{evidence}
 ```
 
 **请输出如下格式：**
@@ -109,20 +44,9 @@ async def diagnoseMentalHealth(
 3. 睡眠障碍：建议明确你对【入睡困难、睡眠质量】，以提高诊断准确性
 ```
 """
-    result = query_deepseek(prompt)
-    return result
 
-async def provideCopingStrategies(problem_name: str, tool_context: ToolContext) -> str:
-    """
-    获取某个心理健康问题的详细应对策略
-    params:
-    problem_name: 心理健康问题名称
-    """
-    print(f"Agent {tool_context.agent_name} 正在调用工具：provideCopingStrategies，传入的心理健康问题名称是：{problem_name}")
-    for one_data in mental_health_data:
-        if one_data["name"] == problem_name:
-            return one_data["treatment_plan"]
-    prompt = """
+# 数据集中没有对应的名称时，让工具模型生成内容的prompt，末尾会加上名称
+ADVICE_PROMPT = """
 ### 🧠 Prompt：心理健康应对策略助手
 
 你是一位专业的心理健康咨询师，擅长用**通俗易懂、富有同理心**的语言为用户提供**详尽的心理健康应对策略**。你能够整合最新的心理学研究和实践经验，提供全面的问题解读和实用建议。
@@ -137,14 +61,45 @@ async def provideCopingStrategies(problem_name: str, tool_context: ToolContext)
 请确保回答内容结构清晰、信息丰富，能帮助用户更好地理解和应对自己的心理问题。如果该问题有特殊的干预方法（如认知行为疗法、药物治疗），请一并注明。
 
 """
-    prompt += f"###  problem_name: {problem_name}"
-    response = query_deepseek(prompt)
-    return response
+
+engine = DecisionToolEngine(
+    records=mental_health_data,
+    name_field="name",
+    document_field="matches",
+    advice_field="treatment_plan",
+    collection_name="mental_health_data",
+    state_key="symptoms",
+    match_tool_name="diagnoseMentalHealth",
+    match_param="symptoms",
+    match_param_type=list[str],
+    match_description="""
+    根据用户的心理困扰或情绪问题（如焦虑、失眠、情绪低落等）诊断可能的心理健康问题
+    params:
+    symptoms：用户的心理困扰或情绪问题描述列表
+    :return: 返回所有可能的心理健康问题建议
+    """,
+    match_prompt=MATCH_PROMPT,
+    evidence_label="用户信息",
+    advice_tool_name="provideCopingStrategies",
+    advice_param="problem_name",
+    advice_description="""
+    获取某个心理健康问题的详细应对策略
+    params:
+    problem_name: 心理健康问题名称
+    """,
+    advice_prompt=ADVICE_PROMPT,
+    advice_label="心理健康问题名称",
+)
+diagnoseMentalHealth = engine.match_tool
+provideCopingStrategies = engine.advice_tool
 
 
 if __name__ == '__main__':
-    result = diagnoseMentalHealth(symptoms=['我最近感到很焦虑，晚上睡不着觉，怎么办？'])
+    import asyncio
+    from types import SimpleNamespace
+    tool_context = SimpleNamespace(agent_name="test", state={})
+    result = asyncio.run(diagnoseMentalHealth(symptoms=['我最近感到很焦虑，晚上睡不着觉，怎么办？'], tool_context=tool_context))
     print(result)
 
-    result = provideCopingStrategies(problem_name='焦虑症')
+    result = asyncio.run(provideCopingStrategies(problem_name='焦虑症', tool_context=tool_context))
     print(result)
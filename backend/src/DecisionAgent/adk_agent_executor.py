@@ -1,10 +1,12 @@
 import asyncio
+import contextlib
 import logging
 
 from collections.abc import AsyncGenerator,AsyncIterable
 from google.adk import Runner
 
 from google.adk.events import Event
+from google.adk.agents.run_config import StreamingMode
 from google.genai import types
 from typing import Any, Dict, List, Literal, Optional, Union
 from a2a.server.agent_execution import AgentExecutor
@@ -31,10 +33,14 @@ from a2a.types import (
     TaskStatus,
     TextPart,
     DataPart,
-    UnsupportedOperationError,
+    TaskNotCancelableError,
 )
 from a2a.utils.errors import ServerError
 from a2a.utils.message import new_agent_text_message
+from DecisionAgent.session_store import read_session_state
+from DecisionAgent.stream_coalescer import StreamCoalescer, coalesced_events
+from DecisionAgent.task_store import TERMINAL_STATES
+from DecisionAgent.admission import AdmissionController, AdmissionRejected
 
 
 logger = logging.getLogger(__name__)
@@ -44,11 +50,18 @@ logger.setLevel(logging.DEBUG)
 class ADKAgentExecutor(AgentExecutor):
     """An AgentExecutor that runs an ADK-based Agent."""
 
-    def __init__(self, runner: Runner, card: AgentCard, run_config):
+    def __init__(self, runner: Runner, card: AgentCard, run_config, admission: AdmissionController | None = None):
         self.runner = runner
         self._card = card
+        # 准入控制，不传时不限制并发
+        self.admission = admission
 
         self._running_sessions = {}
+        # task_id -> (运行Agent的asyncio任务, 事件队列, Agent停止并发送canceled之后设置的Event)，用于取消
+        self._running_tasks: dict[str, tuple[asyncio.Task, EventQueue, asyncio.Event]] = {}
+        # 由cancel或者abort发起取消的任务，只有这些任务的CancelledError在execute中处理，其它取消(例如服务关闭)继续抛出
+        # cancel发起时值为cancel返回前设置的Event，abort发起时为None
+        self._cancel_requested: dict[str, asyncio.Event | None] = {}
         self.run_config = run_config
 
     def _run_agent(
@@ -66,41 +79,72 @@ class ADKAgentExecutor(AgentExecutor):
         task_updater: TaskUpdater,
         metadata: dict | None = None
     ) -> None:
-        # The call to self._upsert_session was returning a coroutine object,
-        # leading to an AttributeError when trying to access .id on it directly.
-        # We need to await the coroutine to get the actual session object.
         # metadata用户传入的原数据
-        session_obj = await self._upsert_session(
+        # 只确认会话存在，不读取完整的会话，避免每轮复制整个事件列表
+        session_id = await self._upsert_session(
             session_id,metadata
         )
         logger.debug(f"收到请求信息: {new_message}")
-        # Update session_id with the ID from the resolved session object
-        # to be used in self._run_agent.
-        session_id = session_obj.id
+        # SSE模式下合并模型的增量文本，攒够一定的字节数、时间或者1句话结束时才发送1次
+        coalescer = StreamCoalescer.from_env() if self.run_config.streaming_mode == StreamingMode.SSE else None
+        events = self._run_agent(session_id, new_message)
+        if coalescer is not None:
+            # 模型停顿时，缓存的文本在超过时间阈值后就发送，不等待下1段文本
+            events = coalesced_events(events, coalescer)
 
-        async for event in self._run_agent(session_id, new_message):
+        async with contextlib.aclosing(events):
+            async for event in events:
+                if coalescer is not None:
+                    if event is None:
+                        text = coalescer.flush()
+                        if text:
+                            await self._send_text(task_updater, text)
+                        continue
+                    if event.partial:
+                        text = self._coalesce(coalescer, event)
+                        if text:
+                            await self._send_text(task_updater, text)
+                        continue
+                    # 非增量的事件之前，先发送缓存的文本，保持顺序
+                    text = coalescer.flush()
+                    if text:
+                        await self._send_text(task_updater, text)
 
-            if event.is_final_response():
-                final_session = await self.runner.session_service.get_session(
-                    app_name=self.runner.app_name, user_id="self", session_id=session_id
-                )
-                print("最终的session中的结果final_session中的state: ", final_session.state)
-                final_metadata = final_session.state.get("metadata")
-                parts = convert_genai_parts_to_a2a(event.content.parts)
-                logger.debug("Yielding final response: %s", parts)
-                await task_updater.add_artifact(parts, metadata=final_metadata)
-                await task_updater.complete()
-                break
-            if not event.get_function_calls():
-                logger.debug(f"Yielding update response, {event}")
-                await task_updater.update_status(
-                    TaskState.working,
-                    message=task_updater.new_agent_message(
-                        convert_genai_parts_to_a2a(event.content.parts),
-                    ),
-                )
-            else:
-                logger.info(f"Skipping event, {event}")
+                if event.is_final_response():
+                    # 只读取state，不复制事件列表
+                    final_state = await read_session_state(
+                        self.runner.session_service, self.runner.app_name, "self", session_id
+                    ) or {}
+                    # 查询向量只用于检索，不打印
+                    print("最终的session中的结果final_session中的state: ", {k: v for k, v in final_state.items() if not k.endswith("_query_vector")})
+                    final_metadata = final_state.get("metadata")
+                    parts = convert_genai_parts_to_a2a(event.content.parts)
+                    logger.debug("Yielding final response: %s", parts)
+                    await task_updater.add_artifact(parts, metadata=final_metadata)
+                    await task_updater.complete()
+                    break
+                if not event.get_function_calls():
+                    logger.debug(f"Yielding update response, {event}")
+                    await task_updater.update_status(
+                        TaskState.working,
+                        message=task_updater.new_agent_message(
+                            convert_genai_parts_to_a2a(event.content.parts),
+                        ),
+                    )
+                else:
+                    logger.info(f"Skipping event, {event}")
+
+    def _coalesce(self, coalescer: StreamCoalescer, event: Event) -> str | None:
+        """Buffers the text of a partial event, returns the text to send if a threshold is reached."""
+        if not event.content or not event.content.parts:
+            return None
+        return coalescer.add("".join(part.text for part in event.content.parts if part.text))
+
+    async def _send_text(self, task_updater: TaskUpdater, text: str) -> None:
+        await task_updater.update_status(
+            TaskState.working,
+            message=task_updater.new_agent_message([TextPart(text=text)]),
+        )
 
     async def execute(
         self,
@@ -112,41 +156,113 @@ class ADKAgentExecutor(AgentExecutor):
         # Immediately notify that the task is submitted.
         if not context.current_task:
             await updater.submit()
-        await updater.start_work()
-        await self._process_request(
-            types.UserContent(
-                parts=convert_a2a_parts_to_genai(context.message.parts),
-            ),
-            context.context_id,
-            updater,
-            metadata=context.message.metadata
-        )
+        # 在单独的任务中运行Agent，取消时正在进行的模型请求、工具调用和向量查询都会收到CancelledError
+        run = asyncio.create_task(self._admit_and_process(context, updater))
+        unwound = asyncio.Event()
+        self._running_tasks[context.task_id] = (run, event_queue, unwound)
+        try:
+            await run
+        except AdmissionRejected as e:
+            logger.warning(f"拒绝任务: {context.task_id}, {e}, {self.admission.stats()}")
+            await updater.reject(message=updater.new_agent_message([TextPart(text=str(e))]))
+            return
+        except asyncio.CancelledError:
+            run.cancel()
+            await asyncio.wait([run])
+            if context.task_id not in self._cancel_requested:
+                # 不是cancel或者abort发起的取消(例如服务关闭)，Agent停止后继续抛出
+                raise
+            # Agent已经停止，之后不会再有其它事件，最后发送canceled状态
+            await updater.cancel()
+            unwound.set()
+            logger.info(f"任务已取消: {context.task_id}")
+            released = self._cancel_requested[context.task_id]
+            if released is not None:
+                # tasks/cancel中cancel返回后，DefaultRequestHandler会立即取消运行execute的任务，
+                # 在这里等待并吸收这次取消，事件队列由它正常关闭
+                try:
+                    await released.wait()
+                except asyncio.CancelledError:
+                    asyncio.current_task().uncancel()
+            return
+        finally:
+            self._running_tasks.pop(context.task_id, None)
+            self._cancel_requested.pop(context.task_id, None)
+            unwound.set()
         logger.debug("[adk agent ] 执行完成，退出")
 
+    async def _admit_and_process(self, context: RequestContext, updater: TaskUpdater) -> None:
+        """
+        Waits for an admission slot (one run per session, bounded concurrency),
+        then runs the agent. While queued the task stays in the submitted state.
+        """
+        new_message = types.UserContent(
+            parts=convert_a2a_parts_to_genai(context.message.parts),
+        )
+        if self.admission is None:
+            await updater.start_work()
+            await self._process_request(new_message, context.context_id, updater, metadata=context.message.metadata)
+            return
+        # 多个领域共用1个准入控制时，会话按app_name区分
+        async with self.admission.slot((self.runner.app_name, context.context_id)):
+            await updater.start_work()
+            await self._process_request(new_message, context.context_id, updater, metadata=context.message.metadata)
+
+    async def abort(self, task_id: str) -> bool:
+        """
+        Cancels the running agent of a task and waits until it has unwound.
+        Returns False if the task has no running agent.
+        """
+        running = self._running_tasks.get(task_id)
+        if running is None:
+            return False
+        run, _, _ = running
+        self._cancel_requested.setdefault(task_id, None)
+        run.cancel()
+        await asyncio.wait([run])
+        return True
+
     async def cancel(self, context: RequestContext, event_queue: EventQueue):
-        # Ideally: kill any ongoing tasks.
-        raise ServerError(error=UnsupportedOperationError())
+        # 已经结束的任务不能取消
+        if context.current_task and context.current_task.status.state in TERMINAL_STATES:
+            raise ServerError(error=TaskNotCancelableError())
+        running = self._running_tasks.get(context.task_id)
+        if running is None:
+            updater = TaskUpdater(event_queue, context.task_id, context.context_id)
+            await updater.cancel()
+            return
+        # 运行中的任务由execute在Agent停止后发送canceled状态到它的事件队列，
+        # 正在等待结果的请求和取消请求都能收到，之后不会再有迟到的事件
+        run, _, unwound = running
+        released = asyncio.Event()
+        self._cancel_requested[context.task_id] = released
+        run.cancel()
+        try:
+            await unwound.wait()
+        finally:
+            released.set()
 
     async def _upsert_session(self, session_id: str, metadata={}):
         """
-        Retrieves a session if it exists, otherwise creates a new one.
-        Ensures that async session service methods are properly awaited.
+        Creates the session if it does not exist yet and returns its id.
+        Existence is checked through the state-only read path, so the event
+        history is never copied here.
         """
-        session = await self.runner.session_service.get_session(
-            app_name=self.runner.app_name, user_id="self", session_id=session_id
+        state = await read_session_state(
+            self.runner.session_service, self.runner.app_name, "self", session_id
+        )
+        if state is not None:
+            return session_id
+        session = await self.runner.session_service.create_session(
+            app_name=self.runner.app_name, user_id="self", session_id=session_id, state={"metadata":metadata}
         )
-        if session is None:
-            session = await self.runner.session_service.create_session(
-                app_name=self.runner.app_name, user_id="self", session_id=session_id, state={"metadata":metadata}
-            )
         # According to ADK InMemorySessionService, create_session should always return a Session object.
         if session is None:
             logger.error(
                 f"Critical error: Session is None even after create_session for session_id: {session_id}"
             )
             raise RuntimeError(f"Failed to get or create session: {session_id}")
-        return session
-
+        return session.id
 
 def convert_a2a_parts_to_genai(parts: list[Part]) -> list[types.Part]:
     """Convert a list of A2A Part types into a list of Google Gen AI Part types."""
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : admission.py
+# @Desc  : Agent运行的准入控制，限制同时运行的数量，排队有上限，超出时立即拒绝，同一个会话的消息按顺序运行，不同会话之间轮流调度
+
+import os
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionRejected(Exception):
+    """
+    排队已满或者等待超时，请求被拒绝
+    """
+
+
+class AdmissionController(object):
+    def __init__(self, max_concurrent=8, max_queued=64, queue_timeout=30.0):
+        """
+        突发流量时超出的请求排队，不会同时启动大量的Agent争抢模型的限流额度，过载时延迟可预期
+        同一个会话同时只运行1个请求，避免同一个会话的state被并发修改
+        空出位置时按会话轮流调度，消息多的会话不会挤占其它会话
+        Args:
+            max_concurrent: 同时运行的最大数量
+            max_queued: 排队的最大数量，超出时立即拒绝
+            queue_timeout: 排队的最长时间，单位秒，超时后拒绝
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.running = 0
+        self.queued = 0
+        self.rejected = 0
+        # 正在运行的会话
+        self.active_sessions = set()
+        # 会话 -> 等待的请求，按会话轮流调度
+        self.waiting = OrderedDict()
+
+    @classmethod
+    def from_env(cls):
+        """
+        从环境变量读取配置，和env_template一致
+        """
+        return cls(
+            max_concurrent=int(os.environ.get("MAX_CONCURRENT_RUNS", 8)),
+            max_queued=int(os.environ.get("MAX_QUEUED_RUNS", 64)),
+            queue_timeout=float(os.environ.get("QUEUE_TIMEOUT", 30)),
+        )
+
+    @asynccontextmanager
+    async def slot(self, session_key):
+        """
+        async with controller.slot(session_key): 获得运行的位置后才执行，结束后释放
+        Raises: AdmissionRejected
+        """
+        await self.acquire(session_key)
+        try:
+            yield
+        finally:
+            self.release(session_key)
+
+    async def acquire(self, session_key):
+        if self.running < self.max_concurrent and session_key not in self.active_sessions:
+            self._grant(session_key)
+            return
+        if self.queued >= self.max_queued:
+            self.rejected += 1
+            raise AdmissionRejected(f"服务繁忙，排队人数已满({self.max_queued})，请稍后重试")
+        future = asyncio.get_running_loop().create_future()
+        self.waiting.setdefault(session_key, deque()).append(future)
+        self.queued += 1
+        try:
+            await asyncio.wait_for(future, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._forget(session_key, future)
+            self.rejected += 1
+            raise AdmissionRejected(f"服务繁忙，排队超过{self.queue_timeout:g}秒，请稍后重试")
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # 已经分配了位置，但是请求被取消
+                self.release(session_key)
+            else:
+                self._forget(session_key, future)
+            raise
+
+    def release(self, session_key):
+        self.running -= 1
+        self.active_sessions.discard(session_key)
+        self._dispatch()
+
+    def _grant(self, session_key):
+        self.running += 1
+        self.active_sessions.add(session_key)
+
+    def _forget(self, session_key, future):
+        # 超时或者取消的请求从队列中移除
+        futures = self.waiting.get(session_key)
+        if futures is not None and future in futures:
+            futures.remove(future)
+            self.queued -= 1
+            if not futures:
+                del self.waiting[session_key]
+
+    def _dispatch(self):
+        """
+        空出位置时，按会话排队的顺序取下1个不在运行中的会话，运行它最早的请求，之后这个会话排到最后
+        """
+        for session_key in list(self.waiting):
+            if self.running >= self.max_concurrent:
+                return
+            if session_key in self.active_sessions:
+                continue
+            futures = self.waiting.pop(session_key)
+            future = futures.popleft()
+            self.queued -= 1
+            # 已经取消、还没有从队列中移除的请求
+            while future.done() and futures:
+                future = futures.popleft()
+                self.queued -= 1
+            if futures:
+                self.waiting[session_key] = futures
+            if future.done():
+                continue
+            self._grant(session_key)
+            future.set_result(True)
+
+    def stats(self):
+        return {"running": self.running, "queued": self.queued, "rejected": self.rejected}
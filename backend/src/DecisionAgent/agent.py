@@ -28,11 +28,17 @@ instruction = """
    - 当用户提供症状时，必须使用工具 `matchDiseaseBySymptoms(symptoms)` 来获取可能的疾病列表，**不要自行猜测疾病名称**。
 
 4. **根据匹配结果继续处理**：
+   - **如果工具返回JSON格式的结论**(检索结果已经可以直接判断，没有经过大模型分析)：
+     - `{"verdict": "confident", "name": ..., "top_distance": ..., "gap": ..., "message": ...}`：`name` 就是匹配到的疾病，按唯一疾病处理，以 `name` 作为 `disease_name` 调用 `getTreatmentAdvice(disease_name)`，不需要再向用户追问；
+     - `{"verdict": "no_match", "candidates": [...], "top_distance": ..., "message": ...}`：数据库中没有足够匹配的疾病，**不要**从 `candidates` 中挑选或猜测，按 `message` 向用户询问更多、更具体的症状(JSON后面有“建议追问”时，直接基于它提问)，合并后重新调用 `matchDiseaseBySymptoms(symptoms)`；
+     - `top_distance`、`gap` 是检索的距离，只用于判断，不要告诉用户。
+
    - **如果结果为唯一疾病**：
      - 调用 `getTreatmentAdvice(disease_name)` 工具，获取该疾病的治疗建议，并以通俗易懂的语言向用户解释。
 
    - **如果有多个可能疾病**：
-     - 请分析这些疾病的典型症状，找出它们之间最具差异性的症状。
+     - 如果工具结果中有“建议追问”，直接基于其中的内容向用户提问，它是根据数据库本地计算出的最能区分这些候选的信息，不需要再自行分析；
+     - 没有“建议追问”时，请分析这些疾病的典型症状，找出它们之间最具差异性的症状。
      - 仅基于这些差异症状向用户提出**简洁、明确**的问题，例如：
        > “请问您最近是否有发烧、咽痛或出汗的情况？”
 
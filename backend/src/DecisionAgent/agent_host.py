@@ -0,0 +1,241 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : agent_host.py
+# @Desc  : 构建A2A服务，单个领域的main_api.py和多个领域共用1个进程的main_host.py都使用这里的函数
+
+import os
+import sys
+import asyncio
+import logging
+import importlib
+import anyio
+from google.adk.artifacts import InMemoryArtifactService
+from google.adk.memory.in_memory_memory_service import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from a2a.server.apps import A2AStarletteApplication
+from a2a.server.request_handlers import DefaultRequestHandler
+from a2a.types import Task
+from starlette.applications import Starlette
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse
+from starlette.routing import Mount, Route
+from DecisionAgent.adk_agent_executor import ADKAgentExecutor
+from DecisionAgent.session_store import SqliteSessionService
+from DecisionAgent.task_store import BoundedTaskStore
+from DecisionAgent.admission import AdmissionController
+
+logger = logging.getLogger(__name__)
+
+# 每个领域目录下都有同名的模块，加载1个领域前需要先从sys.modules中移除，避免拿到其它领域的模块
+DOMAIN_MODULES = ["main_api", "agent", "tools", "data"]
+
+
+class CancellableRequestHandler(DefaultRequestHandler):
+    """
+    客户端提前断开SSE连接时(例如关闭聊天窗口)，取消正在运行的Agent，任务状态设置为canceled
+    DefaultRequestHandler在断开后仍然会等待Agent运行结束，期间会继续调用模型和工具
+    """
+
+    async def on_message_send_stream(self, params, context=None):
+        stream = super().on_message_send_stream(params, context)
+        task_id = None
+        next_event = None
+        finished = False
+        try:
+            while True:
+                # 客户端断开时只取消当前协程，内部的事件流保持完整，之后在finally中正常结束
+                next_event = asyncio.ensure_future(stream.__anext__())
+                try:
+                    event = await asyncio.shield(next_event)
+                except StopAsyncIteration:
+                    break
+                task_id = task_id or event_task_id(event)
+                yield event
+            finished = True
+        finally:
+            if not finished:
+                # 断开时当前请求已经被取消，屏蔽取消后再停止Agent
+                with anyio.CancelScope(shield=True):
+                    await self._abort(task_id, stream, next_event)
+
+    async def _abort(self, task_id, stream, next_event):
+        if task_id is None and next_event is not None:
+            # 还没有收到过事件，等第1个事件得到任务id(提交任务后立即产生)
+            await asyncio.wait([next_event])
+            if not next_event.cancelled() and next_event.exception() is None:
+                task_id = event_task_id(next_event.result())
+        # 先取消Agent，正在进行的模型请求或者工具调用立即停止，不等它产生下1个事件
+        if task_id is not None and await self.agent_executor.abort(task_id):
+            logger.info(f"客户端已断开，取消任务: {task_id}")
+        if next_event is not None:
+            await asyncio.wait([next_event])
+        # 消费剩余的事件，canceled状态写入任务存储，DefaultRequestHandler正常关闭事件队列
+        try:
+            async for _ in stream:
+                pass
+        except Exception as e:
+            logger.error(f"结束任务的事件流失败: {task_id}, {e}")
+
+
+def event_task_id(event):
+    """
+    A2A事件所属的任务id
+    """
+    if isinstance(event, Task):
+        return event.id
+    return getattr(event, "taskId", None)
+
+
+def build_run_config(streaming):
+    """
+    根据是否流式输出构建RunConfig
+    """
+    if streaming:
+        logger.info("使用 SSE 流式输出模式")
+        return RunConfig(streaming_mode=StreamingMode.SSE, max_llm_calls=500)
+    logger.info("使用普通输出模式")
+    return RunConfig(streaming_mode=StreamingMode.NONE, max_llm_calls=500)
+
+
+def create_session_service():
+    """
+    根据环境变量创建会话服务，SESSION_STORE=sqlite时会话持久化到SESSION_DB_PATH，重启后可以继续之前的会话
+    memory为ADK的内存版本，进程重启后会话丢失，且会话数量越多内存占用越大
+    """
+    store = os.environ.get("SESSION_STORE", "sqlite")
+    if store == "memory":
+        return InMemorySessionService()
+    db_path = os.environ.get("SESSION_DB_PATH") or "cache/sessions.db"
+    logger.info(f"会话持久化到: {db_path}")
+    return SqliteSessionService(
+        db_path=db_path,
+        max_sessions=int(os.environ.get("SESSION_CACHE_SIZE", 1000)),
+        idle_seconds=float(os.environ.get("SESSION_IDLE_SECONDS", 1800)),
+        flush_interval=float(os.environ.get("SESSION_FLUSH_INTERVAL", 1.0)),
+    )
+
+
+def build_request_handler(agent, agent_card, streaming, session_service=None, artifact_service=None, memory_service=None, task_store=None, admission=None):
+    """
+    构建A2A的请求处理器
+    Args:
+        agent: ADK的root_agent
+        agent_card: AgentCard，名称作为Runner的app_name，多个领域共用session_service时按app_name区分
+        streaming: 是否使用SSE流式输出
+        session_service, artifact_service, memory_service, task_store: 不传时每个Agent单独创建，会话服务由create_session_service创建，任务存储为有容量上限的BoundedTaskStore，其它为内存版本
+        admission: 准入控制，不传时每个Agent单独创建，多个领域共用时并发上限对所有领域生效
+    Returns: CancellableRequestHandler
+    """
+    # 初始化 Runner，管理 agent 的执行、会话、记忆和产物
+    runner = Runner(
+        app_name=agent_card.name,
+        agent=agent,
+        artifact_service=artifact_service or InMemoryArtifactService(),
+        session_service=session_service or create_session_service(),
+        memory_service=memory_service or InMemoryMemoryService(),
+    )
+    # 初始化 agent 执行器
+    agent_executor = ADKAgentExecutor(runner, agent_card, build_run_config(streaming), admission=admission or AdmissionController.from_env())
+    # 请求处理器，管理任务存储和请求分发
+    return CancellableRequestHandler(
+        agent_executor=agent_executor, task_store=task_store or BoundedTaskStore.from_env()
+    )
+
+
+def build_a2a_app(agent_card, request_handler):
+    """
+    构建单个Agent的Starlette应用，允许跨域
+    """
+    a2a_app = A2AStarletteApplication(
+        agent_card=agent_card, http_handler=request_handler
+    )
+    app = a2a_app.build()
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
+
+
+def load_domain(domain_dir):
+    """
+    加载1个领域目录下的main_api模块，同时会加载该领域的agent、tools和data
+    加载完成后这些模块以"<领域名>.<模块名>"的名称保留在sys.modules中
+    领域的.env只在加载期间生效: 加载前记录进程的环境变量，加载后恢复，
+    领域模块中的load_dotenv不会覆盖已有的环境变量，所以每个领域看到的是进程的环境变量加上自己的.env，
+    COLLECTION_NAME、DECISION_*、VECTOR_*、TOOL_MODEL_*等配置在加载时读取，不会影响之后加载的领域
+    Args:
+        domain_dir: 领域目录，例如backend/doctor
+    Returns: 该领域的main_api模块
+    """
+    domain_dir = os.path.abspath(domain_dir)
+    domain = os.path.basename(domain_dir)
+    saved_modules = {name: sys.modules.pop(name) for name in DOMAIN_MODULES if name in sys.modules}
+    saved_environ = dict(os.environ)
+    # 集合名称每个领域都不同，进程的COLLECTION_NAME不应用到所有领域
+    os.environ.pop("COLLECTION_NAME", None)
+    sys.path.insert(0, domain_dir)
+    try:
+        module = importlib.import_module("main_api")
+    finally:
+        sys.path.remove(domain_dir)
+        for name in DOMAIN_MODULES:
+            if name in sys.modules:
+                sys.modules[f"{domain}.{name}"] = sys.modules.pop(name)
+        sys.modules.update(saved_modules)
+        os.environ.clear()
+        os.environ.update(saved_environ)
+    return module
+
+
+def build_host_app(base_dir, domains, base_url, streaming):
+    """
+    在1个进程中挂载多个领域的Agent，每个领域的A2A服务在/<领域名>/路径下
+    所有领域共享会话、记忆、产物服务和任务存储，以及tools中通过shared_resources创建的embedding模型、向量库和工具模型
+    Args:
+        base_dir: 领域目录所在的目录
+        domains: 领域名称列表，例如["doctor", "law"]
+        base_url: 服务的外部地址，例如http://localhost:10012
+        streaming: 是否使用SSE流式输出
+    Returns: Starlette应用
+    """
+    session_service = create_session_service()
+    artifact_service = InMemoryArtifactService()
+    memory_service = InMemoryMemoryService()
+    task_store = BoundedTaskStore.from_env()
+    # 所有领域共用模型的限流额度，并发上限和排队对整个进程生效
+    admission = AdmissionController.from_env()
+    routes = []
+    cards = {}
+    for domain in domains:
+        logger.info(f"加载领域: {domain}")
+        module = load_domain(os.path.join(base_dir, domain))
+        url = f"{base_url.rstrip('/')}/{domain}/"
+        agent_card = module.build_agent_card(url)
+        request_handler = build_request_handler(
+            module.root_agent, agent_card, streaming,
+            session_service=session_service,
+            artifact_service=artifact_service,
+            memory_service=memory_service,
+            task_store=task_store,
+            admission=admission,
+        )
+        routes.append(Mount(f"/{domain}", app=build_a2a_app(agent_card, request_handler)))
+        cards[domain] = {"name": agent_card.name, "url": url}
+
+    async def list_agents(request):
+        return JSONResponse(cards)
+
+    routes.insert(0, Route("/", list_agents, methods=["GET"]))
+    app = Starlette(routes=routes)
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    return app
@@ -0,0 +1,272 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : cache_utils.py
+# @Desc  : 有容量上限的两级缓存，内存LRU + 磁盘(大小、条数、过期时间限制)
+
+import os
+import time
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+
+# 表示缓存未命中，和缓存的值None区分开
+MISSING = object()
+
+
+class LRUCache(object):
+    def __init__(self, max_entries=1024):
+        """
+        进程内的LRU缓存
+        Args:
+            max_entries: 最多缓存的条数
+        """
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                self.misses += 1
+                return MISSING
+            self._data.move_to_end(key)
+            self.hits += 1
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self):
+        return {
+            "entries": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class DiskCache(object):
+    def __init__(self, cache_dir="cache", max_bytes=512 * 1024 * 1024, max_entries=10000, ttl=None, policy="lru"):
+        """
+        磁盘缓存，每条缓存一个pickle文件，超出容量时按照策略淘汰
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 所有缓存文件的总大小上限
+            max_entries: 缓存文件的条数上限
+            ttl: 过期时间，单位秒，None表示不过期
+            policy: 淘汰策略，lru: 最久未使用的先淘汰，lfu: 使用次数最少的先淘汰
+        """
+        assert policy in ("lru", "lfu"), f"不支持的淘汰策略: {policy}"
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.policy = policy
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir)
+        self._lock = threading.Lock()
+        # key_file -> {"size", "created", "accessed", "count"}，按照访问时间排序
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._scan()
+
+    def _scan(self):
+        """
+        启动时扫描已有的缓存文件，使用文件的修改时间作为创建和访问时间
+        """
+        files = []
+        for entry in os.scandir(self.cache_dir):
+            if entry.is_file() and entry.name.endswith("_cache.pkl"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, entry.name, stat.st_size))
+        for mtime, name, size in sorted(files):
+            self._entries[name] = {"size": size, "created": mtime, "accessed": mtime, "count": 0}
+            self._total_bytes += size
+        with self._lock:
+            self._evict()
+
+    def key_file(self, key):
+        return hashlib.md5(str(key).encode()).hexdigest() + "_cache.pkl"
+
+    def _remove(self, name):
+        meta = self._entries.pop(name)
+        self._total_bytes -= meta["size"]
+        try:
+            os.remove(os.path.join(self.cache_dir, name))
+        except OSError:
+            pass
+
+    def _expired(self, meta, now):
+        return self.ttl is not None and now - meta["created"] > self.ttl
+
+    def _evict(self):
+        # 需要在持有锁的情况下调用
+        while self._entries and (len(self._entries) > self.max_entries or self._total_bytes > self.max_bytes):
+            if self.policy == "lru":
+                name = next(iter(self._entries))
+            else:
+                name = min(self._entries, key=lambda n: (self._entries[n]["count"], self._entries[n]["accessed"]))
+            self._remove(name)
+            self.evictions += 1
+
+    def get(self, key):
+        name = self.key_file(key)
+        now = time.time()
+        with self._lock:
+            meta = self._entries.get(name)
+            if meta is None:
+                self.misses += 1
+                return MISSING
+            if self._expired(meta, now):
+                self._remove(name)
+                self.expirations += 1
+                self.misses += 1
+                return MISSING
+            meta["accessed"] = now
+            meta["count"] += 1
+            self._entries.move_to_end(name)
+        try:
+            with open(os.path.join(self.cache_dir, name), "rb") as f:
+                value = pickle.load(f)
+        except Exception as e:
+            print(f"读取缓存文件:{name}失败，错误信息:{e}")
+            with self._lock:
+                if name in self._entries:
+                    self._remove(name)
+                self.misses += 1
+            return MISSING
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        name = self.key_file(key)
+        data = pickle.dumps(value)
+        if len(data) > self.max_bytes:
+            return
+        path = os.path.join(self.cache_dir, name)
+        # 先写临时文件再重命名，避免读到写了一半的文件
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        now = time.time()
+        with self._lock:
+            if name in self._entries:
+                self._total_bytes -= self._entries.pop(name)["size"]
+            self._entries[name] = {"size": len(data), "created": now, "accessed": now, "count": 0}
+            self._total_bytes += len(data)
+            self._evict()
+
+    def delete(self, key):
+        name = self.key_file(key)
+        with self._lock:
+            if name in self._entries:
+                self._remove(name)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "bytes": self._total_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class TwoTierCache(object):
+    def __init__(self, memory_entries=256, cache_dir="cache", max_bytes=512 * 1024 * 1024, max_entries=10000, ttl=None, policy="lru"):
+        """
+        两级缓存，先查内存，再查磁盘，磁盘命中后回填到内存
+        Args:
+            memory_entries: 内存中最多缓存的条数
+            其它参数见DiskCache
+        """
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries=memory_entries)
+        self.disk = DiskCache(cache_dir=cache_dir, max_bytes=max_bytes, max_entries=max_entries, ttl=ttl, policy=policy)
+        # 内存中的条目记录写入时间，用于判断过期
+        self._created = {}
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not MISSING:
+            created = self._created.get(key)
+            if self.ttl is None or (created is not None and time.time() - created <= self.ttl):
+                return value
+            self.memory.delete(key)
+        value = self.disk.get(key)
+        if value is not MISSING:
+            self.memory.set(key, value)
+            self._created[key] = time.time()
+        return value
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        self._created[key] = time.time()
+        if len(self._created) > 2 * self.memory.max_entries:
+            # 清理已经被内存淘汰的条目的时间记录
+            self._created = {k: v for k, v in self._created.items() if k in self.memory._data}
+        self.disk.set(key, value)
+
+    def delete(self, key):
+        self.memory.delete(key)
+        self.disk.delete(key)
+
+    def stats(self):
+        memory_stats = self.memory.stats()
+        disk_stats = self.disk.stats()
+        return {
+            "hits": memory_stats["hits"] + disk_stats["hits"],
+            "misses": disk_stats["misses"],
+            "evictions": memory_stats["evictions"] + disk_stats["evictions"],
+            "memory": memory_stats,
+            "disk": disk_stats,
+        }
+
+
+def cache_from_env(cache_dir="cache", prefix="CACHE", memory_entries=256, max_bytes=512 * 1024 * 1024, max_entries=10000, ttl=None, policy="lru"):
+    """
+    根据环境变量创建两级缓存，环境变量没有设置时使用参数中的默认值
+    {prefix}_MEMORY_ENTRIES: 内存缓存条数
+    {prefix}_MAX_BYTES: 磁盘缓存总大小
+    {prefix}_MAX_ENTRIES: 磁盘缓存条数
+    {prefix}_TTL: 过期时间，单位秒，默认不过期
+    {prefix}_POLICY: lru或者lfu
+    Args:
+        cache_dir: 磁盘缓存的目录
+        prefix: 环境变量的前缀，例如工具模型的缓存为TOOL_MODEL_CACHE
+    """
+    env_ttl = os.environ.get(f"{prefix}_TTL")
+    return TwoTierCache(
+        memory_entries=int(os.environ.get(f"{prefix}_MEMORY_ENTRIES") or memory_entries),
+        cache_dir=cache_dir,
+        max_bytes=int(os.environ.get(f"{prefix}_MAX_BYTES") or max_bytes),
+        max_entries=int(os.environ.get(f"{prefix}_MAX_ENTRIES") or max_entries),
+        ttl=float(env_ttl) if env_ttl else ttl,
+        policy=os.environ.get(f"{prefix}_POLICY") or policy,
+    )
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : catalog.py
+# @Desc  : 数据集的索引，按名称和id查找数据，代替每次遍历整个数据集
+
+import hashlib
+import json
+
+
+def document_text(document):
+    """
+    用于向量化的字段可能是文本，也可能是关键词的列表(例如business的problem_description)，列表用逗号连接成文本
+    """
+    if isinstance(document, (list, tuple)):
+        return "，".join(str(one) for one in document)
+    return document
+
+
+def make_record_id(document, meta=None):
+    """
+    根据文档内容和meta信息计算稳定的id，内容不变id就不变，和ChromaDB.sync2collection写入的id一致
+    """
+    content = document_text(document) + json.dumps(meta or {}, ensure_ascii=False, sort_keys=True)
+    return hashlib.md5(content.encode()).hexdigest()
+
+
+class Catalog(object):
+    def __init__(self, records, name_field="name", document_field="matches"):
+        """
+        启动时构建1次，之后按名称或者id查找都是哈希查找
+        Args:
+            records: 数据集，list[dict]
+            name_field: 名称字段，向量库的meta信息中的name就是这个字段
+            document_field: 用于向量化的字段
+        """
+        self.records = list(records)
+        self.name_field = name_field
+        self.document_field = document_field
+        self.by_name = {}
+        self.by_id = {}
+        for record in self.records:
+            name = record[name_field]
+            self.by_name.setdefault(name, record)
+            self.by_id[make_record_id(record[document_field], {"name": name})] = record
+
+    def get(self, name):
+        """
+        按名称查找，没有时返回None
+        """
+        return self.by_name.get(name)
+
+    def get_by_id(self, record_id):
+        """
+        按向量库中的id查找，没有时返回None
+        """
+        return self.by_id.get(record_id)
+
+    def from_query(self, query_results, index=0):
+        """
+        根据向量查询的结果，直接返回对应的完整数据
+        Args:
+            query_results: query2collection的返回结果
+            index: 第几个查询文本的结果
+        Returns: list[(record, meta, distance)]，只包含在数据集中能找到的结果
+        """
+        matched = []
+        ids = query_results.get("ids") or [[]]
+        for i, meta in enumerate(query_results["metadatas"][index]):
+            record = None
+            if i < len(ids[index]):
+                record = self.get_by_id(ids[index][i])
+            if record is None and meta:
+                record = self.get(meta.get("name"))
+            if record is not None:
+                matched.append((record, meta, query_results["distances"][index][i]))
+        return matched
+
+    def names(self):
+        return list(self.by_name)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, name):
+        return name in self.by_name
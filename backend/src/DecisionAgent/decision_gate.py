@@ -0,0 +1,167 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : decision_gate.py
+# @Desc  : 根据向量检索的距离分布直接给出结论，检索结果明确时不再调用大模型细筛
+
+import os
+import sys
+import json
+import time
+import threading
+
+
+class ScoreGapGate(object):
+    def __init__(self, accept_distance=None, min_gap=None, reject_distance=None, log_file=None):
+        """
+        向量检索的距离是余弦距离，越小越相似
+        Args:
+            accept_distance: 第1名的距离不超过这个值，并且和第2名的距离差不小于min_gap时，直接确定为第1名
+            min_gap: 第1名和第2名的距离差
+            reject_distance: 第1名的距离超过这个值时，认为没有匹配的结果
+            log_file: 记录每次检索的距离和大模型的结论，jsonl格式，用于离线校准阈值
+            阈值为None时对应的判断不生效，全部为None时所有查询都交给大模型
+        """
+        self.accept_distance = accept_distance
+        self.min_gap = min_gap
+        self.reject_distance = reject_distance
+        self.log_file = log_file
+        self._lock = threading.Lock()
+        self.accepted = 0
+        self.rejected = 0
+        self.passed = 0
+
+    @classmethod
+    def from_env(cls):
+        """
+        DECISION_ACCEPT_DISTANCE, DECISION_MIN_GAP, DECISION_REJECT_DISTANCE: 阈值，不设置时不生效
+        DECISION_LOG_FILE: 检索日志文件，不设置时不记录
+        """
+        def read(name):
+            value = os.environ.get(name)
+            return float(value) if value else None
+        return cls(
+            accept_distance=read("DECISION_ACCEPT_DISTANCE"),
+            min_gap=read("DECISION_MIN_GAP"),
+            reject_distance=read("DECISION_REJECT_DISTANCE"),
+            log_file=os.environ.get("DECISION_LOG_FILE") or None,
+        )
+
+    def decide(self, query_results):
+        """
+        Args:
+            query_results: query2collection的返回结果，只看第1个查询
+        Returns: 能直接判断时返回结构化的结论(json字符串)，否则返回None，需要交给大模型判断
+        """
+        names = [meta.get("name") for meta in query_results["metadatas"][0]]
+        distances = query_results["distances"][0]
+        if not distances:
+            return None
+        top = distances[0]
+        gap = distances[1] - top if len(distances) > 1 else float("inf")
+        verdict = None
+        if self.reject_distance is not None and top > self.reject_distance:
+            verdict = {
+                "verdict": "no_match",
+                "candidates": names,
+                "top_distance": round(top, 4),
+                "message": "数据库中没有足够匹配的结果，请向用户询问更多、更具体的信息后再次查询",
+            }
+            self.rejected += 1
+        elif self.accept_distance is not None and self.min_gap is not None and top <= self.accept_distance and gap >= self.min_gap:
+            verdict = {
+                "verdict": "confident",
+                "name": names[0],
+                "top_distance": round(top, 4),
+                "gap": round(gap, 4) if gap != float("inf") else None,
+                "message": f"检索结果明确，基本可以确定为{names[0]}，不再需要其他信息判断",
+            }
+            self.accepted += 1
+        else:
+            self.passed += 1
+            return None
+        print(f"检索结果可以直接判断，跳过大模型: {verdict}")
+        return json.dumps(verdict, ensure_ascii=False)
+
+    def log(self, query, query_results, result):
+        """
+        记录检索的距离和大模型的结论，大模型结论中排在第1位的名称作为标签
+        """
+        if not self.log_file:
+            return
+        record = {
+            "time": time.time(),
+            "query": query,
+            "names": [meta.get("name") for meta in query_results["metadatas"][0]],
+            "distances": query_results["distances"][0],
+            "llm_top": llm_top_name(result, [meta.get("name") for meta in query_results["metadatas"][0]]),
+        }
+        with self._lock:
+            with open(self.log_file, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def is_confident(verdict):
+        """
+        decide返回的结论是否已经确定了唯一的结果
+        """
+        return json.loads(verdict)["verdict"] == "confident"
+
+    def stats(self):
+        return {"accepted": self.accepted, "rejected": self.rejected, "passed": self.passed}
+
+
+def llm_top_name(result, names):
+    """
+    大模型结论中，第1个出现的候选名称，没有出现任何候选时返回None
+    """
+    positions = [(result.find(name), name) for name in names if name and name in result]
+    return min(positions)[1] if positions else None
+
+
+def calibrate(log_file, precision=0.95, min_support=20):
+    """
+    根据检索日志离线校准阈值
+    accept: 选择最宽松的(accept_distance, min_gap)，使得满足条件的查询中，大模型结论和第1名一致的比例不低于precision
+    reject: 大模型没有选择任何候选的查询中，第1名距离大于所有被大模型选中的查询的距离时，作为拒绝阈值
+    Args:
+        log_file: ScoreGapGate记录的日志
+        precision: 直接判断的准确率要求
+        min_support: 满足条件的查询数量至少为多少，避免样本太少
+    Returns: {"accept_distance", "min_gap", "reject_distance", "coverage"}
+    """
+    records = []
+    with open(log_file, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                records.append(json.loads(line))
+    rows = []
+    for record in records:
+        distances = record["distances"]
+        if not distances:
+            continue
+        top = distances[0]
+        gap = distances[1] - top if len(distances) > 1 else 1.0
+        rows.append((top, gap, record["llm_top"], record["names"][0]))
+    best = {"accept_distance": None, "min_gap": None, "reject_distance": None, "coverage": 0.0}
+    for accept_distance in sorted({row[0] for row in rows}):
+        # 距离差从大到小依次放宽，累计准确率
+        candidates = sorted((row for row in rows if row[0] <= accept_distance), key=lambda row: -row[1])
+        correct = 0
+        for i, row in enumerate(candidates):
+            correct += row[2] == row[3]
+            selected = i + 1
+            if i + 1 < len(candidates) and candidates[i + 1][1] == row[1]:
+                continue
+            coverage = selected / len(rows)
+            if selected >= min_support and correct / selected >= precision and coverage > best["coverage"]:
+                best.update({"accept_distance": accept_distance, "min_gap": row[1], "coverage": round(coverage, 4)})
+    matched_tops = [row[0] for row in rows if row[2] is not None]
+    unmatched_tops = [row[0] for row in rows if row[2] is None]
+    if matched_tops and unmatched_tops and max(unmatched_tops) > max(matched_tops):
+        best["reject_distance"] = max(matched_tops)
+    return best
+
+
+if __name__ == '__main__':
+    # python decision_gate.py 检索日志.jsonl
+    print(calibrate(sys.argv[1]))
@@ -0,0 +1,204 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : decision_tools.py
+# @Desc  : 通用的匹配和建议工具，每个领域只需要配置数据集、字段、prompt，就能生成ADK的工具函数
+
+import os
+import inspect
+from google.adk.tools import ToolContext
+from DecisionAgent.catalog import Catalog
+from DecisionAgent.shared_resources import get_embedder, get_chromadb, get_tool_model
+from DecisionAgent.match_cache import MatchResultCache, canonical_items
+from DecisionAgent.session_vector import update_session_vector
+from DecisionAgent.decision_gate import ScoreGapGate
+from DecisionAgent.followup import FollowUpEngine
+from DecisionAgent.name_resolver import NameResolver
+
+
+def make_tool(func, name, description, param, param_type):
+    """
+    给通用的工具函数设置名称、说明和参数，ADK根据函数的名称、docstring和签名生成工具的声明
+    Args:
+        func: async def func(tool_context, **kwargs)
+        name: 工具名称，例如matchDiseaseBySymptoms
+        description: 工具说明，作为docstring
+        param: 参数名称，例如symptoms
+        param_type: 参数类型，例如list[str]或者str
+    """
+    func.__name__ = name
+    func.__qualname__ = name
+    func.__doc__ = description
+    func.__signature__ = inspect.Signature(
+        parameters=[
+            inspect.Parameter(param, inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=param_type),
+            inspect.Parameter("tool_context", inspect.Parameter.POSITIONAL_OR_KEYWORD, annotation=ToolContext),
+        ],
+        return_annotation=str,
+    )
+    func.__annotations__ = {param: param_type, "tool_context": ToolContext, "return": str}
+    return func
+
+
+class DecisionToolEngine(object):
+    def __init__(self, records, name_field, document_field, advice_field, collection_name, state_key,
+                 match_tool_name, match_param, match_description, match_prompt,
+                 advice_tool_name, advice_param, advice_description, advice_prompt,
+                 match_param_type=list[str], evidence_label="信息", advice_label="名称", topk=2,
+                 name_prefixes=(), name_suffixes=()):
+        """
+        1个领域的配置，生成match_tool和advice_tool两个工具
+        模型、向量库、缓存等配置从环境变量读取，和各领域的env_template一致
+        Args:
+            records: 数据集，list[dict]
+            name_field: 名称字段
+            document_field: 用于向量化的字段
+            advice_field: 建议工具直接返回的字段，例如treatment_plan
+            collection_name: 默认的向量表名称，环境变量COLLECTION_NAME优先
+            state_key: 用户提供的证据在会话state中的key，例如symptoms
+            match_tool_name: 匹配工具的名称
+            match_param: 匹配工具的参数名称
+            match_description: 匹配工具的说明
+            match_prompt: 细筛的prompt模板，{candidates}替换为候选及其描述，{evidence}替换为用户提供的所有证据
+            advice_tool_name: 建议工具的名称
+            advice_param: 建议工具的参数名称
+            advice_description: 建议工具的说明
+            advice_prompt: 数据集中没有对应名称时，让工具模型生成建议的prompt，末尾会加上名称
+            match_param_type: 匹配工具的参数类型，list[str]或者str
+            evidence_label: 日志中证据的名称，例如症状
+            advice_label: 日志中建议工具参数的名称，例如疾病名称
+            topk: 向量粗筛的候选数量
+            name_prefixes: 名称模糊匹配时领域内通用的前缀，例如法律名称的"中华人民共和国"
+            name_suffixes: 名称模糊匹配时领域内通用的后缀，例如法律名称的"法"
+        """
+        tool_model_timeout = float(os.environ.get("TOOL_MODEL_TIMEOUT", 60))
+        # 查询向量和缓存的查询向量的余弦相似度不低于这个值时复用之前的匹配结果，不设置时关闭
+        match_cache_similarity = float(os.environ["MATCH_CACHE_SIMILARITY"]) if os.environ.get("MATCH_CACHE_SIMILARITY") else None
+        # 匹配结果缓存的过期时间，单位秒，不设置时不过期
+        match_cache_ttl = float(os.environ["MATCH_CACHE_TTL"]) if os.environ.get("MATCH_CACHE_TTL") else None
+        # 会话查询向量的衰减系数，小于1时新的证据权重更高
+        self.session_vector_decay = float(os.environ.get("SESSION_VECTOR_DECAY", 1.0))
+        # 名称模糊匹配的相似度阈值，名称的向量相似度阈值不设置时不使用向量匹配
+        name_resolve_threshold = float(os.environ.get("NAME_RESOLVE_THRESHOLD", 0.7))
+        name_resolve_embedding_threshold = float(os.environ["NAME_RESOLVE_EMBEDDING_THRESHOLD"]) if os.environ.get("NAME_RESOLVE_EMBEDDING_THRESHOLD") else None
+        self.collection_name = os.environ.get("COLLECTION_NAME", collection_name)
+        tool_model_name = os.environ["TOOL_MODEL_NAME"]
+        print(f"使用的向量表是: {self.collection_name}")
+        self.document_field = document_field
+        self.advice_field = advice_field
+        self.state_key = state_key
+        self.match_prompt = match_prompt
+        self.advice_prompt = advice_prompt
+        self.evidence_label = evidence_label
+        self.advice_label = advice_label
+        self.topk = topk
+        # 数据集按名称建立索引，查找时不需要遍历整个数据集
+        self.catalog = Catalog(records, name_field=name_field, document_field=document_field)
+        # 候选之间信息增益最大的追问，本地计算，不需要大模型分析差异
+        self.followup_engine = FollowUpEngine(self.catalog)
+        # 同一个进程中的多个领域共享embedding模型、向量库和工具模型
+        self.tool_model = get_tool_model(provider=os.environ["TOOL_MODEL_PROVIDER"], model=tool_model_name,
+                                         api_base=os.environ["TOOL_MODEL_API_BASE"], api_key=os.environ["TOOL_MODEL_API_KEY"],
+                                         timeout=tool_model_timeout)
+        self.embedder = get_embedder(provider=os.environ.get("EMBEDDING_PROVIDER", "aliyun"))
+        # Agent传入的名称和数据集中的名称不完全一致时，先模糊匹配，匹配不到再让大模型生成
+        self.name_resolver = NameResolver.from_catalog(self.catalog, threshold=name_resolve_threshold, embedder=self.embedder,
+                                                       embedding_threshold=name_resolve_embedding_threshold,
+                                                       generic_prefixes=name_prefixes, generic_suffixes=name_suffixes)
+        self.chromadb_instance = get_chromadb(self.embedder, backend=os.environ.get("VECTOR_BACKEND", "chroma"),
+                                              db_dir=os.environ.get("VECTOR_DB_DIR") or None)
+        self.chromadb_instance.warmup(self.collection_name)
+        self.match_cache = MatchResultCache(namespace=f"{self.collection_name}|{tool_model_name}", similarity_threshold=match_cache_similarity,
+                                            ttl=match_cache_ttl)
+        self.decision_gate = ScoreGapGate.from_env()
+
+        async def match_tool(tool_context, **kwargs):
+            return await self.match(kwargs[match_param], tool_context, match_tool_name)
+
+        async def advice_tool(tool_context, **kwargs):
+            return await self.advice(kwargs[advice_param], tool_context, advice_tool_name, advice_param)
+
+        self.match_tool = make_tool(match_tool, match_tool_name, match_description, match_param, match_param_type)
+        self.advice_tool = make_tool(advice_tool, advice_tool_name, advice_description, advice_param, str)
+
+    async def query_deepseek(self, prompt, cache_key=None):
+        """
+        异步请求工具模型，不阻塞其它会话
+        cache_key: 不为空时缓存生成的结果，相同名称的请求直接返回缓存
+        """
+        return await self.tool_model.aquery(prompt, cache_key=cache_key)
+
+    async def match(self, items, tool_context, tool_name):
+        """
+        匹配工具的实现: 累加会话中的证据，向量粗筛，检索结果不明确时再用工具模型细筛
+        """
+        agent_name = tool_context.agent_name
+        history_items = tool_context.state.get(self.state_key, [])
+        print(f"Agent {agent_name} 正在调用工具：{tool_name}，传入的{self.evidence_label}是：{items}，历史{self.evidence_label}有: {history_items}")
+        if isinstance(items, str):
+            history_items.append(items)
+        else:
+            history_items.extend(items)
+        # 去重、归一化并排序，相同的集合得到相同的查询文本
+        history_items = canonical_items(history_items)
+        tool_context.state[self.state_key] = history_items
+
+        # 别名切换到新版本的collection(重建数据)后，之前缓存的结果不再使用
+        collection = self.chromadb_instance.aliases.resolve(self.collection_name)
+        self.match_cache.use_version(collection)
+        # 相同的集合直接返回缓存的结果
+        cached_result = self.match_cache.get(history_items)
+        if cached_result is not None:
+            print(f"匹配结果缓存命中: {self.match_cache.stats()}")
+            return cached_result
+        history_items_text = ",".join(history_items)
+        print(f"\n查询文本: '{history_items_text}'")
+        # 每条证据只embedding 1次，查询向量由会话中累加的向量得到
+        query_vector = await update_session_vector(self.embedder, tool_context.state, self.state_key, history_items, decay=self.session_vector_decay)
+        # 相似的查询向量复用之前的结果
+        cached_result = self.match_cache.get_similar(query_vector, history_items)
+        if cached_result is not None:
+            print(f"匹配结果缓存命中: {self.match_cache.stats()}")
+            return cached_result
+        query_results = await self.chromadb_instance.aquery2collection(
+            collection=collection,
+            query_documents=[history_items_text],
+            query_embeddings=[query_vector] if query_vector is not None else None,
+            topk=self.topk
+        )
+        # 检索结果明确(第1名远好于第2名)或者没有任何匹配时，直接返回结论，不再调用大模型
+        verdict = self.decision_gate.decide(query_results)
+        if verdict is not None:
+            if not self.decision_gate.is_confident(verdict):
+                # 没有足够匹配的结果时，同样给出最能区分候选的追问，引导用户补充信息
+                verdict += self.followup_engine.question_from_query(query_results, history_items)
+            return verdict
+        print("查询结果:")
+        candidates = []
+        # 按向量库中的id直接找到完整的数据，不需要再按名称查找
+        for one_data, _, distance in self.catalog.from_query(query_results):
+            name = one_data[self.catalog.name_field]
+            print(f"  文档: {str(one_data[self.document_field])[:50]}... (截断)")
+            print(f"  名称: {name}")
+            print(f"  距离: {distance:.4f}\n")
+            candidates.append(f"{name}: {one_data[self.document_field]}")
+        prompt = self.match_prompt.replace("{candidates}", "\n".join(candidates)).replace("{evidence}", str(history_items))
+        result = await self.query_deepseek(prompt)
+        self.decision_gate.log(history_items_text, query_results, result)
+        if result and not result.startswith("Error:"):
+            result += self.followup_engine.question_from_query(query_results, history_items)
+            self.match_cache.set(history_items, result, vector=query_vector, version=collection)
+        print(f"匹配结果缓存: {self.match_cache.stats()}")
+        return result
+
+    async def advice(self, name, tool_context, tool_name, param):
+        """
+        建议工具的实现: 优先返回数据集中的内容，名称不完全一致时模糊匹配，都找不到时让工具模型生成
+        """
+        print(f"Agent {tool_context.agent_name} 正在调用工具：{tool_name}，传入的{self.advice_label}是：{name}")
+        one_data = self.catalog.get(name)
+        if one_data is None:
+            one_data = self.catalog.get(await self.name_resolver.aresolve(name))
+        if one_data is not None:
+            return one_data[self.advice_field]
+        prompt = self.advice_prompt + f"###  {param}: {name}"
+        return await self.query_deepseek(prompt, cache_key=name)
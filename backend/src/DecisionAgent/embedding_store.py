@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : embedding_store.py
+# @Desc  : 按单条文本缓存向量，向量以float32追加写入文件，通过内存映射读取
+
+import os
+import re
+import hashlib
+import threading
+import unicodedata
+import numpy as np
+try:
+    import fcntl
+except ImportError:
+    # Windows没有fcntl，只能保证单进程写入
+    fcntl = None
+
+
+def normalize_text(text):
+    """
+    对文本进行归一化，作为缓存key的一部分
+    全角半角统一(NFKC)，去掉首尾空白，连续空白合并为一个空格
+    """
+    text = unicodedata.normalize("NFKC", str(text))
+    text = re.sub(r"\s+", " ", text).strip()
+    return text
+
+
+class EmbeddingStore(object):
+    def __init__(self, model, dimensions, store_dir="cache/embedding_store"):
+        """
+        每个(模型, 维度)对应一个向量文件和一个索引文件
+        向量文件: 每行是dimensions个float32，只追加写入
+        索引文件: 每行是 key\\t行号，只追加写入
+        Args:
+            model: 嵌入模型的名称
+            dimensions: 向量维度
+            store_dir: 存储目录
+        """
+        self.model = model
+        self.dimensions = dimensions
+        if not os.path.exists(store_dir):
+            os.makedirs(store_dir)
+        name = re.sub(r"[^0-9a-zA-Z_.-]", "_", model)
+        self.vector_file = os.path.join(store_dir, f"{name}_{dimensions}.f32")
+        self.index_file = os.path.join(store_dir, f"{name}_{dimensions}.idx")
+        # 多个进程(例如main_api和main_data_prepare)写入同一个存储时，用文件锁保证追加的行号正确
+        self.lock_file = os.path.join(store_dir, f"{name}_{dimensions}.lock")
+        self.row_bytes = dimensions * 4
+        self._lock = threading.Lock()
+        self._index = {}
+        self._mmap = None
+        self._mmap_rows = 0
+        self._rows = 0
+        # 索引文件已经读取到的位置，其它进程追加的索引从这里继续读取
+        self._index_offset = 0
+        self._load()
+
+    def _load(self):
+        """
+        加载索引，向量文件中不完整的行(写入中断或者其它进程正在写入)在下次持有文件锁写入时截掉
+        """
+        self._read_index()
+
+    def _read_index(self):
+        """
+        从上次读取的位置继续读取索引文件，只读取完整的行，索引中超出向量行数的记录会被忽略
+        """
+        if not os.path.exists(self.index_file):
+            return
+        with open(self.index_file, "rb") as f:
+            f.seek(self._index_offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        self._index_offset += end
+        # 向量先于索引写入，读取索引之后的向量文件大小包含了这些索引指向的行
+        if os.path.exists(self.vector_file):
+            self._rows = max(self._rows, os.path.getsize(self.vector_file) // self.row_bytes)
+        for line in data[:end].decode("utf-8").splitlines():
+            parts = line.split("\t")
+            if len(parts) != 2 or not parts[1].isdigit():
+                continue
+            row = int(parts[1])
+            if row < self._rows:
+                self._index[parts[0]] = row
+
+    def make_key(self, text):
+        """
+        key由归一化的文本、模型名称和维度共同决定
+        """
+        content = f"{self.model}|{self.dimensions}|{normalize_text(text)}"
+        return hashlib.md5(content.encode()).hexdigest()
+
+    def _remap(self):
+        # 向量文件追加后，重新映射，使新的行可以被读取
+        if self._rows == 0:
+            self._mmap = None
+        else:
+            self._mmap = np.memmap(self.vector_file, dtype=np.float32, mode="r", shape=(self._rows, self.dimensions))
+        self._mmap_rows = self._rows
+
+    def get_many(self, texts):
+        """
+        批量查询向量
+        Args:
+            texts: list[str]
+        Returns: list，命中的位置为np.ndarray(float32)，未命中的位置为None
+        """
+        rows = [self._index.get(self.make_key(text)) for text in texts]
+        result = [None] * len(texts)
+        with self._lock:
+            if any(row is not None and row >= self._mmap_rows for row in rows):
+                self._remap()
+            mm = self._mmap
+        for i, row in enumerate(rows):
+            if row is not None:
+                result[i] = np.array(mm[row])
+        return result
+
+    def put_many(self, texts, vectors):
+        """
+        批量写入向量，已经存在的文本不会重复写入
+        Args:
+            texts: list[str]
+            vectors: 和texts一一对应的向量
+        """
+        with self._lock:
+            keys = []
+            rows = []
+            for text, vector in zip(texts, vectors):
+                key = self.make_key(text)
+                if key in self._index or key in keys:
+                    continue
+                vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+                assert vector.shape[0] == self.dimensions, f"向量维度{vector.shape[0]}和存储的维度{self.dimensions}不一致"
+                keys.append(key)
+                rows.append(vector)
+            if not keys:
+                return
+            with open(self.lock_file, "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+                try:
+                    self._append(keys, rows)
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock.fileno(), fcntl.LOCK_UN)
+
+    def _append(self, keys, rows):
+        """
+        持有文件锁时调用，起始行号由向量文件的实际大小决定，不使用本进程记录的行数
+        """
+        with open(self.vector_file, "ab") as f:
+            size = os.fstat(f.fileno()).st_size
+            start = size // self.row_bytes
+            if size % self.row_bytes:
+                # 其它进程写入中断留下的不完整的行
+                f.truncate(start * self.row_bytes)
+            # 读取其它进程追加的索引，它们已经写入的文本不再重复写入
+            self._rows = start
+            self._read_index()
+            pending = [(key, row) for key, row in zip(keys, rows) if key not in self._index]
+            if not pending:
+                return
+            # 先写向量，再写索引，保证索引指向的行一定是完整的
+            f.write(np.stack([row for _, row in pending]).tobytes())
+        with open(self.index_file, "a", encoding="utf-8") as f:
+            for offset, (key, _) in enumerate(pending):
+                f.write(f"{key}\t{start + offset}\n")
+        # 自己写入的索引已经加入内存，读取位置跳过这些行
+        self._index_offset = os.path.getsize(self.index_file)
+        for offset, (key, _) in enumerate(pending):
+            self._index[key] = start + offset
+        self._rows = start + len(pending)
+
+    def __len__(self):
+        return len(self._index)
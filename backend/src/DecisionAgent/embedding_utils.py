@@ -6,6 +6,7 @@
 # @Desc  : 对于给定的句子进行Embedding
 
 import os
+import asyncio
 from typing import Any, Dict, List, Optional
 import time
 import copy
@@ -16,11 +17,16 @@ import numpy as np
 import pickle
 import hashlib
 from functools import wraps
+import re
 import string
-import chromadb  #pip install chromadb
-from chromadb.config import Settings
-from openai import OpenAI
+import unicodedata
+import zlib
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from dotenv import load_dotenv
+from DecisionAgent.embedding_store import EmbeddingStore
+from DecisionAgent.vector_backend import create_backend, CollectionAliases
+from DecisionAgent.catalog import make_record_id
 # 加载环境变量
 load_dotenv()
 
@@ -41,69 +47,20 @@ def cal_md5(content):
     return md5
 
 
-def cache_decorator(func):
-    """
-    cache从文件中读取, 当func中存在usecache时，并且为False时，不使用缓存
-    Args:
-        func ():
-    Returns:
-    """
-    cache_path = "cache" #cache目录
-    if not os.path.exists(cache_path):
-        os.mkdir(cache_path)
-
-    @wraps(func)
-    def wrapper(*args, **kwargs):
-        # 将args和kwargs转换为哈希键， 当装饰类中的函数的时候，args的第一个参数是实例化的类，这会通常导致改变，我们不想检测它是否改变，那么就忽略它
-        usecache = kwargs.get("usecache", True)
-        if "usecache" in kwargs:
-            del kwargs["usecache"]
-        if len(args)> 0:
-            if isinstance(args[0],(int, float, str, list, tuple, dict)):
-                key = str(args) + str(kwargs)
-            else:
-                # 第1个参数以后的内容
-                key = str(args[1:]) + str(kwargs)
-        else:
-            key = str(args) + str(kwargs)
-        # 变成md5字符串
-        key_file = os.path.join(cache_path, cal_md5(key) + "_cache.pkl")
-        # 如果结果已缓存，则返回缓存的结果
-        if os.path.exists(key_file) and usecache:
-            # 去掉kwargs中的usecache
-            print(f"函数{func.__name__}被调用，缓存被命中，使用已缓存结果，对于参数{key}, 读取文件:{key_file}")
-            try:
-                with open(key_file, 'rb') as f:
-                    result = pickle.load(f)
-                    return result
-            except Exception as e:
-                print(f"函数{func.__name__}被调用，缓存被命中，读取文件:{key_file}失败，错误信息:{e}")
-        result = func(*args, **kwargs)
-        # 将结果缓存到文件中
-        # 如果返回的数据是一个元祖，并且第1个参数是False,说明这个函数报错了，那么就不缓存了，这是我们自己的一个设定
-        if isinstance(result, tuple) and result[0] == False:
-            print(f"函数{func.__name__}被调用，返回结果为False，对于参数{key}, 不缓存")
-        else:
-            with open(key_file, 'wb') as f:
-                pickle.dump(result, f)
-            print(f"函数{func.__name__}被调用，缓存未命中，结果被缓存，对于参数{key}, 写入文件:{key_file}")
-        return result
-
-    return wrapper
-
-
 class ChromaDB(object):
-    def __init__(self, embedder, db_dir="cache/chromadb"):
+    def __init__(self, embedder, db_dir=None, backend="chroma"):
         """
         Args:
             embedder: 实例化后的embedding
-            chromadb的相关操作
+            db_dir: 数据目录，默认chroma为cache/chromadb，numpy为cache/numpy_index
+            backend: 向量存储的后端，chroma: chromadb的持久化HNSW索引，numpy: 纯numpy的内存索引，适合小数据集
+            向量数据库的相关操作
         """
         # 目前支持的模型,
         self.embedder = embedder
-        if not os.path.exists(db_dir):
-            os.makedirs(db_dir)
-        self.client = chromadb.PersistentClient(path=db_dir, settings=Settings(anonymized_telemetry=False))
+        self.backend = create_backend(backend, db_dir=db_dir)
+        # collection的别名，查询时使用别名指向的版本
+        self.aliases = CollectionAliases(os.path.join(self.backend.db_dir, "collection_aliases.json"))
 
     def delete_one_collection(self, collection):
         """
@@ -113,7 +70,8 @@ class ChromaDB(object):
         Returns:
         """
         try:
-            self.client.delete_collection(name=collection)
+            self.backend.delete_collection(self.aliases.resolve(collection))
+            self.aliases.remove(collection)
         except Exception as e:
             print(f"删除collection:{collection}失败，错误信息:{e}")
             return "fail"
@@ -127,54 +85,163 @@ class ChromaDB(object):
             meta: 插入collection的meta信息, list[]
         Returns:
         """
-        col = self.client.get_or_create_collection(collection, metadata={"hnsw:space": "cosine"})
         vectors_result = self.embedder.do_embedding(documents)
         vectors = vectors_result["data"]
         embeddings = [one["embedding"] for one in vectors]
-        col.add(
+        self.backend.upsert(
+            self.aliases.resolve(collection),
+            ids=[str(i) for i in range(len(documents))],
             embeddings=embeddings,
             documents=documents,
             metadatas=meta,
-            ids=[str(i) for i in range(len(documents))]
         )
         return "success"
 
-    def query2collection(self, collection, query_documents, keyword="", topk=3):
+    @staticmethod
+    def make_record_id(document, meta=None):
+        """
+        根据文档内容和meta信息计算稳定的id，内容不变id就不变
+        """
+        return make_record_id(document, meta)
+
+    def sync2collection(self, collection, documents, meta=None):
+        """
+        增量同步，每条数据的id是内容的哈希，和collection中已有的id比较，
+        只对新增或者修改的数据进行embedding并写入，删除已经不存在的数据
+        Args:
+            collection ():
+            documents: list[str]
+            meta: 插入collection的meta信息, list[]
+        Returns: {"added": 新增条数, "deleted": 删除条数, "unchanged": 未变化条数}
+        """
+        collection = self.aliases.resolve(collection)
+        meta = meta or [None] * len(documents)
+        records = {}
+        for document, one_meta in zip(documents, meta):
+            records[self.make_record_id(document, one_meta)] = (document, one_meta)
+        existing_ids = set(self.backend.get(collection)["ids"])
+        new_ids = [one_id for one_id in records if one_id not in existing_ids]
+        stale_ids = [one_id for one_id in existing_ids if one_id not in records]
+        if new_ids:
+            new_documents = [records[one_id][0] for one_id in new_ids]
+            vectors_result = self.embedder.do_embedding(new_documents)
+            embeddings = [one["embedding"] for one in vectors_result["data"]]
+            new_meta = [records[one_id][1] for one_id in new_ids]
+            self.backend.upsert(
+                collection,
+                ids=new_ids,
+                embeddings=embeddings,
+                documents=new_documents,
+                metadatas=new_meta if any(new_meta) else None,
+            )
+        if stale_ids:
+            self.backend.delete(collection, stale_ids)
+        result = {"added": len(new_ids), "deleted": len(stale_ids), "unchanged": len(records) - len(new_ids)}
+        print(f"collection:{collection}增量同步完成: {result}")
+        return result
+
+    def rebuild_collection(self, collection, documents, meta=None, keep_versions=1):
+        """
+        蓝绿重建，数据写入新版本的collection，写完后切换别名collection指向新版本，
+        查询中的Agent在切换前使用旧版本，切换后使用新版本，中间没有collection为空的时间
+        Args:
+            collection (): 别名
+            documents: list[str]
+            meta: 插入collection的meta信息, list[]
+            keep_versions: 除了当前版本，保留的旧版本数量，旧版本可能仍有正在进行的查询
+        Returns: 新版本的collection名称
+        """
+        version = f"{collection}__v{int(time.time() * 1000)}"
+        print(f"开始重建collection:{collection}，新版本为:{version}")
+        self.sync2collection(version, documents, meta)
+        previous = self.aliases.resolve(collection)
+        self.aliases.set(collection, version)
+        print(f"collection:{collection}的别名已经切换: {previous} -> {version}")
+        existing = self.backend.list_collections()
+        old_versions = sorted(name for name in existing if name.startswith(f"{collection}__v") and name != version)
+        if collection in existing:
+            # 使用别名之前的collection，是最早的版本
+            old_versions.insert(0, collection)
+        for name in old_versions[:max(len(old_versions) - keep_versions, 0)]:
+            try:
+                self.backend.delete_collection(name)
+                print(f"删除旧版本collection:{name}")
+            except Exception as e:
+                print(f"删除旧版本collection:{name}失败，错误信息:{e}")
+        return version
+
+    def query2collection(self, collection, query_documents, keyword="", topk=3, where=None):
         """
         查询向量，混合搜索
         Args:
             collection ():
             query_documents (): list[str]
             keyword: 是否同时对documents执行关键字搜索
+            where: metadata的过滤条件, eg: {"name": "高血压"}
         Returns:
         """
-        col = self.client.get_or_create_collection(collection)
         vectors_result = self.embedder.do_embedding(texts=query_documents)
         vectors = vectors_result["data"]
         embeddings = [one["embedding"] for one in vectors]
-        if keyword:
-            query_result = col.query(
-                query_embeddings=embeddings,
-                n_results=topk,
-                where_document={"$contains": keyword},
-                include=["metadatas", "documents", "distances"]
-            )
+        return self.backend.query(
+            self.aliases.resolve(collection),
+            query_embeddings=embeddings,
+            n_results=topk,
+            where=where,
+            where_document={"$contains": keyword} if keyword else None,
+        )
+
+    async def aquery2collection(self, collection, query_documents, keyword="", topk=3, where=None, query_embeddings=None):
+        """
+        query2collection的异步版本，embedding使用异步的客户端，不阻塞事件循环
+        Args:
+            collection ():
+            query_documents (): list[str]
+            keyword: 是否同时对documents执行关键字搜索
+            where: metadata的过滤条件
+            query_embeddings: 已经计算好的查询向量，不为空时不再对query_documents进行embedding
+        Returns:
+        """
+        if query_embeddings is not None:
+            embeddings = query_embeddings
         else:
-            query_result = col.query(
-                query_embeddings=embeddings,
-                n_results=topk,
-                include=["metadatas", "documents", "distances"]
-            )
-        return query_result
+            vectors_result = await self.embedder.ado_embedding(texts=query_documents)
+            vectors = vectors_result["data"]
+            embeddings = [one["embedding"] for one in vectors]
+        # chroma的查询和numpy的矩阵乘法都是同步的，放到线程中执行，不阻塞事件循环
+        return await asyncio.to_thread(
+            self.backend.query,
+            self.aliases.resolve(collection),
+            query_embeddings=embeddings,
+            n_results=topk,
+            where=where,
+            where_document={"$contains": keyword} if keyword else None,
+        )
+
+    def warmup(self, collection):
+        """
+        服务启动时调用，提前解析collection并加载索引，避免第一次用户查询时才加载
+        Args:
+            collection (): collection名称或者别名
+        Returns:
+        """
+        start_time = time.time()
+        try:
+            self.backend.warmup(self.aliases.resolve(collection))
+        except Exception as e:
+            print(f"预热collection:{collection}失败，错误信息:{e}")
+            return "fail"
+        print(f"预热collection:{collection}完成，耗时{time.time() - start_time:.3f}秒")
+        return "success"
 
     def list_collection(self, collection, number=100):
         """
         列出某个集后的内容
         Returns:
         """
-        col = self.client.get_or_create_collection(collection)
-        data = col.peek(number)
-        total = col.count()
+        collection = self.aliases.resolve(collection)
+        data = self.backend.peek(collection, number)
+        total = self.backend.count(collection)
         result = {
             "data": data,
             "number": number,
@@ -187,45 +254,280 @@ class ChromaDB(object):
         列出所有已有的collections
         Returns:
         """
-        collections_info = self.client.list_collections()
-        collections = [i.name for i in collections_info]
-        return collections
+        return self.backend.list_collections()
+
+class HashNgramEmbedder(object):
+    def __init__(self, dimensions=1024, ngram_range=(1, 3)):
+        """
+        本地的CPU向量化，对字符n-gram做哈希后映射到固定维度，结果是确定的，不需要网络
+        中文按字切分，因此使用1~3的字符n-gram
+        Args:
+            dimensions: 向量维度
+            ngram_range: n-gram的最小和最大长度
+        """
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _ngrams(self, text):
+        text = re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip().lower()
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            for i in range(len(text) - n + 1):
+                yield text[i:i + n]
+
+    def embed(self, texts: list[str]):
+        """
+        Args:
+            texts: list[str]
+        Returns: np.ndarray, shape为(len(texts), dimensions)，每行经过L2归一化
+        """
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            for gram in self._ngrams(text):
+                h = zlib.crc32(gram.encode("utf-8"))
+                rows.append(row)
+                cols.append(h % self.dimensions)
+                # 用哈希的最高位决定符号，减少哈希冲突带来的偏差
+                values.append(1.0 if h & 0x80000000 else -1.0)
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        if rows:
+            np.add.at(matrix, (np.asarray(rows), np.asarray(cols)), np.asarray(values, dtype=np.float32))
+        # 次线性的词频权重
+        matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+
+class EmbeddingBatcher(object):
+    def __init__(self, request_func, batch_window=0.01, max_batch_size=10):
+        """
+        合并并发的embedding请求，在batch_window时间内到达的文本，最多max_batch_size条，合并成1次请求
+        Args:
+            request_func: 异步函数，输入list[str]，返回一一对应的向量
+            batch_window: 等待合并的时间窗口，单位秒
+            max_batch_size: 1次请求最多的文本数量，即模型的batch上限
+        """
+        self.request_func = request_func
+        self.batch_window = batch_window
+        self.max_batch_size = max_batch_size
+        self._pending = []  # [(text, future)]
+        self._timer = None
+        # 正在运行的批量请求，保持引用，避免任务在完成之前被垃圾回收
+        self._tasks = set()
+        self.requests = 0  # 实际请求模型的次数
+        self.submitted = 0  # 提交的文本数
+
+    async def submit(self, text):
+        """
+        提交1条文本，等待合并请求完成后返回它的向量
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.submitted += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_window, self._flush)
+        return await future
+
+    async def embed(self, texts: list[str]):
+        """
+        批量提交，结果和texts一一对应
+        """
+        return list(await asyncio.gather(*[self.submit(text) for text in texts]))
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size:]
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(lambda task, batch=batch: self._finish(task, batch))
+
+    def _finish(self, task, batch):
+        """
+        批量请求的任务结束后释放引用，任务异常结束(例如被取消)时把异常传给还在等待的请求，避免它们一直等待
+        """
+        self._tasks.discard(task)
+        error = None if task.cancelled() else task.exception()
+        if not task.cancelled() and error is None:
+            return
+        for _, future in batch:
+            if future.done():
+                continue
+            if error is None:
+                future.cancel()
+            else:
+                future.set_exception(error)
+
+    async def _run(self, batch):
+        # 提交的请求已经被取消(例如任务被取消)时不再发送
+        batch = [(text, future) for text, future in batch if not future.done()]
+        if not batch:
+            return
+        texts = []
+        for text, _ in batch:
+            if text not in texts:
+                texts.append(text)
+        self.requests += 1
+        try:
+            vectors = await self.request_func(texts)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        text2vector = dict(zip(texts, vectors))
+        for text, future in batch:
+            if not future.done():
+                future.set_result(text2vector[text])
 
 class EmbeddingModel(object):
-    def __init__(self, model="text-embedding-v4", provider="aliyun"):
+    def __init__(self, model=None, provider="aliyun", dimensions=1024, timeout=30.0, max_concurrency=8, max_connections=20, store_dir="cache/embedding_store", batch_window=0.01, max_batch_size=10):
         """
         Args:
+            model: 模型名称，默认阿里云使用text-embedding-v4，本地使用hash-char-ngram
+            provider: aliyun: 阿里云百炼的嵌入模型, local: 本地CPU计算的字符n-gram哈希向量，不需要网络和API Key
+            dimensions: 向量维度（仅 text-embedding-v3及 text-embedding-v4支持该参数）
+            timeout: 每次embedding请求的超时时间，单位秒
+            max_concurrency: 异步embedding时同时进行的最大请求数
+            max_connections: 异步客户端连接池的最大连接数，连接会保持keep-alive复用
+            store_dir: 向量缓存的目录，每条文本的向量单独缓存
+            batch_window: 异步请求时，合并并发请求的时间窗口，单位秒
+            max_batch_size: 模型1次请求最多的文本数量，阿里云的text-embedding-v4为10
         """
+        if model is None:
+            model = "hash-char-ngram" if provider == "local" else "text-embedding-v4"
         self.model = model
         self.provider = provider
-        if provider == "aliyun":
+        self.dimensions = dimensions
+        self.timeout = timeout
+        self.local_embedder = None
+        if provider == "local":
+            self.local_embedder = HashNgramEmbedder(dimensions=dimensions)
+        elif provider == "aliyun":
             api_key = os.getenv("ALI_API_KEY")
             assert api_key, "ALI_API_KEY没有设置，无法使用嵌入模型"
+            base_url = "https://dashscope.aliyuncs.com/compatible-mode/v1"  # 百炼服务的base_url
             self.client = OpenAI(
                 api_key=api_key,  # 如果您没有配置环境变量，请在此处用您的API Key进行替换
-                base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"  # 百炼服务的base_url
+                base_url=base_url
+            )
+            # 异步客户端，使用连接池，所有的异步请求共享keep-alive的连接
+            self.async_client = AsyncOpenAI(
+                api_key=api_key,
+                base_url=base_url,
+                timeout=timeout,
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                    timeout=timeout,
+                ),
             )
         else:
-            raise Exception("目前只支持阿里云的模型")
+            raise Exception("目前只支持阿里云的模型和本地的模型(provider=local)")
+        # 限制同时进行的异步embedding请求数量
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.store = EmbeddingStore(model=model, dimensions=dimensions, store_dir=store_dir)
+        self.max_batch_size = max_batch_size
+        self.batcher = EmbeddingBatcher(self._arequest_batch, batch_window=batch_window, max_batch_size=max_batch_size)
+
+    def _request_embedding(self, texts: list[str]):
+        """
+        请求嵌入模型，返回和texts一一对应的向量，超过模型batch上限时分批请求
+        """
+        if self.local_embedder is not None:
+            return list(self.local_embedder.embed(texts))
+        vectors = []
+        for i in range(0, len(texts), self.max_batch_size):
+            completion = self.client.embeddings.create(
+                model=self.model,
+                input=texts[i:i + self.max_batch_size],
+                dimensions=self.dimensions,
+                encoding_format="float",
+                timeout=self.timeout,
+            )
+            vectors.extend(one.embedding for one in sorted(completion.data, key=lambda x: x.index))
+        return vectors
+
+    async def _arequest_batch(self, texts: list[str]):
+        """
+        异步请求嵌入模型1次，texts的数量不超过模型的batch上限
+        """
+        async with self._semaphore:
+            completion = await self.async_client.embeddings.create(
+                model=self.model,
+                input=texts,
+                dimensions=self.dimensions,
+                encoding_format="float",
+                timeout=self.timeout,
+            )
+        return [one.embedding for one in sorted(completion.data, key=lambda x: x.index)]
+
+    async def _arequest_embedding(self, texts: list[str]):
+        """
+        _request_embedding的异步版本，并发的请求会被合并成批量请求
+        """
+        if self.local_embedder is not None:
+            # 本地计算很快，直接计算，不需要合并请求
+            return list(self.local_embedder.embed(texts))
+        return await self.batcher.embed(texts)
 
-    @cache_decorator
-    def do_embedding(self, texts: list[str]):
+    def _lookup(self, texts, usecache):
         """
-        对于给定的数据进行embedding
+        从向量缓存中查找，返回已有的向量和需要请求模型的文本(去重后)
+        """
+        vectors = self.store.get_many(texts) if usecache else [None] * len(texts)
+        missing_texts = []
+        for text, vector in zip(texts, vectors):
+            if vector is None and text not in missing_texts:
+                missing_texts.append(text)
+        if missing_texts:
+            print(f"embedding缓存命中{len(texts) - len(missing_texts)}条，需要请求模型{len(missing_texts)}条")
+        return vectors, missing_texts
+
+    def _merge(self, texts, vectors, missing_texts, missing_vectors):
+        """
+        把新请求的向量写入缓存，并合并成和do_embedding相同的返回格式
+        """
+        if missing_texts:
+            self.store.put_many(missing_texts, missing_vectors)
+            new_vectors = dict(zip(missing_texts, missing_vectors))
+            vectors = [new_vectors[text] if vector is None else vector for text, vector in zip(texts, vectors)]
+        data = []
+        for i, vector in enumerate(vectors):
+            if isinstance(vector, np.ndarray):
+                vector = vector.tolist()
+            data.append({"embedding": vector, "index": i, "object": "embedding"})
+        return {"data": data, "model": self.model, "object": "list"}
+
+    def do_embedding(self, texts: list[str], usecache=True):
+        """
+        对于给定的数据进行embedding，每条文本单独缓存，只有缓存中没有的文本才会请求模型
         Args:
-            model_name: 模型的名称
             texts: 数据，为一个list，每个元素为一个字符串, eg: ['风急天高猿啸哀', '渚清沙白鸟飞回', '无边落木萧萧下', '不尽长江滚滚来']
-        Returns:
+            usecache: 为False时，不读取缓存，全部重新请求
+        Returns: {"data": [{"embedding": [...], "index": 0}, ...]}
         """
-        completion = self.client.embeddings.create(
-            model=self.model,
-            input=texts,
-            dimensions=1024,  # 指定向量维度（仅 text-embedding-v3及 text-embedding-v4支持该参数）
-            encoding_format="float"
-        )
-        result = completion.dict()
-        print(f"text {texts} embedding result => {result}")
-        return result
+        vectors, missing_texts = self._lookup(texts, usecache)
+        missing_vectors = self._request_embedding(missing_texts) if missing_texts else []
+        return self._merge(texts, vectors, missing_texts, missing_vectors)
+
+    async def ado_embedding(self, texts: list[str], usecache=True):
+        """
+        do_embedding的异步版本，在async的工具中使用，不会阻塞事件循环
+        Args:
+            texts: 数据，为一个list，每个元素为一个字符串
+        Returns: 和do_embedding的返回格式一致
+        """
+        # 向量缓存的读取、追加写入和文件锁都是同步的磁盘操作，放到线程中执行，EmbeddingStore内部有线程锁
+        vectors, missing_texts = await asyncio.to_thread(self._lookup, texts, usecache)
+        missing_vectors = await self._arequest_embedding(missing_texts) if missing_texts else []
+        return await asyncio.to_thread(self._merge, texts, vectors, missing_texts, missing_vectors)
 
 if __name__ == '__main__':
     embedder = EmbeddingModel()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : followup.py
+# @Desc  : 根据候选结果计算信息增益最大的追问，代替大模型分析候选之间最具差异性的症状(信息)
+
+import re
+import numpy as np
+from DecisionAgent.catalog import document_text
+from DecisionAgent.embedding_store import normalize_text
+
+# 文本按标点和连接词切分成特征短语
+SPLIT_PATTERN = re.compile(r"[，,、；;。.：:！!？?（）()“”\"'【】\[\]\s①②③④⑤⑥⑦⑧⑨]+|和|与|及|或者|或")
+# 特征短语前面常见的引导词，例如"常见症状有头晕"只保留"头晕"
+PREFIX_PATTERN = re.compile(r"^(常见症状有|常见症状|症状有|也可出现|可出现|出现|伴有|可有|包括|例如|如(?!何)|即|尤其|还有|以及)")
+# 特征短语后面常见的结尾词，例如"心悸等"只保留"心悸"
+SUFFIX_PATTERN = re.compile(r"(等症状|等情况|等)$")
+
+
+def extract_features(document, min_length=2, max_length=8):
+    """
+    从用于向量化的字段中提取特征短语
+    Args:
+        document: 文本，或者关键词的列表
+        min_length: 特征短语的最小长度
+        max_length: 特征短语的最大长度，太长的一般是描述性的句子，不适合作为追问
+    Returns: list[str]，保持出现的顺序，已去重
+    """
+    if isinstance(document, (list, tuple)):
+        segments = [str(one) for one in document]
+    else:
+        segments = SPLIT_PATTERN.split(document)
+    features = []
+    for segment in segments:
+        segment = SUFFIX_PATTERN.sub("", PREFIX_PATTERN.sub("", normalize_text(segment)))
+        if min_length <= len(segment) <= max_length and segment not in features:
+            features.append(segment)
+    return features
+
+
+def binary_entropy(q):
+    """
+    回答"是/否"的熵，q是回答"是"的概率，单位比特
+    """
+    q = np.clip(q, 1e-12, 1 - 1e-12)
+    return -(q * np.log2(q) + (1 - q) * np.log2(1 - q))
+
+
+class FollowUpEngine(object):
+    def __init__(self, catalog, min_length=2, max_length=8, temperature=0.1):
+        """
+        启动时构建1次特征 x 条目的矩阵，矩阵中1表示该条目的描述中包含这个特征
+        追问某个特征时，用户的回答可以把候选分成包含和不包含两组，回答的熵就是这个追问的信息增益
+        Args:
+            catalog: Catalog，特征从document_field字段中提取
+            min_length: 特征短语的最小长度
+            max_length: 特征短语的最大长度
+            temperature: 候选的先验概率是按距离的softmax，温度越小越偏向距离最小的候选
+        """
+        self.catalog = catalog
+        self.temperature = temperature
+        self.names = [record[catalog.name_field] for record in catalog.records]
+        self.columns = {}
+        for i, name in enumerate(self.names):
+            self.columns.setdefault(name, i)
+        texts = [normalize_text(document_text(record[catalog.document_field])) for record in catalog.records]
+        features = []
+        for record in catalog.records:
+            for feature in extract_features(record[catalog.document_field], min_length, max_length):
+                if feature not in features:
+                    features.append(feature)
+        self.features = features
+        # 某个条目提取的特征也可能出现在其他条目的描述中，例如"头痛"，所以按包含关系构建矩阵
+        self.matrix = np.array([[feature in text for text in texts] for feature in features], dtype=np.float32).reshape(len(features), len(texts))
+        # 出现在越少的条目中越具体，信息增益相同时优先选择
+        self.document_frequency = self.matrix.sum(axis=1)
+        self.feature_lengths = np.array([len(feature) for feature in features], dtype=np.float32)
+
+    def _known_mask(self, evidence):
+        """
+        用户已经提供的证据(症状、案情等)对应的特征不再追问
+        """
+        mask = np.zeros(len(self.features), dtype=bool)
+        items = [normalize_text(item) for item in evidence if item]
+        if not items:
+            return mask
+        for i, feature in enumerate(self.features):
+            if any(feature in item or item in feature for item in items):
+                mask[i] = True
+        return mask
+
+    def best_question(self, candidates, evidence=None):
+        """
+        计算当前候选集合下信息增益最大的追问
+        Args:
+            candidates: list[(名称, 向量检索的距离)]，距离越小的候选先验概率越高
+            evidence: 用户已经提供的证据，已经问过的特征不再追问
+        Returns: {"feature", "information_gain", "present", "absent"}，候选少于2个或者没有能区分候选的特征时返回None
+        """
+        columns, weights = [], []
+        for name, distance in candidates:
+            column = self.columns.get(name)
+            if column is None or column in columns:
+                continue
+            columns.append(column)
+            weights.append(-float(distance) / self.temperature)
+        if len(columns) < 2 or not self.features:
+            return None
+        p = np.exp(np.asarray(weights, dtype=np.float64) - max(weights))
+        p /= p.sum()
+        sub_matrix = self.matrix[:, columns]
+        q = sub_matrix @ p
+        gains = binary_entropy(q)
+        # 所有候选都有或者都没有的特征不能区分候选
+        distinct = (sub_matrix.min(axis=1) != sub_matrix.max(axis=1)) & ~self._known_mask(evidence or [])
+        if not distinct.any():
+            return None
+        # 信息增益优先，其次是出现的条目少、短语短
+        order = np.lexsort((self.feature_lengths, self.document_frequency, -np.where(distinct, gains, -1.0)))
+        best = int(order[0])
+        present = [self.names[column] for column in columns if self.matrix[best, column]]
+        absent = [self.names[column] for column in columns if not self.matrix[best, column]]
+        return {
+            "feature": self.features[best],
+            "information_gain": round(float(gains[best]), 4),
+            "present": present,
+            "absent": absent,
+        }
+
+    def question_from_query(self, query_results, evidence=None):
+        """
+        根据向量检索的结果计算追问
+        Args:
+            query_results: query2collection的返回结果，只看第1个查询
+            evidence: 用户已经提供的证据
+        Returns: 追问的提示文本，没有合适的追问时返回空字符串
+        """
+        candidates = [(meta.get("name"), distance) for meta, distance in zip(query_results["metadatas"][0], query_results["distances"][0])]
+        question = self.best_question(candidates, evidence)
+        if question is None:
+            return ""
+        print(f"信息增益最大的追问: {question}")
+        return (f"\n\n建议追问：是否有【{question['feature']}】"
+                f"(信息增益{question['information_gain']}比特；有：{'、'.join(question['present'])}；无：{'、'.join(question['absent'])})")
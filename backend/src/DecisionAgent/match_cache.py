@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : match_cache.py
+# @Desc  : 匹配工具的结果缓存，相同的证据集合直接命中，相似的查询向量也可以复用之前的结果
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from DecisionAgent.embedding_store import normalize_text
+
+
+def canonical_items(items):
+    """
+    证据(症状、案情等)去重、归一化并排序，相同的证据集合得到相同的结果，和顺序无关
+    """
+    return sorted({normalize_text(item) for item in items if normalize_text(item)})
+
+
+class MatchResultCache(object):
+    def __init__(self, namespace, similarity_threshold=None, max_entries=1024, ttl=None):
+        """
+        两层查找: 先按排序后的证据集合精确查找，再按查询向量的余弦相似度查找
+        Args:
+            namespace: 命名空间，一般是collection名称和工具模型名称，不同的数据或者模型不会互相命中
+            similarity_threshold: 查询向量和缓存的向量的余弦相似度不低于这个值时，复用缓存的结果，None或者不小于1表示关闭相似查找(默认)
+                查询向量是所有证据向量的平均，证据较多时新增1条证据向量变化很小，开启后可能忽略新的证据
+            max_entries: 最多缓存的条数，超出时淘汰最久未使用的
+            ttl: 过期时间，单位秒，None表示不过期
+        """
+        self.namespace = namespace
+        # 数据的版本，一般是别名当前指向的collection，版本变化时清空缓存
+        self.version = None
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # key -> {"result", "vector", "items", "created"}
+        self._entries = OrderedDict()
+        self._keys = []
+        self._matrix = None
+        self.exact_hits = 0
+        self.similar_hits = 0
+        self.misses = 0
+
+    def make_key(self, items):
+        content = self.namespace + "|" + "\n".join(canonical_items(items))
+        return hashlib.md5(content.encode()).hexdigest()
+
+    def _expired(self, entry):
+        return self.ttl is not None and time.time() - entry["created"] > self.ttl
+
+    def _rebuild_matrix(self):
+        # 需要在持有锁的情况下调用，所有缓存的向量组成1个矩阵，相似查找只需要1次矩阵乘法
+        self._keys = [key for key, entry in self._entries.items() if entry["vector"] is not None]
+        if self._keys:
+            self._matrix = np.stack([self._entries[key]["vector"] for key in self._keys])
+        else:
+            self._matrix = None
+
+    def use_version(self, version):
+        """
+        切换数据的版本，例如重建数据后别名指向了新的collection，之前的结果都是旧数据的，全部清空
+        """
+        with self._lock:
+            if version == self.version:
+                return
+            if self._entries:
+                print(f"数据版本从{self.version}变为{version}，清空{len(self._entries)}条匹配结果缓存")
+            self.version = version
+            self._entries.clear()
+            self._rebuild_matrix()
+
+    def get(self, items):
+        """
+        按证据集合精确查找
+        Returns: 缓存的结果，没有时返回None
+        """
+        key = self.make_key(items)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if self._expired(entry):
+                del self._entries[key]
+                self._rebuild_matrix()
+                return None
+            self._entries.move_to_end(key)
+            self.exact_hits += 1
+            return entry["result"]
+
+    def get_similar(self, vector, items=None):
+        """
+        按查询向量的余弦相似度查找
+        Args:
+            vector: 查询向量
+            items: 当前的证据，缓存的证据集合是它的真子集或者真超集时不命中，例如新增了1条证据
+        Returns: 缓存的结果，没有时返回None
+        """
+        if vector is None or self.similarity_threshold is None or self.similarity_threshold >= 1:
+            with self._lock:
+                self.misses += 1
+            return None
+        query = self._normalize(vector)
+        current = frozenset(canonical_items(items)) if items is not None else None
+        with self._lock:
+            if self._matrix is not None:
+                sims = self._matrix @ query
+                for best in np.argsort(-sims):
+                    if sims[best] < self.similarity_threshold:
+                        break
+                    key = self._keys[best]
+                    entry = self._entries.get(key)
+                    if entry is None or self._expired(entry):
+                        continue
+                    if current is not None and (current < entry["items"] or current > entry["items"]):
+                        continue
+                    self._entries.move_to_end(key)
+                    self.similar_hits += 1
+                    print(f"匹配结果缓存相似命中，相似度: {sims[best]:.4f}")
+                    return entry["result"]
+            self.misses += 1
+            return None
+
+    def set(self, items, result, vector=None, version=None):
+        """
+        Args:
+            version: 计算结果时的数据版本，和当前版本不同时(计算过程中切换了版本)不缓存
+        """
+        key = self.make_key(items)
+        with self._lock:
+            if version is not None and version != self.version:
+                return
+            self._entries[key] = {
+                "result": result,
+                "vector": self._normalize(vector) if vector is not None else None,
+                "items": frozenset(canonical_items(items)),
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._rebuild_matrix()
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def stats(self):
+        total = self.exact_hits + self.similar_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "exact_hits": self.exact_hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.similar_hits) / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : name_resolver.py
+# @Desc  : 名称的模糊匹配，Agent传入的名称和数据集中的名称有少量字符或者标点不同时，也能找到对应的数据
+
+import os
+import re
+import numpy as np
+from DecisionAgent.embedding_store import normalize_text
+
+# 去掉标点、空白和书名号等，只保留文字和数字
+PUNCTUATION_PATTERN = re.compile(r"[\W_]+")
+
+
+def normalize_name(name):
+    """
+    名称归一化: 全角转半角、小写、去掉标点和空白
+    """
+    return PUNCTUATION_PATTERN.sub("", normalize_text(name).lower())
+
+
+def char_ngrams(text, n=2):
+    """
+    字符n-gram，长度不足n时返回整个文本
+    """
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def common_affixes(texts):
+    """
+    所有名称共同的前缀和后缀，例如法律名称都以"中华人民共和国"开头，比较时去掉，避免共同部分抬高相似度
+    """
+    if len(texts) < 2:
+        return "", ""
+    prefix = os.path.commonprefix(texts)
+    suffix = os.path.commonprefix([text[::-1] for text in texts])[::-1]
+    shortest = min(len(text) for text in texts)
+    # 至少给每个名称留下1个字符
+    prefix = prefix[:max(shortest - 1, 0)]
+    keep = max(shortest - len(prefix) - 1, 0)
+    suffix = suffix[len(suffix) - keep:] if keep else ""
+    return prefix, suffix
+
+
+def generic_core(text, prefixes=(), suffixes=()):
+    """
+    去掉通用的前缀和后缀，至少留下1个字符
+    Args:
+        text: 归一化的名称
+        prefixes: 领域内通用的前缀，例如法律名称的"中华人民共和国"
+        suffixes: 领域内通用的后缀，例如法律名称的"法"
+    """
+    changed = True
+    while changed:
+        changed = False
+        for prefix in prefixes:
+            if text.startswith(prefix) and len(text) > len(prefix):
+                text = text[len(prefix):]
+                changed = True
+        for suffix in suffixes:
+            if text.endswith(suffix) and len(text) > len(suffix):
+                text = text[:-len(suffix)]
+                changed = True
+    return text
+
+
+def edit_distance(a, b):
+    """
+    编辑距离(Levenshtein)，名称一般很短，直接动态规划
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+class NameResolver(object):
+    def __init__(self, names, aliases=None, threshold=0.7, margin=0.05, max_candidates=10,
+                 embedder=None, embedding_threshold=None, generic_prefixes=(), generic_suffixes=()):
+        """
+        启动时构建字符n-gram的倒排索引，查找时只对有共同n-gram的名称计算编辑距离
+        Args:
+            names: 数据集中的名称
+            aliases: 别名，{别名: 名称}
+            threshold: 相似度不低于这个值时才认为是同一个名称，相似度是1 - 编辑距离 / 较长名称的长度，
+                计算前去掉所有名称共同的前缀和后缀
+            margin: 第1名和第2名(不同名称)的相似度差小于这个值时，认为有歧义，不返回结果
+            max_candidates: 按共同n-gram数量最多计算多少个候选的编辑距离
+            embedder: EmbeddingModel，不为None并且设置了embedding_threshold时，字符匹配失败后再按名称的向量相似度查找
+            embedding_threshold: 名称向量的余弦相似度不低于这个值时认为是同一个名称
+            generic_prefixes: 领域内通用的前缀，名称只差这些字时认为是同一个，例如"劳动法"和"中华人民共和国劳动法"
+            generic_suffixes: 领域内通用的后缀，和generic_prefixes一样，不设置时不忽略任何前缀和后缀
+        """
+        self.threshold = threshold
+        self.margin = margin
+        self.max_candidates = max_candidates
+        self.embedder = embedder
+        self.embedding_threshold = embedding_threshold
+        self.generic_prefixes = tuple(normalize_name(prefix) for prefix in generic_prefixes)
+        self.generic_suffixes = tuple(normalize_name(suffix) for suffix in generic_suffixes)
+        # 归一化的名称或者别名 -> 数据集中的名称
+        self.targets = {}
+        for name in names:
+            self.targets.setdefault(normalize_name(name), name)
+        for alias, name in (aliases or {}).items():
+            self.targets.setdefault(normalize_name(alias), name)
+        self.targets.pop("", None)
+        self.prefix, self.suffix = common_affixes(list(self.targets))
+        self.keys = list(self.targets)
+        self.stripped = [self._strip(key) for key in self.keys]
+        self.index = {}
+        for i, key in enumerate(self.stripped):
+            for gram in char_ngrams(key):
+                self.index.setdefault(gram, []).append(i)
+        self._names = list(dict.fromkeys(names))
+        self._name_matrix = None
+
+    @classmethod
+    def from_catalog(cls, catalog, alias_field="aliases", **kwargs):
+        """
+        根据Catalog构建，数据中有alias_field字段(别名的列表)时也加入索引
+        """
+        aliases = {}
+        for record in catalog.records:
+            for alias in record.get(alias_field) or []:
+                aliases[alias] = record[catalog.name_field]
+        return cls(catalog.names(), aliases=aliases, **kwargs)
+
+    def _strip(self, key):
+        if self.prefix and key.startswith(self.prefix):
+            key = key[len(self.prefix):]
+        if self.suffix and key.endswith(self.suffix) and len(key) > len(self.suffix):
+            key = key[:-len(self.suffix)]
+        return key
+
+    def _core(self, key):
+        return generic_core(key, self.generic_prefixes, self.generic_suffixes)
+
+    def _score(self, query, key):
+        if (query in key or key in query) and self._core(query) == self._core(key):
+            # 只差领域内通用的前缀或者后缀，例如"劳动法"和"中华人民共和国劳动法"
+            return 1.0
+        # 其它的包含关系按编辑距离计算，多出的字符会降低相似度，例如"妊娠高血压"不是"高血压"
+        return 1.0 - edit_distance(query, key) / max(len(query), len(key))
+
+    def resolve(self, name):
+        """
+        按字符相似度查找
+        Returns: 数据集中的名称，没有足够相似或者有歧义时返回None
+        """
+        if not name:
+            return None
+        query = normalize_name(name)
+        if not query:
+            return None
+        if query in self.targets:
+            return self.targets[query]
+        query = self._strip(query)
+        counts = {}
+        for gram in char_ngrams(query):
+            for i in self.index.get(gram, ()):
+                counts[i] = counts.get(i, 0) + 1
+        candidates = sorted(counts, key=lambda i: -counts[i])[:self.max_candidates]
+        scored = {}
+        for i in candidates:
+            target = self.targets[self.keys[i]]
+            scored[target] = max(scored.get(target, 0.0), self._score(query, self.stripped[i]))
+        if not scored:
+            return None
+        ranked = sorted(scored.items(), key=lambda item: -item[1])
+        best, best_score = ranked[0]
+        if best_score < self.threshold:
+            return None
+        if len(ranked) > 1 and best_score - ranked[1][1] < self.margin:
+            print(f"名称模糊匹配有歧义: {name} -> {ranked[:2]}")
+            return None
+        print(f"名称模糊匹配: {name} -> {best}，相似度: {best_score:.4f}")
+        return best
+
+    async def aresolve(self, name):
+        """
+        先按字符相似度查找，失败时再按名称的向量相似度查找(需要设置embedder和embedding_threshold)
+        Returns: 数据集中的名称，没有时返回None
+        """
+        resolved = self.resolve(name)
+        if resolved is not None or self.embedder is None or self.embedding_threshold is None or not name:
+            return resolved
+        if self._name_matrix is None:
+            # 所有名称只embedding 1次
+            self._name_matrix = await self._embed(self._names)
+        query = (await self._embed([name]))[0]
+        sims = self._name_matrix @ query
+        best = int(np.argmax(sims))
+        if sims[best] >= self.embedding_threshold:
+            print(f"名称向量匹配: {name} -> {self._names[best]}，相似度: {sims[best]:.4f}")
+            return self._names[best]
+        return None
+
+    async def _embed(self, texts):
+        vectors_result = await self.embedder.ado_embedding(texts)
+        vectors = np.asarray([one["embedding"] for one in vectors_result["data"]], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : session_store.py
+# @Desc  : SQLite持久化的会话服务，活跃的会话保存在有上限的内存LRU中，修改延迟批量写入，空闲的会话移出内存
+
+import os
+import json
+import time
+import uuid
+import atexit
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+from google.adk.events.event import Event
+from google.adk.sessions import BaseSessionService, InMemorySessionService, Session
+from google.adk.sessions.base_session_service import GetSessionConfig, ListSessionsResponse
+from google.adk.sessions.state import State
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    last_update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT NOT NULL PRIMARY KEY,
+    state TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+"""
+
+
+def dump_state(state):
+    return json.dumps(state, ensure_ascii=False, default=str)
+
+
+class _Entry(object):
+    """
+    内存中的1个会话，以及还没有写入数据库的修改
+    """
+    __slots__ = ("session", "persisted_events", "state_dirty", "last_access")
+
+    def __init__(self, session, persisted_events):
+        self.session = session
+        # 已经写入数据库的事件数量，之后的事件是待写入的
+        self.persisted_events = persisted_events
+        self.state_dirty = False
+        self.last_access = time.time()
+
+    @property
+    def dirty(self):
+        return self.state_dirty or self.persisted_events < len(self.session.events)
+
+
+class SqliteSessionService(BaseSessionService):
+    def __init__(self, db_path="cache/sessions.db", max_sessions=1000, idle_seconds=1800, flush_interval=1.0):
+        """
+        和InMemorySessionService的接口一致，会话持久化到SQLite(WAL模式)，重启后可以继续之前的会话
+        Args:
+            db_path: SQLite文件路径
+            max_sessions: 内存中最多保存的会话数量，超出时写入数据库后移出内存，内存占用和见过多少个会话无关
+            idle_seconds: 会话超过这个时间没有访问时移出内存，下次访问时再从数据库加载
+            flush_interval: 延迟写入的间隔，单位秒，修改先保存在内存中，每隔这个时间批量写入1次
+        """
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self.flush_interval = flush_interval
+        db_dir = os.path.dirname(db_path)
+        if db_dir and not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        # 数据库连接只在持有锁时使用，写入在线程池中进行，不阻塞事件循环
+        self._db_lock = threading.Lock()
+        # (app_name, user_id, session_id) -> _Entry
+        self._sessions = OrderedDict()
+        self.app_state = {}
+        self.user_state = {}
+        self._dirty_app_states = set()
+        self._dirty_user_states = set()
+        self._load_shared_states()
+        self._flush_task = None
+        atexit.register(self.close)
+
+    def _load_shared_states(self):
+        with self._db_lock:
+            for app_name, state in self._conn.execute("SELECT app_name, state FROM app_states"):
+                self.app_state[app_name] = json.loads(state)
+            for app_name, user_id, state in self._conn.execute("SELECT app_name, user_id, state FROM user_states"):
+                self.user_state.setdefault(app_name, {})[user_id] = json.loads(state)
+
+    def _ensure_flush_task(self):
+        # 第1次在事件循环中使用时启动后台写入任务
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._flush_loop())
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                await self._evict_idle()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"会话写入数据库失败: {e}")
+
+    def _collect_dirty(self, keys=None):
+        """
+        在事件循环线程中收集待写入的修改并序列化，之后在线程池中写入数据库
+        """
+        rows = {"sessions": [], "events": [], "app_states": [], "user_states": []}
+        for key in (keys if keys is not None else list(self._sessions)):
+            entry = self._sessions.get(key)
+            if entry is None or not entry.dirty:
+                continue
+            session = entry.session
+            rows["sessions"].append((session.app_name, session.user_id, session.id, dump_state(session.state), session.last_update_time))
+            for seq in range(entry.persisted_events, len(session.events)):
+                rows["events"].append((session.app_name, session.user_id, session.id, seq, session.events[seq].model_dump_json()))
+            entry.persisted_events = len(session.events)
+            entry.state_dirty = False
+        for app_name in self._dirty_app_states:
+            rows["app_states"].append((app_name, dump_state(self.app_state.get(app_name, {}))))
+        for app_name, user_id in self._dirty_user_states:
+            rows["user_states"].append((app_name, user_id, dump_state(self.user_state.get(app_name, {}).get(user_id, {}))))
+        self._dirty_app_states.clear()
+        self._dirty_user_states.clear()
+        return rows
+
+    def _write(self, rows):
+        if not any(rows.values()):
+            return
+        with self._db_lock:
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?)", rows["sessions"])
+                self._conn.executemany("INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?)", rows["events"])
+                self._conn.executemany("INSERT OR REPLACE INTO app_states VALUES (?, ?)", rows["app_states"])
+                self._conn.executemany("INSERT OR REPLACE INTO user_states VALUES (?, ?, ?)", rows["user_states"])
+
+    async def flush(self, keys=None):
+        """
+        把内存中的修改写入数据库
+        """
+        rows = self._collect_dirty(keys)
+        await asyncio.to_thread(self._write, rows)
+
+    def close(self):
+        """
+        进程退出时把所有修改写入数据库
+        """
+        try:
+            self._write(self._collect_dirty())
+        except Exception as e:
+            logger.error(f"会话写入数据库失败: {e}")
+
+    async def _evict_idle(self):
+        now = time.time()
+        idle = [key for key, entry in self._sessions.items() if now - entry.last_access > self.idle_seconds]
+        if idle:
+            await self._evict(idle)
+
+    async def _evict(self, keys):
+        # 先写入再移出内存，移出的会话下次访问时从数据库加载
+        await self.flush(keys)
+        for key in keys:
+            entry = self._sessions.get(key)
+            if entry is not None and not entry.dirty:
+                del self._sessions[key]
+
+    async def _remember(self, key, entry):
+        self._sessions[key] = entry
+        self._sessions.move_to_end(key)
+        if len(self._sessions) > self.max_sessions:
+            overflow = list(self._sessions)[:len(self._sessions) - self.max_sessions]
+            await self._evict(overflow)
+
+    def _load(self, key):
+        app_name, user_id, session_id = key
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT state, last_update_time FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key
+            ).fetchone()
+            if row is None:
+                return None
+            events = [one[0] for one in self._conn.execute(
+                "SELECT event FROM events WHERE app_name = ? AND user_id = ? AND session_id = ? ORDER BY seq", key
+            )]
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=json.loads(row[0]),
+            events=[Event.model_validate_json(event) for event in events],
+            last_update_time=row[1],
+        )
+        return _Entry(session, persisted_events=len(events))
+
+    async def _get_entry(self, key):
+        entry = self._sessions.get(key)
+        if entry is None:
+            entry = await asyncio.to_thread(self._load, key)
+            if entry is None:
+                return None
+            await self._remember(key, entry)
+        else:
+            self._sessions.move_to_end(key)
+        entry.last_access = time.time()
+        return entry
+
+    def _copy(self, session, config=None):
+        """
+        返回给调用方的会话副本，state复制1层，事件列表复制，事件对象共享(事件追加后不会再修改)
+        """
+        events = session.events
+        if config:
+            if config.num_recent_events:
+                events = events[-config.num_recent_events:]
+            if config.after_timestamp:
+                events = [event for event in events if event.timestamp >= config.after_timestamp]
+        state = self._merge_state(dict(session.state), session.app_name, session.user_id)
+        return session.model_copy(update={"state": state, "events": list(events)})
+
+    def _merge_state(self, state, app_name, user_id):
+        for key, value in self.app_state.get(app_name, {}).items():
+            state[State.APP_PREFIX + key] = value
+        for key, value in self.user_state.get(app_name, {}).get(user_id, {}).items():
+            state[State.USER_PREFIX + key] = value
+        return state
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: Optional[dict[str, Any]] = None,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        self._ensure_flush_task()
+        session_id = session_id.strip() if session_id and session_id.strip() else str(uuid.uuid4())
+        session = Session(
+            app_name=app_name,
+            user_id=user_id,
+            id=session_id,
+            state=state or {},
+            last_update_time=time.time(),
+        )
+        entry = _Entry(session, persisted_events=0)
+        entry.state_dirty = True
+        await self._remember((app_name, user_id, session_id), entry)
+        return self._copy(session)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: Optional[GetSessionConfig] = None,
+    ) -> Optional[Session]:
+        self._ensure_flush_task()
+        entry = await self._get_entry((app_name, user_id, session_id))
+        if entry is None:
+            return None
+        return self._copy(entry.session, config)
+
+    async def get_session_state(self, *, app_name: str, user_id: str, session_id: str) -> Optional[dict[str, Any]]:
+        """
+        只返回会话的state，不复制事件列表，每轮对话的开销和对话长度无关
+        Returns: state的浅复制，会话不存在时返回None
+        """
+        self._ensure_flush_task()
+        entry = await self._get_entry((app_name, user_id, session_id))
+        if entry is None:
+            return None
+        return self._merge_state(dict(entry.session.state), app_name, user_id)
+
+    async def list_sessions(self, *, app_name: str, user_id: str) -> ListSessionsResponse:
+        await self.flush()
+        def query():
+            with self._db_lock:
+                return self._conn.execute(
+                    "SELECT id, last_update_time FROM sessions WHERE app_name = ? AND user_id = ?", (app_name, user_id)
+                ).fetchall()
+        rows = await asyncio.to_thread(query)
+        return ListSessionsResponse(sessions=[
+            Session(app_name=app_name, user_id=user_id, id=session_id, last_update_time=last_update_time)
+            for session_id, last_update_time in rows
+        ])
+
+    async def delete_session(self, *, app_name: str, user_id: str, session_id: str) -> None:
+        key = (app_name, user_id, session_id)
+        self._sessions.pop(key, None)
+        def delete():
+            with self._db_lock:
+                with self._conn:
+                    self._conn.execute("DELETE FROM sessions WHERE app_name = ? AND user_id = ? AND id = ?", key)
+                    self._conn.execute("DELETE FROM events WHERE app_name = ? AND user_id = ? AND session_id = ?", key)
+        await asyncio.to_thread(delete)
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        # 更新调用方持有的会话副本
+        await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        entry = await self._get_entry(key)
+        if entry is None:
+            logger.warning(f"Failed to append event to session {session.id}: session not found")
+            return event
+        if event.actions and event.actions.state_delta:
+            for state_key, value in event.actions.state_delta.items():
+                if state_key.startswith(State.APP_PREFIX):
+                    self.app_state.setdefault(session.app_name, {})[state_key.removeprefix(State.APP_PREFIX)] = value
+                    self._dirty_app_states.add(session.app_name)
+                if state_key.startswith(State.USER_PREFIX):
+                    self.user_state.setdefault(session.app_name, {}).setdefault(session.user_id, {})[state_key.removeprefix(State.USER_PREFIX)] = value
+                    self._dirty_user_states.add((session.app_name, session.user_id))
+            entry.state_dirty = True
+        # 更新内存中的会话，新的事件由后台任务写入数据库
+        await super().append_event(session=entry.session, event=event)
+        entry.session.last_update_time = event.timestamp
+        return event
+
+
+async def read_session_state(session_service, app_name, user_id, session_id):
+    """
+    读取会话的state，不复制事件列表
+    ADK的InMemorySessionService.get_session会深复制整个会话，包括所有的事件，对话越长越慢
+    Args:
+        session_service: SqliteSessionService、InMemorySessionService或者其它BaseSessionService
+    Returns: state的浅复制，会话不存在时返回None
+    """
+    if isinstance(session_service, SqliteSessionService):
+        return await session_service.get_session_state(app_name=app_name, user_id=user_id, session_id=session_id)
+    if isinstance(session_service, InMemorySessionService):
+        # 直接读取内存中的会话，只复制state，事件列表共享
+        session = session_service.sessions.get(app_name, {}).get(user_id, {}).get(session_id)
+        if session is None:
+            return None
+        return session_service._merge_state(app_name, user_id, session.model_copy(update={"state": dict(session.state)})).state
+    session = await session_service.get_session(
+        app_name=app_name, user_id=user_id, session_id=session_id, config=GetSessionConfig(num_recent_events=1)
+    )
+    return session.state if session is not None else None
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : session_vector.py
+# @Desc  : 会话的查询向量，每条证据只embedding 1次，查询向量由会话中累加的向量和得到
+
+import base64
+import numpy as np
+
+
+def encode_vector(vector):
+    """
+    向量以float32的base64字符串保存在state中，比浮点数列表的JSON小很多
+    """
+    return base64.b64encode(np.asarray(vector, dtype=np.float32).tobytes()).decode("ascii")
+
+
+def decode_vector(text):
+    return np.frombuffer(base64.b64decode(text), dtype=np.float32).copy()
+
+
+async def update_session_vector(embedder, state, key, items, decay=1.0):
+    """
+    增量更新会话的查询向量，只对新增的证据(症状、案情等)进行embedding
+    会话state中保存已经累加的证据、加权的向量和以及权重的和:
+    state[f"{key}_query_vector"] = {"items": [...], "sum": base64(float32), "weight": float}
+    每轮的计算量只和新增的证据数量有关，和会话的长度无关
+    Args:
+        embedder: EmbeddingModel
+        state: 会话的state，例如tool_context.state
+        key: 证据在state中的key，例如symptoms
+        items: 当前所有的证据
+        decay: 每次有新证据时，之前的向量和以及权重乘以这个系数，小于1时新的证据权重更高，1表示所有证据权重相同
+    Returns: 归一化后的查询向量(加权平均的方向)，list[float]，没有任何证据时返回None
+    """
+    state_key = f"{key}_query_vector"
+    session_vector = state.get(state_key) or {}
+    included_items = list(session_vector.get("items", []))
+    vector_sum = decode_vector(session_vector["sum"]) if session_vector.get("sum") else None
+    weight = float(session_vector.get("weight", 0.0))
+    included = set(included_items)
+    new_items = [item for item in items if item not in included]
+    if new_items:
+        print(f"会话查询向量新增{len(new_items)}条证据: {new_items}")
+        vectors_result = await embedder.ado_embedding(new_items)
+        new_vectors = np.asarray([one["embedding"] for one in vectors_result["data"]], dtype=np.float32)
+        norms = np.linalg.norm(new_vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        new_sum = (new_vectors / norms).sum(axis=0)
+        if vector_sum is None:
+            vector_sum = new_sum
+        else:
+            vector_sum = vector_sum * decay + new_sum
+        weight = weight * decay + len(new_items)
+        state[state_key] = {"items": included_items + new_items, "sum": encode_vector(vector_sum), "weight": weight}
+    if vector_sum is None or weight <= 0:
+        return None
+    mean = vector_sum / weight
+    norm = np.linalg.norm(mean)
+    return (mean / norm if norm > 0 else mean).tolist()
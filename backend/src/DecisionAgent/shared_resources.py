@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : shared_resources.py
+# @Desc  : 进程内共享的embedding模型、向量库和工具模型，多个领域的Agent运行在同一个进程时只创建1份
+
+import threading
+from DecisionAgent.embedding_utils import EmbeddingModel, ChromaDB
+from DecisionAgent.tool_model import ToolModel
+
+_lock = threading.Lock()
+_embedders = {}
+_chromadbs = {}
+_tool_models = {}
+
+
+def get_embedder(provider="aliyun", **kwargs):
+    """
+    相同provider和参数的EmbeddingModel只创建1个，共享向量缓存、连接池和批量请求
+    """
+    key = (provider, tuple(sorted(kwargs.items())))
+    with _lock:
+        if key not in _embedders:
+            _embedders[key] = EmbeddingModel(provider=provider, **kwargs)
+        return _embedders[key]
+
+
+def get_chromadb(embedder, backend="chroma", db_dir=None):
+    """
+    相同embedding模型、向量库类型和目录的ChromaDB只创建1个，不同领域使用不同的collection
+    """
+    key = (id(embedder), backend, db_dir)
+    with _lock:
+        if key not in _chromadbs:
+            _chromadbs[key] = ChromaDB(embedder=embedder, db_dir=db_dir, backend=backend)
+        return _chromadbs[key]
+
+
+def get_tool_model(provider, model, api_base, api_key, timeout=60.0):
+    """
+    相同模型的ToolModel只创建1个，共享并发限制、生成结果的缓存和进行中的请求
+    """
+    key = (provider, model, api_base, api_key, timeout)
+    with _lock:
+        if key not in _tool_models:
+            _tool_models[key] = ToolModel(provider=provider, model=model, api_base=api_base, api_key=api_key, timeout=timeout)
+        return _tool_models[key]
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : stream_coalescer.py
+# @Desc  : SSE流式输出时合并模型的增量文本，达到时间、字节数阈值或者遇到句子结束时才发送1次，减少A2A消息和SSE帧的数量
+
+import os
+import time
+import asyncio
+import contextlib
+
+# 遇到这些字符时认为1句话结束，立即发送
+SENTENCE_BOUNDARIES = "。！？；\n.!?;"
+
+
+class StreamCoalescer(object):
+    def __init__(self, max_delay=0.03, max_bytes=256, boundaries=SENTENCE_BOUNDARIES):
+        """
+        缓存模型流式输出的增量文本，满足以下任意条件时返回缓存的文本并清空:
+        距离第1段缓存的文本超过max_delay秒、缓存的文本超过max_bytes字节、新的文本以句子结束符结尾
+        返回的文本只包含上次发送之后的新内容(增量)，不是累计的全文
+        Args:
+            max_delay: 时间阈值，单位秒
+            max_bytes: 字节数阈值，小于等于0时不合并，每段文本都立即发送
+            boundaries: 句子结束符
+        """
+        self.max_delay = max_delay
+        self.max_bytes = max_bytes
+        self.boundaries = boundaries
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.first_time = None
+
+    @classmethod
+    def from_env(cls):
+        """
+        从环境变量读取配置，和env_template一致
+        """
+        return cls(
+            max_delay=float(os.environ.get("STREAM_COALESCE_MS", 30)) / 1000,
+            max_bytes=int(os.environ.get("STREAM_COALESCE_BYTES", 256)),
+        )
+
+    def add(self, text):
+        """
+        缓存1段增量文本
+        Returns: 需要发送的文本，还不需要发送时返回None
+        """
+        if not text:
+            return None
+        if not self.buffer:
+            self.first_time = time.monotonic()
+        self.buffer.append(text)
+        self.buffer_bytes += len(text.encode("utf-8"))
+        last_char = text.rstrip(" ")[-1:]
+        if (self.buffer_bytes >= self.max_bytes
+                or time.monotonic() - self.first_time >= self.max_delay
+                or (last_char and last_char in self.boundaries)):
+            return self.flush()
+        return None
+
+    def remaining(self):
+        """
+        距离时间阈值还有多少秒，没有缓存的文本时返回None，表示不需要定时发送
+        """
+        if not self.buffer:
+            return None
+        return max(self.max_delay - (time.monotonic() - self.first_time), 0.0)
+
+    def flush(self):
+        """
+        返回并清空缓存的文本，没有缓存时返回None
+        """
+        if not self.buffer:
+            return None
+        text = "".join(self.buffer)
+        self.buffer = []
+        self.buffer_bytes = 0
+        self.first_time = None
+        return text
+
+
+# coalesced_events中表示事件流已经结束
+_DONE = object()
+
+
+async def coalesced_events(events, coalescer):
+    """
+    逐个返回events中的事件，coalescer中有缓存的文本并且等待下1个事件超过了时间阈值时返回None，
+    调用方收到None时调用coalescer.flush()发送缓存的文本，不需要等到下1段文本到达
+    events在单独的任务中读取，超时只取消对队列的等待，不会中断events本身
+    Args:
+        events: 异步迭代器，例如Runner.run_async的返回值
+        coalescer: StreamCoalescer
+    """
+    queue = asyncio.Queue(maxsize=1)
+
+    async def pump():
+        try:
+            async with contextlib.aclosing(events):
+                async for event in events:
+                    await queue.put(event)
+        except Exception as e:
+            await queue.put(e)
+        await queue.put(_DONE)
+
+    pump_task = asyncio.create_task(pump())
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), coalescer.remaining())
+            except asyncio.TimeoutError:
+                yield None
+                continue
+            if item is _DONE:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        # 调用方提前结束(例如收到最终结果)或者被取消时，停止读取events
+        pump_task.cancel()
+        await asyncio.wait([pump_task])
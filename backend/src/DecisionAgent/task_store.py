@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : task_store.py
+# @Desc  : 有容量上限的A2A任务存储，按数量、时间、大小淘汰任务，只保留最近的状态消息，结束的任务可以写入磁盘
+
+import os
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from a2a.server.tasks import TaskStore
+from a2a.types import Task, TaskState
+
+logger = logging.getLogger(__name__)
+
+# 这些状态的任务不会再更新，优先淘汰，并且可以写入磁盘
+TERMINAL_STATES = {TaskState.completed, TaskState.canceled, TaskState.failed, TaskState.rejected, TaskState.unknown}
+
+
+class BoundedTaskStore(TaskStore):
+    def __init__(self, max_tasks=10000, max_age=3600, max_bytes=64 * 1024 * 1024, history_length=20, spill_dir=None):
+        """
+        替代InMemoryTaskStore，内存占用有上限，服务可以长期运行
+        Args:
+            max_tasks: 内存中最多保存的任务数量
+            max_age: 已结束的任务最后一次更新后在内存中保存的时间，单位秒
+            max_bytes: 内存中所有任务序列化后的总大小上限
+            history_length: 每个任务只保留最近的多少条消息，0表示不截断
+            spill_dir: 不为空时，淘汰的已结束任务写入这个目录，之后仍然可以通过get查询
+        """
+        self.max_tasks = max_tasks
+        self.max_age = max_age
+        self.max_bytes = max_bytes
+        self.history_length = history_length
+        self.spill_dir = spill_dir
+        if spill_dir and not os.path.exists(spill_dir):
+            os.makedirs(spill_dir)
+        # task_id -> (task, 序列化后的大小, 最后保存的时间)，按最后保存的时间排序
+        self.tasks = OrderedDict()
+        self.total_bytes = 0
+        self.lock = asyncio.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """
+        从环境变量读取配置，和env_template一致
+        """
+        return cls(
+            max_tasks=int(os.environ.get("TASK_STORE_MAX_TASKS", 10000)),
+            max_age=float(os.environ.get("TASK_STORE_MAX_AGE", 3600)),
+            max_bytes=int(os.environ.get("TASK_STORE_MAX_BYTES", 64 * 1024 * 1024)),
+            history_length=int(os.environ.get("TASK_HISTORY_LENGTH", 20)),
+            spill_dir=os.environ.get("TASK_SPILL_DIR") or None,
+        )
+
+    def _spill_path(self, task_id):
+        # task_id来自请求，文件名使用它的哈希，不同的task_id不会对应同一个文件，也不会出现路径字符
+        name = hashlib.sha256(task_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.json")
+
+    def _remove(self, task_id):
+        task, size, _ = self.tasks.pop(task_id)
+        self.total_bytes -= size
+        return task
+
+    def _evict(self):
+        """
+        淘汰超时的任务，以及超出数量、大小上限的任务，优先淘汰已结束的任务
+        Returns: 需要写入磁盘的任务
+        """
+        evicted = []
+        now = time.time()
+        for task_id, (task, _, saved_at) in list(self.tasks.items()):
+            if now - saved_at <= self.max_age:
+                break
+            # 未结束的任务(例如等待用户输入)不按时间淘汰，只在超出数量、大小上限时淘汰
+            if task.status.state in TERMINAL_STATES:
+                evicted.append(self._remove(task_id))
+        if len(self.tasks) > self.max_tasks or self.total_bytes > self.max_bytes:
+            finished = [task_id for task_id, (task, _, _) in self.tasks.items() if task.status.state in TERMINAL_STATES]
+            for task_id in finished:
+                if len(self.tasks) <= self.max_tasks and self.total_bytes <= self.max_bytes:
+                    break
+                evicted.append(self._remove(task_id))
+        while len(self.tasks) > self.max_tasks or self.total_bytes > self.max_bytes:
+            # 只剩运行中的任务仍然超出上限，淘汰最久没有更新的
+            task_id = next(iter(self.tasks))
+            logger.warning(f"任务存储超出上限，淘汰未结束的任务: {task_id}")
+            evicted.append(self._remove(task_id))
+        if not self.spill_dir:
+            return []
+        return [task for task in evicted if task.status.state in TERMINAL_STATES]
+
+    def _write_spilled(self, rows):
+        for task_id, data in rows:
+            with open(self._spill_path(task_id), "w", encoding="utf-8") as f:
+                f.write(data)
+
+    def _read_spilled(self, task_id):
+        path = self._spill_path(task_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return Task.model_validate_json(f.read())
+
+    async def save(self, task: Task) -> None:
+        # 保存深拷贝，调用方之后修改自己持有的任务(例如正在运行的TaskManager追加消息)时，不会改变已经统计的大小
+        task = task.model_copy(deep=True)
+        if self.history_length and task.history and len(task.history) > self.history_length:
+            # 只截断副本，调用方持有的任务的消息保持完整
+            task.history = task.history[-self.history_length:]
+        size = len(task.model_dump_json())
+        async with self.lock:
+            if task.id in self.tasks:
+                self._remove(task.id)
+            self.tasks[task.id] = (task, size, time.time())
+            self.total_bytes += size
+            spilled = self._evict()
+        if spilled:
+            rows = [(task.id, task.model_dump_json()) for task in spilled]
+            await asyncio.to_thread(self._write_spilled, rows)
+
+    async def get(self, task_id: str) -> Task | None:
+        async with self.lock:
+            item = self.tasks.get(task_id)
+        if item is not None:
+            # 返回副本，和save一样，调用方的修改只有再次save时才会生效
+            return item[0].model_copy(deep=True)
+        if self.spill_dir:
+            return await asyncio.to_thread(self._read_spilled, task_id)
+        return None
+
+    async def delete(self, task_id: str) -> None:
+        async with self.lock:
+            if task_id in self.tasks:
+                self._remove(task_id)
+        if self.spill_dir and os.path.exists(self._spill_path(task_id)):
+            await asyncio.to_thread(os.remove, self._spill_path(task_id))
+
+    def stats(self):
+        return {"tasks": len(self.tasks), "bytes": self.total_bytes}
@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : tool_model.py
+# @Desc  : 工具中使用的大模型，异步调用，不阻塞事件循环
+
+import asyncio
+import hashlib
+import httpx
+import litellm
+from DecisionAgent.cache_utils import cache_from_env, MISSING
+from DecisionAgent.embedding_store import normalize_text
+
+
+class ToolModel(object):
+    def __init__(self, provider, model, api_base, api_key, timeout=60.0, max_concurrency=16, max_connections=32,
+                 cache_dir="cache/completion"):
+        """
+        工具中对向量粗筛的结果进行细筛或者生成内容的大模型
+        Args:
+            provider: 模型的提供方
+            model: 模型名称
+            api_base: 模型的api地址
+            api_key: 模型的api key
+            timeout: 每次请求的超时时间，单位秒
+            max_concurrency: 同时进行的最大请求数
+            max_connections: 共享连接池的最大连接数，连接会保持keep-alive复用
+            cache_dir: 生成结果的缓存目录，只缓存指定了cache_key的请求，
+                过期时间和容量由TOOL_MODEL_CACHE_TTL、TOOL_MODEL_CACHE_MAX_ENTRIES、TOOL_MODEL_CACHE_MAX_BYTES设置
+        """
+        self.provider = provider
+        self.model = model
+        self.api_base = api_base
+        self.api_key = api_key
+        self.timeout = timeout
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.cache = cache_from_env(cache_dir=cache_dir, prefix="TOOL_MODEL_CACHE", memory_entries=512, max_bytes=256 * 1024 * 1024,
+                                    max_entries=5000, ttl=7 * 24 * 3600, policy="lfu")
+        # 正在进行中的请求，相同的key只请求1次 {key: [task, 等待者数量]}
+        self._inflight = {}
+        if litellm.aclient_session is None:
+            # litellm的异步请求共享1个连接池
+            litellm.aclient_session = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=timeout,
+            )
+
+    def make_cache_key(self, prompt, cache_key):
+        """
+        缓存的key由归一化的名称、prompt模板的版本和模型名称组成
+        prompt模板的版本是去掉名称之后的prompt的哈希，模板修改后旧的缓存自动失效
+        """
+        template_version = hashlib.md5(prompt.replace(cache_key, "").encode()).hexdigest()
+        return f"{self.model}|{template_version}|{normalize_text(cache_key)}"
+
+    async def aquery(self, prompt, cache_key=None):
+        """
+        异步请求大模型，任务被取消时，请求也会被取消
+        Args:
+            prompt: 完整的prompt
+            cache_key: 不为空时使用缓存，一般是prompt中的名称，例如疾病名称，相同的名称和模板直接返回缓存的结果，
+                同时到达的相同请求只会请求模型1次
+        Returns: 模型返回的文本，出错时返回Error: 错误信息
+        """
+        if not cache_key:
+            return await self._query(prompt)
+        key = self.make_cache_key(prompt, cache_key)
+        result = self.cache.get(key)
+        if result is not MISSING:
+            print(f"工具模型缓存命中: {cache_key}")
+            return result
+        inflight = self._inflight.get(key)
+        if inflight is None or inflight[0].done():
+            # 没有进行中的请求，或者之前的请求已经被取消，重新请求
+            inflight = [asyncio.ensure_future(self._query_and_cache(key, prompt)), 0]
+            self._inflight[key] = inflight
+        inflight[1] += 1
+        task = inflight[0]
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # 所有等待者都取消时，才取消模型请求
+            inflight[1] -= 1
+            if inflight[1] == 0 and not task.done():
+                task.cancel()
+                # 之后到达的相同请求重新发起，不会等待已经取消的请求
+                if self._inflight.get(key) is inflight:
+                    del self._inflight[key]
+            raise
+
+    async def _query_and_cache(self, key, prompt):
+        try:
+            result = await self._query(prompt)
+            if result and not result.startswith("Error:"):
+                self.cache.set(key, result)
+            return result
+        finally:
+            # 只移除自己，取消后重新发起的请求可能已经使用了相同的key
+            inflight = self._inflight.get(key)
+            if inflight is not None and inflight[0] is asyncio.current_task():
+                del self._inflight[key]
+
+    async def _query(self, prompt):
+        try:
+            async with self._semaphore:
+                response = await litellm.acompletion(provider=self.provider, model=self.model,
+                                                     messages=[{"content": prompt, "role": "user"}],
+                                                     api_base=self.api_base,
+                                                     api_key=self.api_key,
+                                                     timeout=self.timeout
+                                                     )
+            return response.choices[0].message.content
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            return f"Error: {str(e)}"
@@ -5,84 +5,20 @@
 # @Author: johnson
 # @Contact : github: johnson7788
 # @Desc  :
-import os
-from litellm import completion
-from google.adk.tools import ToolContext
-from google.adk.tools.agent_tool import AgentTool
+from dotenv import load_dotenv
 from data import example_data
-import time
-from datetime import datetime
-import random
-from embedding_utils import EmbeddingModel,ChromaDB
-from data import example_data
-# import litellm
-# litellm._turn_on_debug()
-
-TOOL_MODEL_API_BASE = os.environ["TOOL_MODEL_API_BASE"]
-TOOL_MODEL_API_KEY = os.environ["TOOL_MODEL_API_KEY"]
-TOOL_MODEL_NAME = os.environ["TOOL_MODEL_NAME"]
-TOOL_MODEL_PROVIDER = os.environ["TOOL_MODEL_PROVIDER"]
-
-embedder = EmbeddingModel()
-chromadb_instance = ChromaDB(embedder=embedder)
-collection_name = "disease_matches"
-
-def query_deepseek(prompt):
-    try:
-        response = completion(provider=TOOL_MODEL_PROVIDER, model=TOOL_MODEL_NAME,
-                                   messages=[{"content": prompt, "role": "user"}],
-                                   api_base=TOOL_MODEL_API_BASE,
-                                   api_key=TOOL_MODEL_API_KEY
-                              )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error: {str(e)}"
-
-async def matchDiseaseBySymptoms(
-    symptoms: list[str],
-    tool_context: ToolContext,
-) -> str:
-    """
-    根据疾病的症状搜索可能的疾病
-    params:
-    symptoms：症状的列表
-    :return: 返回所有可能的疾病
-    """
-    # 需要使用疾病症状和数据库进行向量匹配，然后使用大模型进行判断，是否是一个或者多个疾病。返回给前端疾病名称和症状。
-    agent_name = tool_context.agent_name
-    history_symptoms = tool_context.state.get("symptoms", [])
-    print(f"Agent {agent_name} 正在调用工具：matchDiseaseBySymptoms，传入的症状是：{symptoms}，历史症状有: {history_symptoms}")
-    history_symptoms.extend(symptoms)
-    history_symptoms = list(set(history_symptoms))
-    tool_context.state["symptoms"] = history_symptoms #更新症状
-
-    history_symptoms_text = ",".join(history_symptoms)
-    print(f"\n查询文本: '{history_symptoms_text}'")
-    query_results = chromadb_instance.query2collection(
-        collection=collection_name,
-        query_documents=[history_symptoms_text],
-        topk=2
-    )
-    print("查询结果:")
-    disease_symptoms = []
-    for i in range(len(query_results["documents"][0])):
-        doc = query_results["documents"][0][i]
-        meta = query_results["metadatas"][0][i]
-        distance = query_results["distances"][0][i]
-        print(f"  文档: {doc[:50]}... (截断)")
-        print(f"  名称: {meta.get('name')}")
-        print(f"  距离: {distance:.4f}\n")
-        for one_data in example_data:
-            if one_data["name"] == meta["name"]:
-                disease_symptoms.append(f"{meta.get('name')}: {one_data['matches']}")
-    disease_symptoms_text = "\n".join(disease_symptoms)
-    prompt = f"""
+from decision_tools import DecisionToolEngine
+# 加载环境变量
+load_dotenv()
+
+# 细筛的prompt，{candidates}替换为向量粗筛得到的候选及其描述，{evidence}替换为用户提供的所有信息
+MATCH_PROMPT = """
 你是一名医学诊断助手，擅长根据患者描述的症状，从已有疾病症状数据库中识别出最可能的相关疾病，并判断是否需要补充更多症状来明确诊断。
 
 以下是已知疾病及其典型症状的描述：
 
 ```
-{disease_symptoms_text}
+{candidates}
 ```
 
 请根据患者提供的症状，分析并返回可能相关的疾病名称，按照与描述症状的匹配程度排序。
@@ -96,7 +32,7 @@ async def matchDiseaseBySymptoms(
 **用户描述的症状如下：**
 
 ```
-{history_symptoms}
+{evidence}
 ```
 
 **请输出如下格式：**
@@ -108,21 +44,9 @@ async def matchDiseaseBySymptoms(
 3. 疾病名称C：建议确认是否伴随【症状Z】，以提高判断准确性
 ```
 """
-    result = query_deepseek(prompt)
-    return result
 
-async def getTreatmentAdvice(disease_name: str, tool_context: ToolContext) -> str:
-    """
-    获取疾病的治疗建议
-    params:
-    disease_name: 疾病名称
-    """
-    #查询真实的某个疾病的治疗建议数据库，得到专业建议，这里使用大模型模拟
-    print(f"Agent {tool_context.agent_name} 正在调用工具：getTreatmentAdvice，传入的疾病名称是：{disease_name}")
-    for one_data in example_data:
-        if one_data["name"] == disease_name:
-            return one_data["treatment_plan"]
-    prompt = """
+# 数据集中没有对应的名称时，让工具模型生成内容的prompt，末尾会加上名称
+ADVICE_PROMPT = """
 ### 🩺 Prompt：疾病治疗建议助手
 
 你是一位具有丰富临床经验的医学专家，擅长用**通俗易懂的语言**为患者提供**可靠的治疗建议**。你具备对医学文献的检索和整合能力，能够基于最新的循证医学和权威指南，提供针对特定疾病的治疗方案。
@@ -137,11 +61,42 @@ async def getTreatmentAdvice(disease_name: str, tool_context: ToolContext) -> st
 请确保回答内容简洁明了，适合患者理解。如果该疾病属于罕见病或特需专科干预，请注明需就诊相关专科医生。
 
 """
-    prompt += f"###  disease_name: {disease_name}"
-    response = query_deepseek(prompt)
-    return response
+
+engine = DecisionToolEngine(
+    records=example_data,
+    name_field="name",
+    document_field="matches",
+    advice_field="treatment_plan",
+    collection_name="disease_matches",
+    state_key="symptoms",
+    match_tool_name="matchDiseaseBySymptoms",
+    match_param="symptoms",
+    match_param_type=list[str],
+    match_description="""
+    根据疾病的症状搜索可能的疾病
+    params:
+    symptoms：症状的列表
+    :return: 返回所有可能的疾病
+    """,
+    match_prompt=MATCH_PROMPT,
+    evidence_label="症状",
+    advice_tool_name="getTreatmentAdvice",
+    advice_param="disease_name",
+    advice_description="""
+    获取疾病的治疗建议
+    params:
+    disease_name: 疾病名称
+    """,
+    advice_prompt=ADVICE_PROMPT,
+    advice_label="疾病名称",
+)
+matchDiseaseBySymptoms = engine.match_tool
+getTreatmentAdvice = engine.advice_tool
 
 
 if __name__ == '__main__':
-    result = matchDiseaseBySymptoms(symptoms=['失眠'])
-    print(result)
\ No newline at end of file
+    import asyncio
+    from types import SimpleNamespace
+    tool_context = SimpleNamespace(agent_name="test", state={})
+    result = asyncio.run(matchDiseaseBySymptoms(symptoms=['失眠'], tool_context=tool_context))
+    print(result)
@@ -0,0 +1,450 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @File  : vector_backend.py
+# @Desc  : 向量存储的后端，ChromaDB类通过后端读写向量，支持chromadb和纯numpy的内存索引
+
+import os
+import json
+import threading
+import numpy as np
+import chromadb  #pip install chromadb
+from chromadb.config import Settings
+
+
+class VectorBackend(object):
+    """
+    向量存储后端的接口，返回的数据格式和chromadb保持一致
+    """
+
+    def upsert(self, collection, ids, embeddings, documents, metadatas=None):
+        raise NotImplementedError
+
+    def delete(self, collection, ids):
+        raise NotImplementedError
+
+    def get(self, collection, ids=None):
+        """
+        Returns: {"ids": [...], "documents": [...], "metadatas": [...]}
+        """
+        raise NotImplementedError
+
+    def query(self, collection, query_embeddings, n_results=3, where=None, where_document=None):
+        """
+        Returns: {"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}，每个查询向量对应1个list
+        """
+        raise NotImplementedError
+
+    def peek(self, collection, number=100):
+        raise NotImplementedError
+
+    def count(self, collection):
+        raise NotImplementedError
+
+    def delete_collection(self, collection):
+        raise NotImplementedError
+
+    def list_collections(self):
+        raise NotImplementedError
+
+    def warmup(self, collection):
+        """
+        在第一次用户查询之前加载索引
+        """
+        pass
+
+
+class ChromaBackend(VectorBackend):
+    def __init__(self, db_dir="cache/chromadb"):
+        """
+        基于chromadb的持久化HNSW索引
+        每个collection只解析1次，之后复用句柄，collection被删除或重建后句柄会自动刷新
+        """
+        self.db_dir = db_dir
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self.client = chromadb.PersistentClient(path=db_dir, settings=Settings(anonymized_telemetry=False))
+        self._handles = {}
+        self._lock = threading.Lock()
+
+    def _collection(self, collection, create=False):
+        """
+        Args:
+            create: 为True时不存在则创建，写入时使用; 查询时为False，collection不存在会报错，而不是创建1个空的collection
+        """
+        handle = self._handles.get(collection)
+        if handle is not None:
+            return handle
+        with self._lock:
+            handle = self._handles.get(collection)
+            if handle is None:
+                if create:
+                    handle = self.client.get_or_create_collection(collection, metadata={"hnsw:space": "cosine"})
+                else:
+                    handle = self.client.get_collection(collection)
+                self._handles[collection] = handle
+        return handle
+
+    def _call(self, collection, func, create=False):
+        """
+        使用缓存的句柄执行操作，如果collection已经被删除或者重建，句柄失效，重新解析后重试1次
+        """
+        handle = self._collection(collection, create=create)
+        try:
+            return func(handle)
+        except Exception:
+            with self._lock:
+                if self._handles.get(collection) is not handle:
+                    raise
+                self._handles.pop(collection, None)
+            return func(self._collection(collection, create=create))
+
+    def upsert(self, collection, ids, embeddings, documents, metadatas=None):
+        self._call(collection, lambda col: col.upsert(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas or None), create=True)
+
+    def delete(self, collection, ids):
+        if ids:
+            self._call(collection, lambda col: col.delete(ids=ids))
+
+    def get(self, collection, ids=None):
+        return self._call(collection, lambda col: col.get(ids=ids, include=["metadatas", "documents"]), create=True)
+
+    def query(self, collection, query_embeddings, n_results=3, where=None, where_document=None):
+        kwargs = {}
+        if where:
+            kwargs["where"] = where
+        if where_document:
+            kwargs["where_document"] = where_document
+        return self._call(collection, lambda col: col.query(
+            query_embeddings=query_embeddings,
+            n_results=n_results,
+            include=["metadatas", "documents", "distances"],
+            **kwargs
+        ))
+
+    def peek(self, collection, number=100):
+        return self._call(collection, lambda col: col.peek(number))
+
+    def count(self, collection):
+        return self._call(collection, lambda col: col.count())
+
+    def delete_collection(self, collection):
+        with self._lock:
+            self._handles.pop(collection, None)
+        self.client.delete_collection(name=collection)
+
+    def list_collections(self):
+        return [i.name for i in self.client.list_collections()]
+
+    def warmup(self, collection):
+        """
+        用collection中已有的1个向量查询1次，使HNSW索引加载到内存中
+        """
+        data = self.peek(collection, 1)
+        embeddings = data.get("embeddings")
+        if embeddings is not None and len(embeddings) > 0:
+            self.query(collection, query_embeddings=[list(embeddings[0])], n_results=1)
+
+
+def match_where(metadata, where):
+    """
+    判断metadata是否满足过滤条件，支持chromadb的常用写法:
+    {"name": "高血压"}, {"name": {"$eq": ..}}, {"$ne": ..}, {"$in": [..]}, {"$nin": [..]}, {"$and": [..]}, {"$or": [..]}
+    """
+    metadata = metadata or {}
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, one) for one in cond):
+                return False
+        elif key == "$or":
+            if not any(match_where(metadata, one) for one in cond):
+                return False
+        elif isinstance(cond, dict):
+            value = metadata.get(key)
+            for op, target in cond.items():
+                if op == "$eq" and value != target:
+                    return False
+                if op == "$ne" and value == target:
+                    return False
+                if op == "$in" and value not in target:
+                    return False
+                if op == "$nin" and value in target:
+                    return False
+        elif metadata.get(key) != cond:
+            return False
+    return True
+
+
+def match_document(document, where_document):
+    """
+    判断文档是否满足过滤条件，支持{"$contains": ..}和{"$not_contains": ..}
+    """
+    document = document or ""
+    if "$contains" in where_document and where_document["$contains"] not in document:
+        return False
+    if "$not_contains" in where_document and where_document["$not_contains"] in document:
+        return False
+    return True
+
+
+class NumpyCollection(object):
+    def __init__(self, dimensions=None):
+        """
+        一个集合的所有向量归一化后保存在1个连续的float32矩阵中
+        """
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.matrix = np.zeros((0, dimensions or 0), dtype=np.float32)
+        self.id2row = {}
+
+    @staticmethod
+    def normalize(embeddings):
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if matrix.ndim == 1:
+            matrix = matrix.reshape(1, -1)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def upsert(self, ids, embeddings, documents, metadatas=None):
+        vectors = self.normalize(embeddings)
+        metadatas = metadatas or [None] * len(ids)
+        new_rows = []
+        for i, one_id in enumerate(ids):
+            row = self.id2row.get(one_id)
+            if row is None:
+                new_rows.append(i)
+                continue
+            self.matrix[row] = vectors[i]
+            self.documents[row] = documents[i]
+            self.metadatas[row] = metadatas[i]
+        if new_rows:
+            if self.matrix.shape[0] == 0:
+                self.matrix = np.ascontiguousarray(vectors[new_rows])
+            else:
+                self.matrix = np.ascontiguousarray(np.vstack([self.matrix, vectors[new_rows]]))
+            for i in new_rows:
+                self.id2row[ids[i]] = len(self.ids)
+                self.ids.append(ids[i])
+                self.documents.append(documents[i])
+                self.metadatas.append(metadatas[i])
+
+    def delete(self, ids):
+        remove = {self.id2row[one_id] for one_id in ids if one_id in self.id2row}
+        if not remove:
+            return
+        keep = [row for row in range(len(self.ids)) if row not in remove]
+        self.matrix = np.ascontiguousarray(self.matrix[keep])
+        self.ids = [self.ids[row] for row in keep]
+        self.documents = [self.documents[row] for row in keep]
+        self.metadatas = [self.metadatas[row] for row in keep]
+        self.id2row = {one_id: row for row, one_id in enumerate(self.ids)}
+
+    def rows(self, ids=None):
+        if ids is None:
+            return list(range(len(self.ids)))
+        return [self.id2row[one_id] for one_id in ids if one_id in self.id2row]
+
+    def query(self, query_embeddings, n_results=3, where=None, where_document=None):
+        queries = self.normalize(query_embeddings)
+        result = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        candidates = None
+        if where or where_document:
+            candidates = np.array([
+                row for row in range(len(self.ids))
+                if (not where or match_where(self.metadatas[row], where))
+                and (not where_document or match_document(self.documents[row], where_document))
+            ], dtype=np.int64)
+            matrix = self.matrix[candidates]
+        else:
+            matrix = self.matrix
+        total = matrix.shape[0]
+        k = min(n_results, total)
+        if k == 0:
+            for _ in range(queries.shape[0]):
+                for key in result:
+                    result[key].append([])
+            return result
+        # 1次矩阵乘法得到所有查询向量和所有向量的余弦相似度
+        sims = queries @ matrix.T
+        if k < total:
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(total), (queries.shape[0], 1))
+        for qi in range(queries.shape[0]):
+            order = top[qi][np.argsort(-sims[qi, top[qi]])]
+            rows = candidates[order] if candidates is not None else order
+            result["ids"].append([self.ids[row] for row in rows])
+            result["documents"].append([self.documents[row] for row in rows])
+            result["metadatas"].append([self.metadatas[row] for row in rows])
+            # 和chromadb的cosine空间保持一致，距离为1-余弦相似度
+            result["distances"].append([float(1.0 - sims[qi, i]) for i in order])
+        return result
+
+
+class NumpyBackend(VectorBackend):
+    def __init__(self, db_dir="cache/numpy_index"):
+        """
+        纯numpy的内存向量索引，适合几十到几千条的数据集
+        每个集合保存为1个 名称.npz 文件，包含向量矩阵和ids, documents, metadatas，整个文件原子地替换，
+        读取方不会读到新旧版本混合的矩阵和元数据，文件被其它进程(例如main_data_prepare.py)更新后，下次访问时会重新加载
+        """
+        self.db_dir = db_dir
+        if not os.path.exists(db_dir):
+            os.makedirs(db_dir)
+        self._collections = {}
+        self._mtimes = {}
+        self._lock = threading.RLock()
+
+    def _path(self, collection):
+        return os.path.join(self.db_dir, f"{collection}.npz")
+
+    def _collection(self, collection):
+        with self._lock:
+            index_file = self._path(collection)
+            mtime = os.stat(index_file).st_mtime_ns if os.path.exists(index_file) else None
+            if collection in self._collections and self._mtimes.get(collection) == mtime:
+                return self._collections[collection]
+            col = NumpyCollection()
+            if mtime is not None:
+                with np.load(index_file, allow_pickle=False) as data:
+                    col.matrix = data["matrix"]
+                    meta = json.loads(str(data["meta"]))
+                col.ids = meta["ids"]
+                col.documents = meta["documents"]
+                col.metadatas = meta["metadatas"]
+                col.id2row = {one_id: row for row, one_id in enumerate(col.ids)}
+            self._collections[collection] = col
+            self._mtimes[collection] = mtime
+            return col
+
+    def _save(self, collection):
+        # 矩阵和元数据写入同1个临时文件，再1次替换，临时文件名包含进程号，多个进程同时写入时不会互相覆盖临时文件
+        col = self._collections[collection]
+        index_file = self._path(collection)
+        tmp_file = f"{index_file}.{os.getpid()}.tmp"
+        meta = json.dumps({"ids": col.ids, "documents": col.documents, "metadatas": col.metadatas}, ensure_ascii=False)
+        with open(tmp_file, "wb") as f:
+            np.savez(f, matrix=col.matrix, meta=np.array(meta))
+        os.replace(tmp_file, index_file)
+        self._mtimes[collection] = os.stat(index_file).st_mtime_ns
+
+    def upsert(self, collection, ids, embeddings, documents, metadatas=None):
+        with self._lock:
+            self._collection(collection).upsert(ids, embeddings, documents, metadatas)
+            self._save(collection)
+
+    def delete(self, collection, ids):
+        with self._lock:
+            self._collection(collection).delete(ids)
+            self._save(collection)
+
+    def get(self, collection, ids=None):
+        col = self._collection(collection)
+        rows = col.rows(ids)
+        return {
+            "ids": [col.ids[row] for row in rows],
+            "documents": [col.documents[row] for row in rows],
+            "metadatas": [col.metadatas[row] for row in rows],
+        }
+
+    def query(self, collection, query_embeddings, n_results=3, where=None, where_document=None):
+        return self._collection(collection).query(query_embeddings, n_results=n_results, where=where, where_document=where_document)
+
+    def peek(self, collection, number=100):
+        col = self._collection(collection)
+        return {
+            "ids": col.ids[:number],
+            "embeddings": col.matrix[:number],
+            "documents": col.documents[:number],
+            "metadatas": col.metadatas[:number],
+        }
+
+    def count(self, collection):
+        return len(self._collection(collection).ids)
+
+    def delete_collection(self, collection):
+        with self._lock:
+            index_file = self._path(collection)
+            if not os.path.exists(index_file):
+                raise ValueError(f"Collection {collection} does not exist.")
+            os.remove(index_file)
+            self._collections.pop(collection, None)
+            self._mtimes.pop(collection, None)
+
+    def warmup(self, collection):
+        self._collection(collection)
+
+    def list_collections(self):
+        names = os.listdir(self.db_dir)
+        return sorted(name[:-len(".npz")] for name in names if name.endswith(".npz"))
+
+
+class CollectionAliases(object):
+    def __init__(self, alias_file):
+        """
+        集合的别名，别名指向某个版本的集合，保存在1个json文件中
+        重建数据时写入新版本的集合，写完后再切换别名，正在运行的Agent下次查询时就会使用新版本，不需要重启
+        """
+        self.alias_file = alias_file
+        self._aliases = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        mtime = os.stat(self.alias_file).st_mtime_ns if os.path.exists(self.alias_file) else None
+        if mtime != self._mtime:
+            aliases = {}
+            if mtime is not None:
+                with open(self.alias_file, "r", encoding="utf-8") as f:
+                    aliases = json.load(f)
+            self._aliases = aliases
+            self._mtime = mtime
+        return self._aliases
+
+    def resolve(self, name):
+        """
+        返回别名指向的集合名称，没有别名时返回name本身
+        """
+        with self._lock:
+            return self._load().get(name, name)
+
+    def set(self, name, target):
+        """
+        原子地切换别名，先写临时文件再替换
+        """
+        with self._lock:
+            aliases = dict(self._load())
+            aliases[name] = target
+            tmp_file = self.alias_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(aliases, f, ensure_ascii=False)
+            os.replace(tmp_file, self.alias_file)
+            self._aliases = aliases
+            self._mtime = os.stat(self.alias_file).st_mtime_ns
+
+    def remove(self, name):
+        with self._lock:
+            aliases = dict(self._load())
+            if aliases.pop(name, None) is None:
+                return
+            tmp_file = self.alias_file + ".tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(aliases, f, ensure_ascii=False)
+            os.replace(tmp_file, self.alias_file)
+            self._aliases = aliases
+            self._mtime = os.stat(self.alias_file).st_mtime_ns
+
+
+def create_backend(backend="chroma", db_dir=None):
+    """
+    根据名称创建向量后端
+    Args:
+        backend: chroma或者numpy
+        db_dir: 数据目录，默认chroma为cache/chromadb，numpy为cache/numpy_index
+    """
+    if backend == "chroma":
+        return ChromaBackend(db_dir=db_dir or "cache/chromadb")
+    elif backend == "numpy":
+        return NumpyBackend(db_dir=db_dir or "cache/numpy_index")
+    raise ValueError(f"不支持的向量后端: {backend}")
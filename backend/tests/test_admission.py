@@ -0,0 +1,69 @@
+import asyncio
+import pytest
+from DecisionAgent.admission import AdmissionController, AdmissionRejected
+
+
+def test_full_queue_rejects_immediately():
+    controller = AdmissionController(max_concurrent=1, max_queued=1, queue_timeout=5)
+
+    async def run():
+        await controller.acquire("s1")
+        queued = asyncio.ensure_future(controller.acquire("s2"))
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("s3")
+        assert controller.stats() == {"running": 1, "queued": 1, "rejected": 1}
+        # 释放后排队的请求获得位置
+        controller.release("s1")
+        await asyncio.wait_for(queued, timeout=1)
+        assert controller.stats() == {"running": 1, "queued": 0, "rejected": 1}
+
+    asyncio.run(run())
+
+
+def test_queue_timeout_rejects_and_leaves_the_queue():
+    controller = AdmissionController(max_concurrent=1, max_queued=4, queue_timeout=0.05)
+
+    async def run():
+        await controller.acquire("s1")
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire("s2")
+        assert controller.stats() == {"running": 1, "queued": 0, "rejected": 1}
+        assert not controller.waiting
+
+    asyncio.run(run())
+
+
+def test_same_session_runs_one_at_a_time():
+    controller = AdmissionController(max_concurrent=4, max_queued=4, queue_timeout=5)
+
+    async def run():
+        await controller.acquire("s1")
+        second = asyncio.ensure_future(controller.acquire("s1"))
+        await asyncio.sleep(0.01)
+        # 还有空闲的位置，但同一个会话的请求要等前1个结束
+        assert not second.done()
+        controller.release("s1")
+        await asyncio.wait_for(second, timeout=1)
+        assert controller.stats()["running"] == 1
+
+    asyncio.run(run())
+
+
+def test_cancelled_waiter_frees_its_queue_place():
+    controller = AdmissionController(max_concurrent=1, max_queued=1, queue_timeout=5)
+
+    async def run():
+        await controller.acquire("s1")
+        queued = asyncio.ensure_future(controller.acquire("s2"))
+        await asyncio.sleep(0)
+        queued.cancel()
+        await asyncio.wait([queued])
+        assert controller.stats()["queued"] == 0
+        # 排队的位置已经空出，新的请求可以排队
+        waiting = asyncio.ensure_future(controller.acquire("s3"))
+        await asyncio.sleep(0)
+        controller.release("s1")
+        await asyncio.wait_for(waiting, timeout=1)
+
+    asyncio.run(run())
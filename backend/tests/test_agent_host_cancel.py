@@ -0,0 +1,140 @@
+import asyncio
+
+from google.adk.agents import LlmAgent
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_response import LlmResponse
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from a2a.server.agent_execution import RequestContext
+from a2a.server.events import EventQueue
+from a2a.types import AgentCapabilities, AgentCard, Message, MessageSendParams, Role, TaskIdParams, TaskState, TaskStatusUpdateEvent, TextPart
+from DecisionAgent.agent_host import build_request_handler
+
+
+class ToolCallingLlm(BaseLlm):
+    """第1次调用返回工具调用，工具返回后回复文本"""
+    model: str = "fake"
+
+    async def generate_content_async(self, llm_request, stream=False):
+        answered = any(part.function_response for content in llm_request.contents for part in content.parts or [])
+        if answered:
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(text="done")]))
+        else:
+            call = types.FunctionCall(name="slow_tool", args={})
+            yield LlmResponse(content=types.Content(role="model", parts=[types.Part(function_call=call)]))
+
+
+def make_handler(slow_tool):
+    agent = LlmAgent(name="slow", model=ToolCallingLlm(), instruction="call slow_tool", tools=[slow_tool])
+    card = AgentCard(name="slow", description="slow", url="http://localhost/", version="1.0.0",
+                     defaultInputModes=["text"], defaultOutputModes=["text"],
+                     capabilities=AgentCapabilities(streaming=True), skills=[])
+    return build_request_handler(agent, card, streaming=False, session_service=InMemorySessionService())
+
+
+def make_params(context_id="c1"):
+    return MessageSendParams(message=Message(role=Role.user, parts=[TextPart(text="hi")], messageId=f"m-{context_id}", contextId=context_id))
+
+
+def test_disconnect_cancels_agent_blocked_in_tool():
+    async def main():
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+
+        async def slow_tool() -> str:
+            """一直运行的工具"""
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "finished"
+
+        handler = make_handler(slow_tool)
+        params = make_params()
+        events = []
+
+        async def consume():
+            async for event in handler.on_message_send_stream(params):
+                events.append(event)
+
+        # 模拟客户端断开: 取消正在读取事件流的请求
+        request = asyncio.create_task(consume())
+        await asyncio.wait_for(started.wait(), timeout=5)
+        for _ in range(100):
+            if events:
+                break
+            await asyncio.sleep(0.01)
+        request.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        await asyncio.gather(request, return_exceptions=True)
+        task = await handler.task_store.get(events[0].taskId)
+        assert task.status.state == TaskState.canceled
+        assert handler.agent_executor._running_tasks == {}
+
+    asyncio.run(main())
+
+
+def test_tasks_cancel_reports_canceled_after_agent_stopped():
+    async def main():
+        started = asyncio.Event()
+        stopped = []
+
+        async def slow_tool() -> str:
+            """一直运行的工具"""
+            started.set()
+            try:
+                await asyncio.sleep(30)
+            finally:
+                # 工具需要一段时间才能停止
+                await asyncio.sleep(0.2)
+                stopped.append(True)
+            return "finished"
+
+        handler = make_handler(slow_tool)
+        events = []
+
+        async def consume():
+            async for event in handler.on_message_send_stream(make_params()):
+                # canceled状态发出时Agent必须已经停止
+                if isinstance(event, TaskStatusUpdateEvent) and event.status.state == TaskState.canceled:
+                    assert stopped
+                events.append(event)
+
+        request = asyncio.create_task(consume())
+        await asyncio.wait_for(started.wait(), timeout=5)
+        while not events:
+            await asyncio.sleep(0.01)
+        task = await asyncio.wait_for(handler.on_cancel_task(TaskIdParams(id=events[0].taskId)), timeout=5)
+        assert task.status.state == TaskState.canceled
+        # 流式请求正常结束，最后1个事件是canceled
+        await asyncio.wait_for(request, timeout=5)
+        assert events[-1].status.state == TaskState.canceled
+        assert handler.agent_executor._running_tasks == {}
+
+    asyncio.run(main())
+
+
+def test_external_cancellation_is_not_swallowed():
+    async def main():
+        started = asyncio.Event()
+
+        async def slow_tool() -> str:
+            """一直运行的工具"""
+            started.set()
+            await asyncio.sleep(30)
+            return "finished"
+
+        handler = make_handler(slow_tool)
+        executor = handler.agent_executor
+        context = RequestContext(make_params("c2"), task_id="t2", context_id="c2")
+        # 例如服务关闭时取消运行execute的任务
+        execute = asyncio.create_task(executor.execute(context, EventQueue()))
+        await asyncio.wait_for(started.wait(), timeout=5)
+        execute.cancel()
+        done, _ = await asyncio.wait([execute], timeout=5)
+        assert done and execute.cancelled()
+        assert executor._running_tasks == {}
+
+    asyncio.run(main())
@@ -0,0 +1,32 @@
+import os
+from DecisionAgent.agent_host import load_domain
+
+MAIN_API = '''import os
+from dotenv import load_dotenv
+load_dotenv()
+COLLECTION_NAME = os.environ.get("COLLECTION_NAME")
+ACCEPT_DISTANCE = os.environ.get("DECISION_ACCEPT_DISTANCE")
+VECTOR_DB_DIR = os.environ.get("VECTOR_DB_DIR")
+'''
+
+
+def make_domain(base, name, env):
+    domain_dir = base / name
+    domain_dir.mkdir()
+    (domain_dir / "main_api.py").write_text(MAIN_API, encoding="utf-8")
+    (domain_dir / ".env").write_text("".join(f"{k}={v}\n" for k, v in env.items()), encoding="utf-8")
+    return str(domain_dir)
+
+
+def test_each_domain_sees_only_its_own_env(tmp_path, monkeypatch):
+    monkeypatch.delenv("DECISION_ACCEPT_DISTANCE", raising=False)
+    monkeypatch.setenv("VECTOR_DB_DIR", "shared_db")
+    doctor = make_domain(tmp_path, "doctor_test", {"COLLECTION_NAME": "disease_data", "DECISION_ACCEPT_DISTANCE": "0.2"})
+    law = make_domain(tmp_path, "law_test", {"COLLECTION_NAME": "law_data", "VECTOR_DB_DIR": "law_db"})
+    doctor_module = load_domain(doctor)
+    law_module = load_domain(law)
+    assert (doctor_module.COLLECTION_NAME, doctor_module.ACCEPT_DISTANCE, doctor_module.VECTOR_DB_DIR) == ("disease_data", "0.2", "shared_db")
+    # doctor的.env不会影响之后加载的领域，进程的环境变量优先于领域的.env
+    assert (law_module.COLLECTION_NAME, law_module.ACCEPT_DISTANCE, law_module.VECTOR_DB_DIR) == ("law_data", None, "shared_db")
+    assert "DECISION_ACCEPT_DISTANCE" not in os.environ
+    assert os.environ["VECTOR_DB_DIR"] == "shared_db"
@@ -0,0 +1,18 @@
+from DecisionAgent.catalog import Catalog, make_record_id
+
+
+def test_from_query_finds_records_by_synced_id():
+    records = [
+        {"solution_name": "品牌定位", "problem_description": ["竞争激烈", "定位不清"]},
+        {"solution_name": "成本控制", "problem_description": ["利润低"]},
+    ]
+    catalog = Catalog(records, name_field="solution_name", document_field="problem_description")
+    # main_data_prepare写入向量库的document是连接后的文本，id和Catalog中的一致
+    synced_id = make_record_id("竞争激烈，定位不清", {"name": "品牌定位"})
+    query_results = {
+        "ids": [[synced_id, "unknown-id"]],
+        "metadatas": [[None, {"name": "成本控制"}]],
+        "distances": [[0.1, 0.3]],
+    }
+    matched = catalog.from_query(query_results)
+    assert [(record["solution_name"], distance) for record, _, distance in matched] == [("品牌定位", 0.1), ("成本控制", 0.3)]
@@ -0,0 +1,32 @@
+import json
+from DecisionAgent.decision_gate import ScoreGapGate
+
+
+def results(distances, names=None):
+    names = names or [f"候选{i}" for i in range(len(distances))]
+    return {"metadatas": [[{"name": name} for name in names]], "distances": [distances]}
+
+
+def test_accept_needs_both_distance_and_gap():
+    gate = ScoreGapGate(accept_distance=0.2, min_gap=0.1, reject_distance=0.6)
+    verdict = gate.decide(results([0.2, 0.35], ["高血压", "低血压"]))
+    assert json.loads(verdict)["name"] == "高血压"
+    assert gate.is_confident(verdict)
+    # 距离刚超过阈值，或者和第2名的差距不够，都交给大模型
+    assert gate.decide(results([0.21, 0.5])) is None
+    assert gate.decide(results([0.15, 0.24])) is None
+    assert gate.stats() == {"accepted": 1, "rejected": 0, "passed": 2}
+
+
+def test_reject_only_beyond_reject_distance():
+    gate = ScoreGapGate(accept_distance=0.2, min_gap=0.1, reject_distance=0.6)
+    assert gate.decide(results([0.6, 0.7])) is None
+    verdict = gate.decide(results([0.61, 0.7]))
+    assert json.loads(verdict)["verdict"] == "no_match"
+    assert not gate.is_confident(verdict)
+
+
+def test_disabled_by_default():
+    gate = ScoreGapGate()
+    assert gate.decide(results([0.0, 0.9])) is None
+    assert gate.decide(results([0.99])) is None
@@ -0,0 +1,73 @@
+import asyncio
+import json
+from types import SimpleNamespace
+import pytest
+from DecisionAgent import shared_resources
+from DecisionAgent.decision_tools import DecisionToolEngine
+
+RECORDS = [
+    {"name": "感冒", "matches": "头痛、发热、咳嗽", "advice": "多喝水"},
+    {"name": "偏头痛", "matches": "头痛、恶心、呕吐", "advice": "避光休息"},
+]
+
+
+@pytest.fixture
+def make_engine(tmp_path, monkeypatch):
+    # 每个测试使用独立的缓存目录和共享资源
+    monkeypatch.chdir(tmp_path)
+    for name in ("_embedders", "_chromadbs", "_tool_models"):
+        monkeypatch.setattr(shared_resources, name, {})
+    for key, value in {"EMBEDDING_PROVIDER": "local", "VECTOR_BACKEND": "numpy", "VECTOR_DB_DIR": str(tmp_path / "db"),
+                       "TOOL_MODEL_PROVIDER": "openai", "TOOL_MODEL_NAME": "openai/x",
+                       "TOOL_MODEL_API_BASE": "http://127.0.0.1:1/v1", "TOOL_MODEL_API_KEY": "x"}.items():
+        monkeypatch.setenv(key, value)
+
+    def make(**env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        engine = DecisionToolEngine(
+            RECORDS, name_field="name", document_field="matches", advice_field="advice",
+            collection_name="test_data", state_key="symptoms",
+            match_tool_name="matchDisease", match_param="symptoms", match_description="匹配疾病", match_prompt="{candidates}{evidence}",
+            advice_tool_name="getAdvice", advice_param="disease_name", advice_description="治疗建议", advice_prompt="建议",
+        )
+        engine.chromadb_instance.sync2collection("test_data", [r["matches"] for r in RECORDS], [{"name": r["name"]} for r in RECORDS])
+        return engine
+    return make
+
+
+def test_no_match_verdict_carries_follow_up_question(make_engine):
+    engine = make_engine(DECISION_REJECT_DISTANCE="-1")
+    context = SimpleNamespace(state={}, agent_name="doctor")
+    result = asyncio.run(engine.match(["头痛"], context, "matchDisease"))
+    verdict, follow_up = result.split("\n\n", 1)
+    assert json.loads(verdict)["verdict"] == "no_match"
+    assert follow_up.startswith("建议追问：")
+    assert "头痛" not in follow_up.split("】")[0]
+
+
+def test_match_cache_ttl_from_env(make_engine):
+    engine = make_engine(MATCH_CACHE_TTL="30")
+    assert engine.match_cache.ttl == 30
+
+
+def test_rebuild_invalidates_cached_matches(make_engine):
+    engine = make_engine()
+    calls = []
+
+    async def fake_query(prompt):
+        calls.append(prompt)
+        return f"第{len(calls)}次的结果"
+
+    engine.query_deepseek = fake_query
+
+    def match():
+        return asyncio.run(engine.match(["头痛"], SimpleNamespace(state={}, agent_name="doctor"), "matchDisease"))
+
+    first = match()
+    assert match() == first
+    assert len(calls) == 1
+    # 重建数据后别名指向新版本的collection，之前的结果不再使用
+    engine.chromadb_instance.rebuild_collection("test_data", [r["matches"] for r in RECORDS], [{"name": r["name"]} for r in RECORDS])
+    assert match() != first
+    assert len(calls) == 2
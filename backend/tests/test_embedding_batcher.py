@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from DecisionAgent.embedding_utils import EmbeddingBatcher
+
+
+def test_concurrent_texts_are_merged_into_batches():
+    batches = []
+
+    async def request(texts):
+        batches.append(list(texts))
+        return [f"v:{text}" for text in texts]
+
+    async def run():
+        batcher = EmbeddingBatcher(request, batch_window=0.01, max_batch_size=3)
+        results = await asyncio.gather(batcher.embed(["a", "b"]), batcher.embed(["b", "c", "d"]))
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert results == [["v:a", "v:b"], ["v:b", "v:c", "v:d"]]
+    # 5条提交最多3条1批，同一批中重复的文本只请求1次
+    assert batcher.submitted == 5
+    assert batcher.requests == len(batches) == 2
+    assert all(len(batch) == len(set(batch)) for batch in batches)
+    assert not batcher._tasks
+
+
+def test_request_error_is_raised_to_every_waiter():
+    async def request(texts):
+        raise RuntimeError("模型服务不可用")
+
+    async def run():
+        batcher = EmbeddingBatcher(request, batch_window=0.01, max_batch_size=10)
+        results = await asyncio.gather(batcher.submit("a"), batcher.submit("b"), return_exceptions=True)
+        return batcher, results
+
+    batcher, results = asyncio.run(run())
+    assert [type(result) for result in results] == [RuntimeError, RuntimeError]
+    assert not batcher._tasks
+
+
+def test_bad_response_fails_waiters_instead_of_hanging():
+    async def request(texts):
+        # 返回的向量比文本少，_run在设置结果时出错
+        return []
+
+    async def run():
+        batcher = EmbeddingBatcher(request, batch_window=0.01, max_batch_size=10)
+        return await asyncio.wait_for(batcher.submit("a"), timeout=1)
+
+    with pytest.raises(KeyError):
+        asyncio.run(run())
@@ -0,0 +1,35 @@
+from multiprocessing import Process
+
+import numpy as np
+from DecisionAgent.embedding_store import EmbeddingStore
+
+DIMENSIONS = 8
+
+
+def vector(i):
+    return np.full(DIMENSIONS, float(i), dtype=np.float32)
+
+
+def write(store_dir, start, count):
+    store = EmbeddingStore("m", DIMENSIONS, store_dir=store_dir)
+    for i in range(start, start + count):
+        store.put_many([f"t{i}"], [vector(i)])
+
+
+def test_concurrent_writers_keep_rows_consistent(tmp_path):
+    store_dir = str(tmp_path)
+    # 在其它进程写入之前打开，之后本进程的写入不能覆盖其它进程的行号
+    store = EmbeddingStore("m", DIMENSIONS, store_dir=store_dir)
+    processes = [Process(target=write, args=(store_dir, start, 200)) for start in (0, 100)]
+    for process in processes:
+        process.start()
+    for i in range(1000, 1200):
+        store.put_many([f"t{i}"], [vector(i)])
+    for process in processes:
+        process.join()
+    texts = [f"t{i}" for i in range(300)] + [f"t{i}" for i in range(1000, 1200)]
+    # 本进程只能漏掉其它进程后来写入的向量，不能返回错误的向量
+    for text, vec in zip(texts, store.get_many(texts)):
+        assert vec is None or vec[0] == float(text[1:]), text
+    for text, vec in zip(texts, EmbeddingStore("m", DIMENSIONS, store_dir=store_dir).get_many(texts)):
+        assert vec is not None and vec[0] == float(text[1:]), text
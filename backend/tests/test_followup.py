@@ -0,0 +1,45 @@
+from DecisionAgent.catalog import Catalog
+from DecisionAgent.followup import FollowUpEngine, extract_features
+
+RECORDS = [
+    {"name": "感冒", "matches": "常见症状有头痛、发热、咳嗽"},
+    {"name": "偏头痛", "matches": "头痛、恶心、畏光"},
+    {"name": "胃炎", "matches": "恶心、腹痛、反酸"},
+]
+
+
+def make_engine():
+    return FollowUpEngine(Catalog(RECORDS, name_field="name", document_field="matches"))
+
+
+def test_extract_features_strips_lead_words():
+    assert extract_features("常见症状有头晕、心悸等") == ["头晕", "心悸"]
+
+
+def test_picks_the_feature_that_splits_the_candidates():
+    engine = make_engine()
+    # 两个候选都有头痛，只有发热、咳嗽、恶心、畏光能区分，概率相同时按1/2分开，信息增益为1比特
+    question = engine.best_question([("感冒", 0.3), ("偏头痛", 0.3)])
+    assert question["feature"] in {"发热", "咳嗽", "恶心", "畏光"}
+    assert question["information_gain"] == 1.0
+    assert sorted(question["present"] + question["absent"]) == ["偏头痛", "感冒"]
+    assert len(question["present"]) == 1
+
+
+def test_prefers_the_split_with_more_information():
+    engine = make_engine()
+    # 胃炎的距离远，先验概率很小，头痛(只有胃炎没有)和反酸、腹痛(只有胃炎有)几乎不能减少不确定性，
+    # 应该追问区分感冒和偏头痛的特征
+    question = engine.best_question([("感冒", 0.1), ("偏头痛", 0.1), ("胃炎", 0.5)])
+    assert question["feature"] not in {"头痛", "反酸", "腹痛"}
+    assert question["information_gain"] > 0.9
+    # 信息增益相同时，优先选择出现的条目少的特征
+    question = engine.best_question([("感冒", 0.3), ("偏头痛", 0.3), ("胃炎", 0.3)])
+    assert question["feature"] not in {"头痛", "恶心"}
+
+
+def test_known_evidence_and_single_candidate():
+    engine = make_engine()
+    question = engine.best_question([("感冒", 0.3), ("偏头痛", 0.3)], evidence=["发热", "咳嗽", "恶心"])
+    assert question["feature"] == "畏光"
+    assert engine.best_question([("感冒", 0.3)]) is None
@@ -0,0 +1,41 @@
+import time
+import numpy as np
+from DecisionAgent.match_cache import MatchResultCache
+
+
+def test_similar_lookup_disabled_by_default():
+    cache = MatchResultCache("ns")
+    cache.set(["头痛"], "结果", vector=np.ones(4))
+    assert cache.get_similar(np.ones(4), ["头晕"]) is None
+
+
+def test_similar_lookup_ignores_subsets_and_supersets():
+    cache = MatchResultCache("ns", similarity_threshold=0.9)
+    items = ["头痛", "头晕", "恶心", "乏力", "失眠"]
+    cache.set(items, "上一轮的结果", vector=np.ones(4))
+    # 新增了1条证据，查询向量几乎不变，也不能复用上一轮的结果
+    assert cache.get_similar(np.ones(4), items + ["视物模糊"]) is None
+    assert cache.get_similar(np.ones(4), items[:-1]) is None
+    assert cache.get_similar(np.ones(4), ["头疼", "头晕", "恶心", "乏力", "失眠"]) == "上一轮的结果"
+
+
+def test_new_version_clears_entries():
+    cache = MatchResultCache("ns", similarity_threshold=0.9)
+    cache.use_version("data_v1")
+    cache.set(["头痛"], "旧数据的结果", vector=np.ones(4), version="data_v1")
+    cache.use_version("data_v1")
+    assert cache.get(["头痛"]) == "旧数据的结果"
+    cache.use_version("data_v2")
+    assert cache.get(["头痛"]) is None
+    assert cache.get_similar(np.ones(4), ["头痛"]) is None
+    # 版本切换之前开始计算的结果不缓存
+    cache.set(["头痛"], "旧数据的结果", version="data_v1")
+    assert cache.get(["头痛"]) is None
+
+
+def test_ttl_expires_entries(monkeypatch):
+    cache = MatchResultCache("ns", ttl=10)
+    cache.set(["头痛"], "结果")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get(["头痛"]) is None
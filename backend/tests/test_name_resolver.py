@@ -0,0 +1,35 @@
+from DecisionAgent.name_resolver import NameResolver
+
+DISEASES = ["高血压", "糖尿病", "高脂血症", "冠心病", "慢性胃炎"]
+LAWS = ["中华人民共和国劳动法", "中华人民共和国合同法", "中华人民共和国婚姻法"]
+LAW_AFFIXES = {"generic_prefixes": ("中华人民共和国", "中国"), "generic_suffixes": ("法",)}
+
+
+def test_distinct_conditions_do_not_resolve():
+    resolver = NameResolver(DISEASES)
+    for name in ["妊娠高血压", "糖尿病肾病", "妊娠期糖尿病", "继发性高血压", "1型糖尿病", "高血"]:
+        assert resolver.resolve(name) is None, name
+
+
+def test_near_miss_names_resolve():
+    resolver = NameResolver(DISEASES)
+    assert resolver.resolve("高血压") == "高血压"
+    assert resolver.resolve("高血压。") == "高血压"
+    assert resolver.resolve("慢性胃炎症") == "慢性胃炎"
+
+
+def test_generic_prefix_and_suffix_resolve():
+    resolver = NameResolver(LAWS, **LAW_AFFIXES)
+    assert resolver.resolve("劳动法") == "中华人民共和国劳动法"
+    assert resolver.resolve("《劳动法》") == "中华人民共和国劳动法"
+    assert resolver.resolve("中国婚姻法") == "中华人民共和国婚姻法"
+    assert resolver.resolve("合同") == "中华人民共和国合同法"
+
+
+def test_generic_affixes_are_per_domain():
+    # 只有法律领域配置了"中国"和"法"，其它领域的名称不会因为只差这些字被认为是同一个
+    resolver = NameResolver(["中国象棋", "疗法"])
+    assert resolver.resolve("象棋") is None
+    assert resolver.resolve("疗") is None
+    resolver = NameResolver(["中国象棋", "疗法"], generic_prefixes=("中国",), generic_suffixes=("法",))
+    assert resolver.resolve("象棋") == "中国象棋"
@@ -0,0 +1,74 @@
+import asyncio
+import sqlite3
+from google.adk.events import Event, EventActions
+from google.genai import types
+from DecisionAgent.session_store import SqliteSessionService, read_session_state
+
+
+def make_event(text, state_delta=None):
+    return Event(author="user", invocation_id="i1", content=types.UserContent(parts=[types.Part(text=text)]),
+                 actions=EventActions(state_delta=state_delta or {}))
+
+
+def count_rows(db_path, table):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_sessions_survive_a_restart(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+
+    async def first_run():
+        service = SqliteSessionService(db_path=db_path, flush_interval=60)
+        session = await service.create_session(app_name="doctor", user_id="self", session_id="s1", state={"metadata": {}})
+        await service.append_event(session, make_event("头痛", {"symptoms": ["头痛"], "user:name": "张三"}))
+        await service.append_event(session, make_event("发热", {"symptoms": ["头痛", "发热"]}))
+        # 进程退出时写入所有修改
+        service.close()
+
+    async def second_run():
+        service = SqliteSessionService(db_path=db_path, flush_interval=60)
+        session = await service.get_session(app_name="doctor", user_id="self", session_id="s1")
+        state = await read_session_state(service, "doctor", "self", "s1")
+        return session, state
+
+    asyncio.run(first_run())
+    session, state = asyncio.run(second_run())
+    assert [event.content.parts[0].text for event in session.events] == ["头痛", "发热"]
+    assert state["symptoms"] == ["头痛", "发热"]
+    assert state["user:name"] == "张三"
+
+
+def test_changes_are_written_behind(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+
+    async def run():
+        service = SqliteSessionService(db_path=db_path, flush_interval=0.05)
+        session = await service.create_session(app_name="doctor", user_id="self", session_id="s1")
+        await service.append_event(session, make_event("头痛", {"symptoms": ["头痛"]}))
+        # 修改先保存在内存中，不在请求的路径上写数据库
+        before = count_rows(db_path, "events")
+        await asyncio.sleep(0.3)
+        return before, count_rows(db_path, "events")
+
+    before, after = asyncio.run(run())
+    assert before == 0
+    assert after == 1
+
+
+def test_evicted_sessions_load_from_the_database(tmp_path):
+    db_path = str(tmp_path / "sessions.db")
+
+    async def run():
+        service = SqliteSessionService(db_path=db_path, max_sessions=1, flush_interval=60)
+        first = await service.create_session(app_name="doctor", user_id="self", session_id="s1")
+        await service.append_event(first, make_event("头痛", {"symptoms": ["头痛"]}))
+        await service.create_session(app_name="doctor", user_id="self", session_id="s2")
+        in_memory = [key[2] for key in service._sessions]
+        state = await read_session_state(service, "doctor", "self", "s1")
+        return in_memory, state
+
+    in_memory, state = asyncio.run(run())
+    # 超出max_sessions时最久未访问的会话写入数据库后移出内存
+    assert in_memory == ["s2"]
+    assert state["symptoms"] == ["头痛"]
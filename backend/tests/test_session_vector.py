@@ -0,0 +1,44 @@
+import asyncio
+import numpy as np
+from DecisionAgent.session_vector import decode_vector, update_session_vector
+
+
+class CountingEmbedder(object):
+    # 每条文本的向量固定，记录请求过的文本
+    def __init__(self):
+        self.requested = []
+        self.cache = {}
+
+    async def ado_embedding(self, texts):
+        data = []
+        for text in texts:
+            if text not in self.cache:
+                self.requested.append(text)
+                self.cache[text] = np.random.default_rng(abs(hash(text)) % 2 ** 32).normal(size=8).tolist()
+            data.append({"embedding": self.cache[text]})
+        return {"data": data}
+
+
+def test_each_turn_embeds_only_new_items_and_matches_weighted_mean():
+    embedder = CountingEmbedder()
+    state = {}
+    asyncio.run(update_session_vector(embedder, state, "symptoms", ["头痛", "头晕"], decay=0.5))
+    embedder.requested.clear()
+    vector = asyncio.run(update_session_vector(embedder, state, "symptoms", ["头痛", "头晕", "恶心"], decay=0.5))
+    # 第2轮只请求新增的证据
+    assert embedder.requested == ["恶心"]
+    session_vector = state["symptoms_query_vector"]
+    assert session_vector["items"] == ["头痛", "头晕", "恶心"]
+    assert session_vector["weight"] == 2 * 0.5 + 1
+    unit = {text: np.asarray(v) / np.linalg.norm(v) for text, v in embedder.cache.items()}
+    expected = (unit["头痛"] + unit["头晕"]) * 0.5 + unit["恶心"]
+    assert np.allclose(decode_vector(session_vector["sum"]), expected, atol=1e-5)
+    assert np.allclose(vector, expected / np.linalg.norm(expected), atol=1e-5)
+    # 没有新证据时不请求模型
+    embedder.requested.clear()
+    assert np.allclose(asyncio.run(update_session_vector(embedder, state, "symptoms", ["恶心"], decay=0.5)), vector)
+    assert embedder.requested == []
+
+
+def test_no_items_returns_none():
+    assert asyncio.run(update_session_vector(CountingEmbedder(), {}, "symptoms", [])) is None
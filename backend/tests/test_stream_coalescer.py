@@ -0,0 +1,61 @@
+import asyncio
+from DecisionAgent.stream_coalescer import StreamCoalescer, coalesced_events
+
+
+def test_sentence_boundary_flushes():
+    coalescer = StreamCoalescer(max_delay=60, max_bytes=1024)
+    assert coalescer.add("你好") is None
+    assert coalescer.add("，我是") is None
+    assert coalescer.add("医生。") == "你好，我是医生。"
+    assert coalescer.flush() is None
+
+
+def test_byte_threshold_flushes():
+    coalescer = StreamCoalescer(max_delay=60, max_bytes=6)
+    # 1个汉字是3个字节
+    assert coalescer.add("你") is None
+    assert coalescer.add("好") == "你好"
+    assert coalescer.add("abc") is None
+    assert coalescer.flush() == "abc"
+
+
+def test_pending_text_is_released_when_the_stream_stalls():
+    coalescer = StreamCoalescer(max_delay=0.02, max_bytes=1024)
+
+    async def events():
+        yield "你好"
+        # 模型停顿，时间阈值到了也没有新的文本
+        await asyncio.sleep(0.3)
+        yield "再见"
+
+    async def run():
+        sent = []
+        start = asyncio.get_running_loop().time()
+        async for event in coalesced_events(events(), coalescer):
+            if event is None:
+                sent.append((coalescer.flush(), asyncio.get_running_loop().time() - start))
+            else:
+                coalescer.add(event)
+        return sent, coalescer.flush()
+
+    sent, rest = asyncio.run(run())
+    assert [text for text, _ in sent] == ["你好"]
+    assert sent[0][1] < 0.2
+    assert rest == "再见"
+
+
+def test_stream_errors_reach_the_caller():
+    async def events():
+        yield "你好"
+        raise RuntimeError("模型出错")
+
+    async def run():
+        async for _ in coalesced_events(events(), StreamCoalescer()):
+            pass
+
+    try:
+        asyncio.run(run())
+    except RuntimeError as e:
+        assert str(e) == "模型出错"
+    else:
+        raise AssertionError("没有抛出异常")
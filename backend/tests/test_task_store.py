@@ -0,0 +1,63 @@
+import asyncio
+from a2a.types import Message, Part, Role, Task, TaskState, TaskStatus, TextPart
+from DecisionAgent.task_store import BoundedTaskStore
+
+
+def make_task(task_id, state, messages=0):
+    history = [Message(messageId=f"{task_id}-{i}", role=Role.user, parts=[Part(root=TextPart(text=str(i)))]) for i in range(messages)]
+    return Task(id=task_id, contextId="ctx", status=TaskStatus(state=state), history=history)
+
+
+def test_save_truncates_a_copy():
+    store = BoundedTaskStore(history_length=2)
+    task = make_task("t1", TaskState.working, messages=5)
+    asyncio.run(store.save(task))
+    assert len(task.history) == 5
+    assert len(asyncio.run(store.get("t1")).history) == 2
+
+
+def test_age_eviction_keeps_unfinished_tasks():
+    store = BoundedTaskStore(max_age=0)
+
+    async def run():
+        await store.save(make_task("waiting", TaskState.input_required))
+        await store.save(make_task("done", TaskState.completed))
+        await asyncio.sleep(0.01)
+        await store.save(make_task("new", TaskState.working))
+        return await store.get("waiting"), await store.get("done")
+
+    waiting, done = asyncio.run(run())
+    assert waiting is not None
+    assert done is None
+
+
+def test_save_stores_a_copy_so_size_stays_right():
+    store = BoundedTaskStore()
+    task = make_task("t1", TaskState.working, messages=1)
+    asyncio.run(store.save(task))
+    size = store.total_bytes
+    # 调用方之后修改自己的任务，不影响已经保存的任务和统计的大小
+    task.history.append(make_task("t1", TaskState.working, messages=2).history[1])
+    task.status.state = TaskState.completed
+    saved = asyncio.run(store.get("t1"))
+    assert len(saved.history) == 1
+    assert saved.status.state == TaskState.working
+    assert store.total_bytes == size == len(saved.model_dump_json())
+    saved.history.clear()
+    assert len(asyncio.run(store.get("t1")).history) == 1
+
+
+def test_spilled_task_ids_do_not_collide(tmp_path):
+    store = BoundedTaskStore(max_tasks=1, spill_dir=str(tmp_path))
+
+    async def run():
+        # 去掉特殊字符后是同一个文件名的两个task_id
+        await store.save(make_task("a/b", TaskState.completed))
+        await store.save(make_task("ab", TaskState.completed))
+        await store.save(make_task("other", TaskState.working))
+        return await store.get("a/b"), await store.get("ab")
+
+    first, second = asyncio.run(run())
+    assert first is not None and first.id == "a/b"
+    assert second is not None and second.id == "ab"
+    assert all(path.parent == tmp_path for path in tmp_path.iterdir())
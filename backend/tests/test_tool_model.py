@@ -0,0 +1,50 @@
+import asyncio
+from DecisionAgent.tool_model import ToolModel
+
+
+def make_model(tmp_path, monkeypatch):
+    monkeypatch.setenv("TOOL_MODEL_CACHE_TTL", "60")
+    model = ToolModel(provider="openai", model="openai/x", api_base="http://127.0.0.1:1/v1", api_key="x",
+                      cache_dir=str(tmp_path))
+    calls = []
+
+    async def fake_query(prompt):
+        calls.append(prompt)
+        await asyncio.sleep(0.05)
+        return f"关于{prompt}的建议"
+
+    model._query = fake_query
+    return model, calls
+
+
+def test_cache_ttl_from_env(tmp_path, monkeypatch):
+    model, _ = make_model(tmp_path, monkeypatch)
+    assert model.cache.ttl == 60
+
+
+def test_request_after_cancelled_flight_starts_again(tmp_path, monkeypatch):
+    model, calls = make_model(tmp_path, monkeypatch)
+
+    async def run():
+        first = asyncio.ensure_future(model.aquery("高血压", cache_key="高血压"))
+        await asyncio.sleep(0)
+        first.cancel()
+        # 取消后立即到达的相同请求不会等待已经取消的请求
+        result = await asyncio.wait_for(model.aquery("高血压", cache_key="高血压"), timeout=1)
+        return first, result
+
+    first, result = asyncio.run(run())
+    assert first.cancelled()
+    assert result == "关于高血压的建议"
+    assert len(calls) == 2
+    assert model._inflight == {}
+
+
+def test_concurrent_requests_share_one_call(tmp_path, monkeypatch):
+    model, calls = make_model(tmp_path, monkeypatch)
+
+    async def run():
+        return await asyncio.gather(*[model.aquery("糖尿病", cache_key="糖尿病") for _ in range(5)])
+
+    assert set(asyncio.run(run())) == {"关于糖尿病的建议"}
+    assert len(calls) == 1
@@ -0,0 +1,19 @@
+import os
+import numpy as np
+from DecisionAgent.vector_backend import NumpyBackend
+
+
+def test_numpy_backend_saves_matrix_and_metadata_in_one_file(tmp_path):
+    backend = NumpyBackend(db_dir=str(tmp_path))
+    backend.upsert("drugs", ["a", "b"], [[1, 0, 0], [0, 1, 0]], ["阿司匹林", "布洛芬"], [{"name": "阿司匹林"}, {"name": "布洛芬"}])
+    backend.delete("drugs", ["a"])
+    assert os.listdir(tmp_path) == ["drugs.npz"]
+    assert backend.list_collections() == ["drugs"]
+    # 其它进程打开同一个目录，读到的矩阵和元数据是同一个版本
+    reader = NumpyBackend(db_dir=str(tmp_path))
+    assert reader.get("drugs") == {"ids": ["b"], "documents": ["布洛芬"], "metadatas": [{"name": "布洛芬"}]}
+    result = reader.query("drugs", [[0, 2, 0]], n_results=1)
+    assert result["ids"] == [["b"]]
+    assert np.isclose(result["distances"][0][0], 0.0, atol=1e-6)
+    backend.delete_collection("drugs")
+    assert os.listdir(tmp_path) == []